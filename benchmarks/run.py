@@ -0,0 +1,283 @@
+"""
+Benchmarks of the client's hot paths, compared to stored baselines.
+
+    python benchmarks/run.py                # run and compare to benchmarks/baseline.json
+    python benchmarks/run.py --save         # store the results as the new baseline
+    python benchmarks/run.py -k symbol      # only the benchmarks whose name contains "symbol"
+
+Each benchmark reports operations/second, the best of ``--repeat`` runs. A result slower than its
+baseline by more than ``--tolerance`` fails the run (exit status 1), so regressions are caught before
+upgrading. Baselines depend on the machine: store them on the machine running the comparison.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import stream_replay
+import tick_decode
+
+from forexcom.bars import BarAggregator, resample_prices
+from forexcom.client import PRICE_FIELDS, ForexComClient, _parse_price
+from forexcom.lightstream import StreamerSubscription
+from forexcom.models import SymbolRegistry
+from forexcom.rest import RestClient
+from forexcom.ticks import PRICE_DTYPE
+from forexcom.transport import HTTPTransport
+from forexcom.utils import send_request
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+BENCHMARKS = {}
+
+
+def benchmark(name, *args):
+    """Register ``setup(*args)``, returning (run, number of operations of a run), as the benchmark ``name``."""
+
+    def register(setup):
+        BENCHMARKS[name] = partial(setup, *args)
+        return setup
+
+    return register
+
+
+def _price_values():
+    subscription = StreamerSubscription("MERGE", ["PRICE.401484347"], PRICE_FIELDS, "PRICES")
+    values = []
+    subscription.addlistener(lambda item: values.append(list(item.values)))
+    subscription.notifyupdate(tick_decode.SNAPSHOT)
+    for line in tick_decode.UPDATES:
+        subscription.notifyupdate(line)
+    return values[1:]
+
+
+class _Item:
+    __slots__ = ('pos', 'values')
+
+    def __init__(self, values):
+        self.pos = 1
+        self.values = values
+
+
+@benchmark('tick_decode')
+def tick_decode_setup():
+    subscription = StreamerSubscription("MERGE", ["PRICE.401484347"], PRICE_FIELDS, "PRICES")
+    subscription.addlistener(lambda item: None)
+    subscription.notifyupdate(tick_decode.SNAPSHOT)
+    notifyupdate = subscription.notifyupdate
+
+    def run():
+        for line in tick_decode.UPDATES:
+            notifyupdate(line)
+
+    return run, len(tick_decode.UPDATES)
+
+
+@benchmark('price_update')
+def price_update_setup():
+    client = ForexComClient('user', 'password', 'key')
+    items = [_Item(values) for values in _price_values()]
+    on_price_update = client.on_price_update
+
+    def run():
+        for item in items:
+            on_price_update(item, 'EUR/USD')
+
+    return run, len(items)
+
+
+@benchmark('bar_update')
+def bar_update_setup():
+    aggregator = BarAggregator(['1s', '1m', '1h'], sides=('mid', 'bid', 'ask'))
+    prices = [_parse_price(values, 'EUR/USD') for values in _price_values()]
+    update = aggregator.update
+
+    def run():
+        for price in prices:
+            update(price)
+
+    return run, len(prices)
+
+
+for _listeners in (1, 10):
+
+    @benchmark(f'listener_dispatch_{_listeners}', _listeners)
+    def listener_dispatch_setup(listeners):
+        client = ForexComClient('user', 'password', 'key')
+        client._subscriber.add_subscriber('EUR/USD', 1)
+        for _ in range(listeners):
+            client._subscriber.add_listener('EUR/USD', lambda price: None)
+        price = _parse_price(_price_values()[0], 'EUR/USD')
+        dispatch = client._dispatch
+
+        def run():
+            for _ in range(1000):
+                dispatch('EUR/USD', price)
+
+        return run, 1000 * listeners
+
+
+for _symbols in (10, 100, 1000):
+
+    @benchmark(f'symbol_name_{_symbols}', _symbols)
+    def symbol_name_setup(symbols):
+        registry = SymbolRegistry()
+        for i in range(symbols):
+            registry.add(f'SYM{i}/USD', 400000000 + i)
+        rest = RestClient('user', 'password', 'key', symbols=registry)
+        # Market ids as delivered by the stream, as text.
+        ids = [str(400000000 + i % symbols) for i in range(10000)]
+        get_symbol_name = rest.get_symbol_name
+
+        def run():
+            for symbol_id in ids:
+                get_symbol_name(symbol_id)
+
+        return run, len(ids)
+
+
+for _ticks, _label in ((10000, '10k'), (1000000, '1m')):
+
+    @benchmark(f'get_prices_parse_{_label}', _ticks)
+    def get_prices_parse_setup(ticks):
+        res = {
+            'PriceTicks': [
+                {'TickDate': f'/Date({1650000000000 + i * 250})/', 'Price': 1.05 + (i % 1000) * 1e-5}
+                for i in range(ticks)
+            ]
+        }
+
+        def run():
+            RestClient._prices_frame(RestClient._parse_prices(res, as_array=True))
+
+        return run, ticks
+
+
+@benchmark('resample_prices_1m')
+def resample_prices_setup():
+    data = np.empty(1000000, dtype=PRICE_DTYPE)
+    data['timestamp'] = 1650000000000 + np.arange(len(data)) * 250
+    data['price'] = 1.05 + np.arange(len(data)) % 1000 * 1e-5
+
+    def run():
+        resample_prices(data, '1m')
+
+    return run, len(data)
+
+
+@benchmark('stream_read')
+def stream_read_setup():
+    data = stream_replay.generate(100000)
+    tables = stream_replay.subscriptions(data)
+    return partial(stream_replay.current, data, tables), 100000
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffered writes: headers and body leave in one segment, flushed after each request.
+    wbufsize = -1
+    body = json.dumps({'StatusCode': 1}).encode('utf-8')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+
+@benchmark('send_request')
+def send_request_setup():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/'
+    transport = HTTPTransport()
+
+    def run():
+        for _ in range(1000):
+            send_request('GET', url, '/ping', json_format=True, transport=transport)
+
+    return run, 1000
+
+
+def measure(setup, repeat):
+    run, ops = setup()
+    run()
+    best = float('inf')
+    # Like timeit, the garbage collector doesn't run during the measures.
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return ops / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='keyword', default='', help='only run the benchmarks whose name contains it')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per benchmark, the best one is kept')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='accepted slowdown against the baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file')
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)
+    environment = {'python': platform.python_version(), 'platform': platform.platform()}
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = {'environment': environment, 'results': {}}
+    baseline = stored['results']
+    if stored['environment'] != environment:
+        print(f"Baseline recorded on {stored['environment']}, running on {environment}")
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<24} {'ops/s':>14} {'baseline':>14} {'change':>8}")
+    for name, setup in BENCHMARKS.items():
+        if args.keyword not in name:
+            continue
+        result = results[name] = measure(setup, args.repeat)
+        reference = baseline.get(name)
+        if reference:
+            change = result / reference - 1
+            flag = ''
+            if change < -args.tolerance:
+                regressions.append(name)
+                flag = '  REGRESSION'
+            print(f'{name:<24} {result:14,.0f} {reference:14,.0f} {change:+8.1%}{flag}')
+        else:
+            print(f'{name:<24} {result:14,.0f} {"-":>14}')
+
+    if args.save:
+        baseline.update({name: round(result, 1) for name, result in results.items()})
+        stored['environment'] = environment
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline saved to {args.baseline}')
+    elif regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Lines/second of the Stream Connection reader: StreamerClient._receive replaying a recorded stream,
+against the previous readline/decode per line implementation.
+
+    python benchmarks/stream_replay.py [recording directory or stream body file]
+
+A recording is written by forexcom.replay.RecordingTransport, a stream body file holds the table updates
+("<table>,<item>|<values>") and PROBE lines of a stream connection. Without one a stream of 10 price
+tables is generated.
+"""
+import io
+import logging
+import os
+import sys
+import time
+
+from forexcom.client import PRICE_FIELDS
+from forexcom.lightstream import StreamerClient, StreamerSubscription
+from forexcom.replay import Recording
+
+log = logging.getLogger()
+
+TABLES = 10
+SNAPSHOT = "\\/Date(1655139463123)\\/|1.05478|1.05483|1.0548|1.05556|1.04284|0.0012|1|A1|0"
+
+
+def generate(lines=200000):
+    out = []
+    for i in range(lines):
+        if i % 1000 == 999:
+            out.append("PROBE")
+            continue
+        table = i % TABLES + 1
+        if i < TABLES:
+            out.append(f"{table},1|{table}|{SNAPSHOT}")
+        else:
+            out.append(f"{table},1|||1.0547{i % 10}|1.0548{i % 10}|1.0548{i % 10}|||0.001{i % 10}|{i % 2}|A{i}|")
+    return ("\r\n".join(out) + "\r\n").encode("utf-8")
+
+
+def subscriptions(data):
+    tables = {}
+    for line in data.splitlines():
+        if line[:1].isdigit():
+            table, item = line.split(b"|", 1)[0].split(b",")
+            tables[int(table)] = max(tables.get(int(table), 0), int(item))
+    result = {}
+    for table, items in tables.items():
+        names = [f"PRICE.{table}.{item}" for item in range(1, items + 1)]
+        subscription = StreamerSubscription("MERGE", names, PRICE_FIELDS, "PRICES")
+        subscription.addlistener(lambda item: None)
+        result[table] = subscription
+    return result
+
+
+def legacy(data, tables):
+    """The reader before the buffered one: a readline, decode and debug log per line."""
+    stream = io.BufferedReader(io.BytesIO(data))
+    lines = 0
+    while True:
+        message = stream.readline().decode("utf-8").rstrip()
+        log.debug("Received message: <%s>", message)
+        if not message.strip():
+            break
+        lines += 1
+        if message == "PROBE":
+            continue
+        log.debug("Received update message: <%s>", message)
+        tok = message.split(',', 1)
+        table, item = int(tok[0]), tok[1]
+        if table in tables:
+            tables[table].notifyupdate(item)
+    return lines
+
+
+def current(data, tables):
+    client = StreamerClient("http://localhost")
+    client._stream_connection = io.BufferedReader(io.BytesIO(data))
+    client._subscriptions.update(tables)
+    client._receive()
+    return client.metrics.messages
+
+
+def run(reader, data, rounds):
+    tables = subscriptions(data)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        lines = reader(data, tables)
+    return rounds * lines / (time.perf_counter() - start)
+
+
+def main(path=None, rounds=5):
+    log.setLevel(logging.ERROR)
+    if path is None:
+        data = generate()
+    elif os.path.isdir(path):
+        data = Recording(path).stream_body()
+    else:
+        with open(path, 'rb') as f:
+            data = f.read()
+    before = run(legacy, data, rounds)
+    after = run(current, data, rounds)
+    print(f"before: {before:12,.0f} lines/s")
+    print(f"after:  {after:12,.0f} lines/s  ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,104 @@
+"""
+Ticks/second of the stream decode path: StreamerSubscription.notifyupdate followed by
+ForexComClient.on_price_update, against the previous dict/regex/pandas implementation.
+
+    python benchmarks/tick_decode.py
+"""
+import re
+import time
+
+import pandas as pd
+
+from forexcom.client import PRICE_FIELDS, _parse_price
+from forexcom.lightstream import StreamerSubscription
+from forexcom.models import Price
+
+SNAPSHOT = "1|401484347|\\/Date(1655139463123)\\/|1.05478|1.05483|1.0548|1.05556|1.04284|0.0012|1|A1|0"
+UPDATES = [
+    f"1|||1.0547{i % 10}|1.0548{i % 10}|1.0548{i % 10}|||0.001{i % 10}|{i % 2}|A{i}|" for i in range(1000)
+]
+for i in range(0, len(UPDATES), 4):
+    UPDATES[i] = UPDATES[i].replace("1|||", f"1||\\/Date({1655139463123 + i})\\/|", 1)
+
+
+class LegacySubscription:
+    """The decode path before the fixed-slot decoder."""
+
+    def __init__(self, fields):
+        self.field_names = fields
+        self._items_map = {}
+        self._listeners = []
+
+    def _decode(self, value, last):
+        if value == "$":
+            return u''
+        elif value == "#":
+            return None
+        elif not value:
+            return last
+        elif value[0] in "#$":
+            value = value[1:]
+        return value
+
+    def notifyupdate(self, item_line):
+        toks = item_line.rstrip('\r\n').split('|')
+        undecoded_item = dict(list(zip(self.field_names, toks[1:])))
+        item_pos = int(toks[0])
+        curr_item = self._items_map.get(item_pos, {})
+        self._items_map[item_pos] = dict(
+            [(k, self._decode(v, curr_item.get(k))) for k, v in list(undecoded_item.items())],
+        )
+        item_info = {'pos': item_pos, 'name': 'PRICE', 'values': self._items_map[item_pos]}
+        for on_item_update in self._listeners:
+            on_item_update(item_info)
+
+
+def legacy_on_price_update(data, out):
+    data = data["values"]
+    pattern = re.compile(r'Date\(([\d]+)\)')
+    ts = pattern.search(data['TickDate'])[1].strip()
+    tick_datetime = pd.to_datetime(int(ts), unit='ms').tz_localize('UTC')
+    out.append(
+        Price(
+            data['MarketId'],
+            'EUR/USD',
+            tick_datetime,
+            data['Bid'],
+            data['Offer'],
+            data['Price'],
+            data['High'],
+            data['Low'],
+            data['Change'],
+            1 if str(data['Direction']) == '1' else -1,
+            data['AuditId'],
+            data['StatusSummary'],
+        )
+    )
+
+
+def run(subscription, rounds):
+    subscription.notifyupdate(SNAPSHOT)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for line in UPDATES:
+            subscription.notifyupdate(line)
+    return rounds * len(UPDATES) / (time.perf_counter() - start)
+
+
+def main(rounds=20):
+    out = []
+    legacy = LegacySubscription(PRICE_FIELDS)
+    legacy._listeners.append(lambda data: legacy_on_price_update(data, out))
+
+    current = StreamerSubscription("MERGE", ["PRICE.401484347"], PRICE_FIELDS, "PRICES")
+    current.addlistener(lambda item: out.append(_parse_price(item.values, 'EUR/USD')))
+
+    before = run(legacy, rounds)
+    out.clear()
+    after = run(current, rounds)
+    print(f"before: {before:12,.0f} ticks/s")
+    print(f"after:  {after:12,.0f} ticks/s  ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,16 @@
+from .aio import AsyncClientPool, AsyncForexComClient, AsyncRestClient  # noqa
+from .bars import BarAggregator  # noqa
+from .book import OrderBook  # noqa
+from .cache import MarketCache  # noqa
 from .client import ForexComClient  # noqa
+from .dispatch import AsyncioDispatcher, InlineDispatcher, SerialDispatcher, ThreadPoolDispatcher  # noqa
 from .lightstream import StreamerClient, StreamerSubscription  # noqa
 from .models import *  # noqa
+from .pool import ClientPool  # noqa
+from .ratelimit import RateLimiter  # noqa
+from .replay import Recording, RecordingTransport, ReplayServer  # noqa
 from .rest import RestClient  # noqa
+from .store import TickStore  # noqa
+from .ticks import TickBuffer  # noqa
+from .tracing import PrometheusTracer, StatsTracer, Tracer  # noqa
+from .transport import HTTPTransport  # noqa
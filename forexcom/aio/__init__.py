@@ -0,0 +1,6 @@
+from .client import AsyncForexComClient  # noqa
+from .lightstream import AsyncStreamerClient  # noqa
+from .pool import AsyncClientPool  # noqa
+from .replay import AsyncRecordingTransport  # noqa
+from .rest import AsyncRestClient  # noqa
+from .transport import AsyncHTTPTransport  # noqa
@@ -0,0 +1,539 @@
+import asyncio
+import inspect
+import logging
+import time
+
+from forexcom.client import (
+    MARKET_ORDER_ARGS,
+    ORDER_FIELDS,
+    PRICE_FIELDS,
+    _is_faster,
+    _parse_order,
+    _parse_price,
+)
+from forexcom.dispatch import Throttle
+from forexcom.exceptions import ForexException
+from forexcom.lightstream import StreamerSubscription
+from forexcom.models.subscribers import Subscriber
+from forexcom.ticks import TickBuffers
+
+from .lightstream import AsyncStreamerClient
+from .rest import AsyncRestClient
+from .transport import AsyncHTTPTransport
+
+log = logging.getLogger()
+
+
+class AsyncForexComClient:
+    """
+    asyncio counterpart of :class:`forexcom.ForexComClient`.
+
+    Listeners may be plain functions or coroutine functions, coroutines are scheduled as tasks
+    on the running loop so a slow listener never blocks the stream reader.
+    """
+
+    def __init__(
+        self,
+        username,
+        password,
+        app_key,
+        rest_url=None,
+        stream_url=None,
+        transport=None,
+        market_cache=None,
+        tick_buffer_size=1000,
+        tick_store=None,
+        auto_reconnect=True,
+        reconnect_delay=1,
+        max_reconnect_delay=60,
+        on_reconnect=None,
+        on_gap=None,
+        keepalive=None,
+        stall_timeout=None,
+        bars=None,
+        rate_limiter=None,
+        tracer=None,
+        order_book=None,
+        symbols=None,
+    ):
+        """
+        See :class:`forexcom.ForexComClient` for the parameters,
+        ``on_reconnect`` and ``on_gap`` may be coroutine functions.
+        """
+        if transport is None:
+            transport = AsyncHTTPTransport(tracer=tracer)
+        self._username = username
+        self._password = password
+        self._app_key = app_key
+        self._rest_url = rest_url
+        self._stream_url = stream_url
+        self._transport = transport
+        self._rest = AsyncRestClient(
+            username,
+            password,
+            app_key,
+            rest_url=rest_url,
+            transport=transport,
+            market_cache=market_cache,
+            tick_store=tick_store,
+            rate_limiter=rate_limiter,
+            tracer=tracer,
+            symbols=symbols,
+        )
+        self._streamer = AsyncStreamerClient(
+            self._stream_url,
+            "STREAMINGALL",
+            transport=transport,
+            keepalive=keepalive,
+            stall_timeout=stall_timeout,
+            tracer=tracer,
+        )
+        self._subscriber = Subscriber()
+        # Subscription key of the price tables to their symbols by item position, None once unsubscribed.
+        self._price_tables = {}
+        self._account_info = {}
+        self._ticks = TickBuffers(tick_buffer_size)
+        self._tick_store = self._rest.tick_store
+        self._bars = bars
+        self._order_book = order_book
+        self._tracer = tracer
+        self._tasks = set()
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._on_reconnect = on_reconnect
+        self._on_gap = on_gap
+        self._last_ticks = {}
+        self._gaps = {}
+        self._closed = False
+        if auto_reconnect:
+            self._streamer.on_session_lost = self._on_session_lost
+
+    async def connect(self, stream=True):
+        """See :meth:`forexcom.ForexComClient.connect`."""
+        self._closed = False
+        if self._rest.is_connect:
+            log.debug("Rest connected before.")
+        else:
+            await self._rest.connect()
+        if not stream:
+            return
+
+        self._streamer.set_username(self._username)
+        self._streamer.set_password(self._rest.session_token)
+
+        if self._streamer.is_connect:
+            log.debug("Streamer connected before.")
+        else:
+            await self._streamer.connect()
+        if self._order_book is not None:
+            await self._track_orders()
+
+    async def disconnect(self):
+        self._closed = True
+        for sub_key in list(dict.fromkeys(self._subscriber.sub_keys)):
+            await self._streamer.unsubscribe(sub_key)
+        self._subscriber = Subscriber()
+        self._price_tables = {}
+        await self._streamer.disconnect()
+        if self._tick_store is not None:
+            self._tick_store.flush()
+        for task in list(self._tasks):
+            task.cancel()
+        await self._transport.close()
+
+    def _schedule(self, awaitable):
+        task = asyncio.ensure_future(awaitable)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _call_hook(self, hook, *args):
+        result = hook(*args)
+        if inspect.isawaitable(result):
+            self._schedule(result)
+
+    def _on_session_lost(self, reason, subscriptions):
+        self._schedule(self._recover(subscriptions))
+
+    async def _recover(self, subscriptions):
+        delay = self._reconnect_delay
+        relogin = False
+        self._gaps.update(self._last_ticks)
+        while True:
+            if self._closed:
+                return
+            try:
+                await self._reconnect(relogin)
+                sub_keys = await self._streamer.resubscribe(subscriptions)
+                break
+            except Exception:
+                log.warning("Stream recovery failed, retrying in %ss", delay, exc_info=True)
+                await self._drop_session()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self._max_reconnect_delay)
+            relogin = True
+
+        self._subscriber.replace_sub_keys(sub_keys)
+        self._price_tables = {sub_keys.get(key, key): slots for key, slots in self._price_tables.items()}
+        log.info("Stream recovered, %s subscriptions replayed", len(sub_keys))
+        if self._order_book is not None:
+            try:
+                await self.sync_order_book()
+            except Exception:
+                log.warning("Order book resync failed", exc_info=True)
+        if self._on_reconnect is not None:
+            self._call_hook(self._on_reconnect)
+
+    async def _drop_session(self):
+        if not self._streamer.is_connect:
+            return
+        try:
+            await self._streamer.disconnect()
+        except Exception:
+            log.debug("Closing the session failed", exc_info=True)
+
+    async def _reconnect(self, relogin=False):
+        if relogin:
+            await self._rest.connect()
+            self._streamer.set_password(self._rest.session_token)
+        await self._streamer.connect()
+
+    def stream_metrics(self):
+        """See :meth:`forexcom.ForexComClient.stream_metrics`."""
+        return self._streamer.metrics.as_dict()
+
+    def last_tick_times(self):
+        """See :meth:`forexcom.ForexComClient.last_tick_times`."""
+        return dict(self._last_ticks)
+
+    def _check_gap(self, symbol_name, price):
+        last = self._gaps.pop(symbol_name, None)
+        if last is not None and self._on_gap is not None:
+            self._call_hook(self._on_gap, symbol_name, last, price.tick_timestamp)
+
+    async def get_account_info(self):
+        self._account_info = await self._rest.get_account_info()
+        return self._account_info
+
+    async def warm_symbols(self, symbols):
+        return await self._rest.warm_symbols(symbols)
+
+    async def get_prices(self, symbol, count=None, start=None, end=None, price_type='mid', as_array=False):
+        return await self._rest.get_prices(
+            symbol, count=count, start=start, end=end, price_type=price_type, as_array=as_array
+        )
+
+    def _dispatch(self, name, item):
+        if self._tracer is not None:
+            for index, listener in self._subscriber.get_listener_items(name):
+                self._call_traced(index, listener, item)
+            return
+        for listener in self._subscriber.get_listeners(name):
+            result = listener(item)
+            if inspect.isawaitable(result):
+                self._schedule(result)
+
+    def _call_traced(self, index, listener, item):
+        started = time.perf_counter()
+        try:
+            result = listener(item)
+        except Exception:
+            self._tracer.listener(index, time.perf_counter() - started, True)
+            raise
+        if inspect.isawaitable(result):
+            self._schedule(self._await_traced(index, result, started))
+        else:
+            self._tracer.listener(index, time.perf_counter() - started, False)
+
+    async def _await_traced(self, index, result, started):
+        try:
+            await result
+        except Exception:
+            self._tracer.listener(index, time.perf_counter() - started, True)
+            raise
+        self._tracer.listener(index, time.perf_counter() - started, False)
+
+    async def price_symbol_subscribe(self, symbol, callback, max_frequency=None, snapshot=True):
+        """See :meth:`forexcom.ForexComClient.price_symbol_subscribe`."""
+        indexes = await self.price_symbols_subscribe(
+            [symbol], callback, max_frequency=max_frequency, snapshot=snapshot
+        )
+        return indexes[symbol] if indexes else False
+
+    async def price_symbols_subscribe(self, symbols, callback, max_frequency=None, snapshot=True, table_size=100):
+        """See :meth:`forexcom.ForexComClient.price_symbols_subscribe`."""
+        if not self._streamer.is_connect:
+            log.debug("Streamer not connected.")
+            return False
+
+        symbols = list(dict.fromkeys(symbols))
+        subscribed = [symbol for symbol in symbols if self._subscriber.exists(symbol)]
+        new_symbols = [symbol for symbol in symbols if not self._subscriber.exists(symbol)]
+        if subscribed:
+            log.debug("Subscribed before %s", ", ".join(subscribed))
+        for sub_key in dict.fromkeys(map(self._subscriber.get_sub_key, subscribed)):
+            subscription = self._streamer.subscription(sub_key)
+            if subscription is not None and _is_faster(max_frequency, subscription.max_frequency):
+                await self._streamer.reconfigure(sub_key, max_frequency)
+
+        symbol_ids = await self._rest.warm_symbols(new_symbols) if new_symbols else {}
+        # Listeners are registered before the tables are created, so none misses the requested snapshot.
+        for symbol in new_symbols:
+            self._subscriber.add_subscriber(symbol, None)
+        indexes = {}
+        for symbol in symbols:
+            indexes[symbol] = self._subscriber.add_listener(symbol, self._throttle(callback, max_frequency))
+        # A symbol unsubscribed from a table still alive gets its slot back (without snapshot), not a second table.
+        for symbol in list(new_symbols):
+            sub_key = self._reuse_price_table(symbol, f"PRICE.{symbol_ids[symbol]}")
+            if sub_key is None:
+                continue
+            new_symbols.remove(symbol)
+            self._subscriber.set_sub_key(symbol, sub_key)
+            if _is_faster(max_frequency, self._streamer.subscription(sub_key).max_frequency):
+                await self._streamer.reconfigure(sub_key, max_frequency)
+        for start in range(0, len(new_symbols), table_size):
+            table = new_symbols[start : start + table_size]
+            subscription = StreamerSubscription(
+                mode="MERGE",
+                items=[f"PRICE.{symbol_ids[symbol]}" for symbol in table],
+                fields=PRICE_FIELDS,
+                adapter="PRICES",
+                snapshot=snapshot,
+                max_frequency=max_frequency,
+            )
+            subscription.addlistener(self._price_table_listener(table))
+            sub_key = await self._streamer.subscribe(subscription)
+            self._price_tables[sub_key] = table
+            for symbol in table:
+                self._subscriber.set_sub_key(symbol, sub_key)
+            log.debug("Subscribed from %s", ", ".join(table))
+        return indexes
+
+    def _price_table_listener(self, slots):
+        def listener(item):
+            symbol = slots[item.pos - 1]
+            # The table outlives its unsubscribed symbols while others are subscribed.
+            if symbol is not None:
+                self.on_price_update(item, symbol)
+
+        return listener
+
+    def _reuse_price_table(self, symbol, item):
+        for sub_key, slots in self._price_tables.items():
+            subscription = self._streamer.subscription(sub_key)
+            if subscription is not None and item in subscription.item_names:
+                slots[subscription.item_names.index(item)] = symbol
+                return sub_key
+        return None
+
+    def _throttle(self, callback, max_frequency):
+        if max_frequency is None:
+            return callback
+        return Throttle(callback, 1 / max_frequency, asyncio.get_running_loop().call_later)
+
+    async def unsubscribe_listener(self, index):
+        self._subscriber.remove_listener(index)
+        log.debug("Unsubscribed listener from %s", index)
+        name, i = self._subscriber.split_index(index)
+        if not self._subscriber.get_listeners(name) and not (name == 'ORDERS' and self._order_book is not None):
+            await self.unsubscribe(name)
+        return True
+
+    async def unsubscribe(self, name):
+        sub_key = self._subscriber.get_sub_key(name)
+        self._subscriber.remove_subscriber(name)
+        slots = self._price_tables.get(sub_key)
+        if slots is not None and name in slots:
+            slots[slots.index(name)] = None
+        if sub_key and sub_key not in set(self._subscriber.sub_keys):
+            await self._streamer.unsubscribe(sub_key)
+            self._price_tables.pop(sub_key, None)
+        log.debug("Unsubscribed from %s", name)
+
+    def on_price_update(self, item, symbol_name=None):
+        values = item.values
+        if symbol_name is None:
+            symbol_name = self._rest.symbols.get_name(values[0])
+        price = _parse_price(values, symbol_name)
+        log.debug("Price update: %s", price)
+        self._last_ticks[symbol_name] = price.tick_timestamp
+        self._streamer.metrics.record_latency(time.time() * 1000 - price.tick_timestamp)
+        if self._gaps:
+            self._check_gap(symbol_name, price)
+        self._ticks.append(symbol_name, price)
+        if self._tick_store is not None:
+            self._tick_store.append_price(price)
+        if self._bars is not None:
+            self._bars.update(price)
+        self._dispatch(symbol_name, price)
+
+    def ticks(self, symbol, last=None):
+        """See :meth:`forexcom.ForexComClient.ticks`."""
+        return self._ticks.view(symbol, last)
+
+    def ticks_frame(self, symbol, last=None):
+        """See :meth:`forexcom.ForexComClient.ticks_frame`."""
+        return self._ticks.to_frame(symbol, last)
+
+    def bars(self, symbol, timeframe, side='mid', last=None):
+        """See :meth:`forexcom.ForexComClient.bars`."""
+        if self._bars is None:
+            raise ForexException("No bar aggregator, pass bars=BarAggregator(...) to the client")
+        return self._bars.bars(symbol, timeframe, side, last)
+
+    def bars_frame(self, symbol, timeframe, side='mid', last=None, current=False):
+        """See :meth:`forexcom.ForexComClient.bars_frame`."""
+        if self._bars is None:
+            raise ForexException("No bar aggregator, pass bars=BarAggregator(...) to the client")
+        return self._bars.bars_frame(symbol, timeframe, side, last, current)
+
+    async def orders_subscribe(self, callback):
+        if not self._streamer.is_connect:
+            log.debug("Streamer not connected.")
+            return False
+        channel = 'ORDERS'
+        if self._subscriber.exists(channel):
+            log.debug("Subscribed before %s", channel)
+            return self._subscriber.add_listener(channel, callback)
+
+        self._subscriber.add_subscriber(channel, None)
+        index = self._subscriber.add_listener(channel, callback)
+        await self._subscribe_orders()
+        return index
+
+    async def _subscribe_orders(self):
+        channel = 'ORDERS'
+        subscription = StreamerSubscription(
+            mode="MERGE",
+            items=[channel],
+            fields=ORDER_FIELDS,
+            adapter="ORDERS",
+        )
+        subscription.addlistener(self.on_orders_update)
+        sub_key = await self._streamer.subscribe(subscription)
+        self._subscriber.set_sub_key(channel, sub_key)
+        log.debug("Subscribed from %s", channel)
+
+    async def _track_orders(self):
+        if not self._subscriber.exists('ORDERS'):
+            self._subscriber.add_subscriber('ORDERS', None)
+            await self._subscribe_orders()
+        await self.sync_order_book()
+
+    @property
+    def order_book(self):
+        return self._order_book
+
+    async def sync_order_book(self):
+        """See :meth:`forexcom.ForexComClient.sync_order_book`."""
+        if self._order_book is None:
+            raise ForexException("No order book, pass order_book=OrderBook() to the client")
+        version = self._order_book.version
+        client_account_id, trading_account_id = await self.client_account_id(), await self.trading_account_id()
+        positions, orders = await asyncio.gather(
+            self._rest.get_open_positions(client_account_id, trading_account_id),
+            self._rest.get_active_orders(client_account_id, trading_account_id),
+        )
+        return self._order_book.seed(positions + orders, version)
+
+    async def orders_unsubscribe(self):
+        await self.unsubscribe('ORDERS')
+        return True
+
+    def on_orders_update(self, item):
+        values = item.values
+        symbol_name = self._rest.symbols.get_name(values[1])
+        if symbol_name is None:
+            # Unknown market, resolve its name without blocking the stream reader.
+            self._schedule(self._on_orders_update(list(values)))
+            return
+        self._order_update(_parse_order(values, symbol_name))
+
+    async def _on_orders_update(self, values):
+        symbol_name = await self._rest.get_symbol_name(values[1])
+        self._order_update(_parse_order(values, symbol_name))
+
+    def _order_update(self, order):
+        if self._order_book is not None:
+            self._order_book.update(order)
+        self._dispatch("ORDERS", order)
+
+    async def _iterate(self, subscribe, unsubscribe_listener, maxsize):
+        queue = asyncio.Queue(maxsize)
+
+        def put(item):
+            if queue.full():
+                # Drop the oldest update instead of stalling the stream reader.
+                queue.get_nowait()
+            queue.put_nowait(item)
+
+        index = await subscribe(put)
+        if not index:
+            return
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            await unsubscribe_listener(index)
+
+    def prices(self, symbol, maxsize=0, max_frequency=None):
+        """
+        Async iterator over the price updates of a symbol.
+
+        ``async for price in client.prices('EUR/USD'): ...``
+        """
+        subscribe = lambda callback: self.price_symbol_subscribe(symbol, callback, max_frequency)  # noqa: E731
+        return self._iterate(subscribe, self.unsubscribe_listener, maxsize)
+
+    def orders(self, maxsize=0):
+        """Async iterator over the order updates."""
+        return self._iterate(self.orders_subscribe, self.unsubscribe_listener, maxsize)
+
+    async def order_market_price(self, symbol, position, quantity, offer_price, trading_account_id=None):
+        return await self._rest.order_market_price(
+            client_account_id=await self.client_account_id(),
+            trading_account_id=trading_account_id or await self.trading_account_id(),
+            symbol=symbol,
+            position=position,
+            quantity=quantity,
+            offer_price=offer_price,
+        )
+
+    async def cancel_order(self, order_id, trading_account_id=None):
+        if trading_account_id is None:
+            trading_account_id = await self.trading_account_id()
+        return await self._rest.cancel_order(trading_account_id, order_id)
+
+    async def order_market_prices(self, orders, trading_account_id=None, max_workers=8):
+        """See :meth:`forexcom.ForexComClient.order_market_prices`."""
+        orders = list(orders)
+        requests = [order if isinstance(order, dict) else dict(zip(MARKET_ORDER_ARGS, order)) for order in orders]
+        trading_account_id = trading_account_id or await self.trading_account_id()
+        results = await self._rest.order_market_prices(
+            await self.client_account_id(), trading_account_id, requests, max_workers
+        )
+        for result, order in zip(results, orders):
+            result.request = order
+        return results
+
+    async def cancel_orders(self, order_ids, trading_account_id=None, max_workers=8):
+        """See :meth:`forexcom.ForexComClient.cancel_orders`."""
+        if trading_account_id is None:
+            trading_account_id = await self.trading_account_id()
+        return await self._rest.cancel_orders(trading_account_id, order_ids, max_workers)
+
+    async def client_account_id(self):
+        if not self._account_info:
+            await self.get_account_info()
+        return self._account_info['ClientAccountId']
+
+    async def trading_account_id(self):
+        if not self._account_info:
+            await self.get_account_info()
+        return self._account_info['TradingAccounts'][0]['TradingAccountId']
+
+    async def trading_account_ids(self):
+        """See :attr:`forexcom.ForexComClient.trading_account_ids`."""
+        if not self._account_info:
+            await self.get_account_info()
+        return [account['TradingAccountId'] for account in self._account_info['TradingAccounts']]
@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import time
+from functools import partial
+
+from forexcom.lightstream import (
+    BIND_URL_PATH,
+    CONNECTION_URL_PATH,
+    CONTROL_URL_PATH,
+    END_CMD,
+    ERROR_CMD,
+    LOOP_CMD,
+    OK_CMD,
+    OP_DELETE,
+    OP_DESTROY,
+    OP_RECONF,
+    PROBE_CMD,
+    STREAM_CHUNK_SIZE,
+    SYNC_ERROR_CMD,
+    LineBuffer,
+    StreamMetrics,
+    _frequency_param,
+)
+
+from .transport import AsyncHTTPTransport, send_request
+
+log = logging.getLogger()
+
+
+class AsyncStreamerClient:
+    """
+    asyncio counterpart of :class:`forexcom.StreamerClient`.
+
+    The stream connection is read by a task of the running event loop instead of a thread,
+    subscriptions are the same :class:`forexcom.StreamerSubscription` objects.
+    """
+
+    def __init__(
+        self, base_url=None, adapter_set="", transport=None, keepalive=None, stall_timeout=None, tracer=None
+    ):
+        if not base_url:
+            base_url = 'https://push.cityindex.com/'
+        if transport is None:
+            transport = AsyncHTTPTransport()
+        self._base_url = base_url
+        self._control_url = base_url
+        self._call = partial(send_request, transport, 'POST', stream=True, tracer=tracer)
+        self._send = partial(send_request, transport, 'POST', tracer=tracer)
+        self._tracer = tracer
+        self._adapter_set = adapter_set
+        self._username = None
+        self._password = None
+        self._session = {}
+        self._subscriptions = {}
+        self._current_subscription_key = 0
+        self._stream_connection = None
+        self._receive_task = None
+        self._bind_counter = 0
+        self._closing = False
+        # Called with (reason, subscriptions) when the session is lost, see StreamerClient.on_session_lost.
+        self.on_session_lost = None
+        self._keepalive = keepalive
+        self._stall_timeout = stall_timeout
+        self._watchdog_task = None
+        self.metrics = StreamMetrics()
+
+    def _set_control_link_url(self, custom_address=None):
+        if custom_address is None:
+            self._control_url = self._base_url
+        else:
+            self._control_url = f"{self._base_url.split('/')[0]}//{custom_address}"
+
+    async def _control(self, params):
+        params["LS_session"] = self._session["SessionId"]
+        response = await self._send(self._control_url, CONTROL_URL_PATH, params)
+        decoded_response = response.decode("utf-8").split("\n", 1)[0].rstrip()
+        log.debug("Server response: <%s>", decoded_response)
+        return decoded_response
+
+    async def _read_from_stream(self):
+        line = await self._stream_connection.readline()
+        self.metrics.record(len(line))
+        return line.decode("utf-8").rstrip()
+
+    async def _stream_lines(self):
+        connection = self._stream_connection
+        lines = LineBuffer()
+        while data := await connection.read1(STREAM_CHUNK_SIZE):
+            chunk = lines.feed(data)
+            self.metrics.record(len(data), len(chunk))
+            if self._tracer is not None:
+                self._tracer.stream_messages(len(chunk), len(data))
+            for line in chunk:
+                yield line
+
+    def _stream_params(self, params):
+        if self._keepalive is not None:
+            params["LS_keepalive_millis"] = int(self._keepalive * 1000)
+        return params
+
+    def _stall_seconds(self):
+        if self._stall_timeout is not None:
+            return self._stall_timeout
+        keepalive = self._session.get("KeepaliveMillis")
+        return 3 * int(keepalive) / 1000 if keepalive else 0
+
+    async def _watch(self):
+        """Drop the stream connection when no message came for the stall timeout."""
+        while not self._closing and self._stream_connection is not None:
+            timeout = self._stall_seconds()
+            await asyncio.sleep(min(timeout / 4, 1) if timeout else 1)
+            connection = self._stream_connection
+            if timeout and connection is not None and self.metrics.since_message > timeout:
+                log.warning("No message for %.1fs, dropping the stream connection", self.metrics.since_message)
+                self.metrics.stalls += 1
+                self.metrics.last_message = time.monotonic()
+                if self._tracer is not None:
+                    self._tracer.stream_event('stalled')
+                connection.close()
+
+    def set_password(self, password):
+        self._password = password
+
+    def set_username(self, username):
+        log.debug("Set username to <%s>", username)
+        self._username = username
+
+    @property
+    def is_connect(self):
+        return bool(self._session.get('SessionId'))
+
+    async def connect(self):
+        log.debug("Opening a new session to <%s>", self._base_url)
+        self._closing = False
+        self._stream_connection = await self._call(
+            self._base_url,
+            CONNECTION_URL_PATH,
+            self._stream_params(
+                {
+                    "LS_op2": 'create',
+                    "LS_cid": 'mgQkwtwdysogQz2BJ4Ji kOj2Bg',
+                    "LS_adapter_set": self._adapter_set,
+                    "LS_user": self._username,
+                    "LS_password": self._password,
+                }
+            ),
+        )
+        await self._handle_stream(await self._read_from_stream())
+
+    async def bind(self):
+        log.debug("Binding to <%s>", self._control_url)
+        self._stream_connection = await self._call(
+            self._control_url, BIND_URL_PATH, self._stream_params({"LS_session": self._session["SessionId"]})
+        )
+        self._bind_counter += 1
+        await self._handle_stream(await self._read_from_stream())
+        log.info("Bound to <%s>", self._control_url)
+
+    async def _handle_stream(self, stream_line):
+        if stream_line == OK_CMD:
+            log.info("Successfully connected to <%s>", self._base_url)
+            while next_stream_line := await self._read_from_stream():
+                session_key, session_value = next_stream_line.split(":", 1)
+                self._session[session_key] = session_value
+            self._set_control_link_url(self._session.get("ControlAddress"))
+            self.metrics.connections += 1
+            self.metrics.last_message = time.monotonic()
+            if self._tracer is not None:
+                self._tracer.stream_event('connected')
+            loop = asyncio.get_running_loop()
+            self._receive_task = loop.create_task(self._receive())
+            if self._watchdog_task is None or self._watchdog_task.done():
+                self._watchdog_task = loop.create_task(self._watch())
+            log.info("Started handling of real-time stream")
+        else:
+            body = await self._stream_connection.read() if self._stream_connection else b''
+            log.error("\nServer response error: \n%s%s", stream_line, body.decode("utf-8", "replace"))
+            raise IOError()
+
+    async def disconnect(self):
+        self._closing = True
+        if self._watchdog_task is not None:
+            self._watchdog_task.cancel()
+            self._watchdog_task = None
+        if self._stream_connection is not None:
+            log.debug("Closing session to <%s>", self._base_url)
+            try:
+                await self._control({"LS_op": OP_DESTROY})
+            except Exception:
+                log.warning("Destroying the session failed", exc_info=True)
+                self._stream_connection.close()
+            if self._receive_task is not None:
+                await self._receive_task
+                self._receive_task = None
+            log.info("Closed session to <%s>", self._base_url)
+        else:
+            log.warning("No connection to Lightstreamer")
+
+    async def subscribe(self, subscription):
+        self._current_subscription_key += 1
+        subscription_key = self._current_subscription_key
+        self._subscriptions[subscription_key] = subscription
+        log.debug("Making a new subscription request")
+        server_response = await self._control(subscription.table_params(subscription_key))
+        if server_response == OK_CMD:
+            log.info("Successfully subscribed ")
+        else:
+            log.warning("Subscription error")
+        return subscription_key
+
+    async def resubscribe(self, subscriptions):
+        """See :meth:`forexcom.StreamerClient.resubscribe`."""
+        return {key: await self.subscribe(subscriptions[key]) for key in sorted(subscriptions)}
+
+    def subscription(self, subscription_key):
+        return self._subscriptions.get(subscription_key)
+
+    async def reconfigure(self, subscription_key, max_frequency=None):
+        """See :meth:`forexcom.StreamerClient.reconfigure`."""
+        subscription = self._subscriptions.get(subscription_key)
+        if subscription is None:
+            log.warning("No subscription key %s found!", subscription_key)
+            return False
+        server_response = await self._control(
+            {
+                "LS_table": subscription_key,
+                "LS_op": OP_RECONF,
+                "LS_requested_max_frequency": _frequency_param(max_frequency),
+            }
+        )
+        if server_response != OK_CMD:
+            log.warning("Reconfiguration error")
+            return False
+        subscription.max_frequency = max_frequency
+        return True
+
+    async def unsubscribe(self, subcription_key):
+        log.debug("Making an unsubscription request")
+        if subcription_key in self._subscriptions:
+            server_response = await self._control({"LS_Table": subcription_key, "LS_op": OP_DELETE})
+            if server_response == OK_CMD:
+                del self._subscriptions[subcription_key]
+                log.info("Successfully unsubscribed")
+            else:
+                log.warning("Unsubscription error")
+        else:
+            log.warning("No subscription key %s found!", subcription_key)
+
+    def _forward_update_message(self, line):
+        try:
+            table, item = line.split(b",", 1)
+            table = int(table)
+            item = item.decode("utf-8")
+        except ValueError:
+            # UnicodeDecodeError included, a corrupt line doesn't end the stream.
+            log.warning("Malformed update message skipped: <%r>", line)
+            return
+        subscription = self._subscriptions.get(table)
+        if subscription is None:
+            log.warning("No subscription found!")
+            return
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Received update message: <%s,%s>", table, item)
+        try:
+            subscription.notifyupdate(item)
+        except Exception:
+            log.exception("Failed to forward update message")
+
+    async def _receive(self):
+        rebind = False
+        reason = "connection lost"
+        try:
+            async for line in self._stream_lines():
+                if line[:1].isdigit():
+                    self._forward_update_message(line)
+                    continue
+                message = line.decode("utf-8").rstrip()
+                if not message:
+                    continue
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Received message: <%s>", message)
+                if message == PROBE_CMD:
+                    self.metrics.record_probe()
+                elif message.startswith(ERROR_CMD):
+                    reason = message
+                    log.error("ERROR")
+                    break
+                elif message.startswith(LOOP_CMD):
+                    log.debug("LOOP")
+                    rebind = True
+                    break
+                elif message.startswith(SYNC_ERROR_CMD):
+                    log.error("SYNC ERROR")
+                    reason = message
+                    break
+                elif message.startswith(END_CMD):
+                    log.info("Connection closed by the server")
+                    reason = message
+                    break
+                elif message.startswith("Preamble"):
+                    log.debug("Preamble")
+                else:
+                    log.warning("Unexpected message: <%s>", message)
+            else:
+                log.warning("No new message received")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Communication error")
+
+        self._stream_connection.close()
+        if rebind:
+            log.debug("Binding to this active session")
+            try:
+                await self.bind()
+                return
+            except Exception:
+                log.exception("Binding to <%s> failed", self._control_url)
+                reason = "bind failed"
+
+        log.debug("No rebind to <%s>, clearing internal session data", self._base_url)
+        subscriptions = dict(self._subscriptions)
+        self._stream_connection = None
+        self._session.clear()
+        self._subscriptions.clear()
+        self._current_subscription_key = 0
+        if not self._closing and self._tracer is not None:
+            self._tracer.stream_event('lost')
+        if not self._closing and self.on_session_lost is not None:
+            log.warning("Session lost: %s", reason)
+            self.on_session_lost(reason, subscriptions)
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+
+from forexcom.exceptions import ForexException
+from forexcom.models import SymbolRegistry
+
+from .client import AsyncForexComClient
+from .rest import run_batch
+from .transport import AsyncHTTPTransport
+
+log = logging.getLogger()
+
+
+class AsyncClientPool:
+    """
+    asyncio counterpart of :class:`forexcom.ClientPool`.
+    """
+
+    def __init__(
+        self,
+        rest_url=None,
+        stream_url=None,
+        transport=None,
+        pool_size=20,
+        timeout=30,
+        rate_limiter=None,
+        tracer=None,
+        max_workers=8,
+        **market_options,
+    ):
+        self._own_transport = transport is None
+        if transport is None:
+            transport = AsyncHTTPTransport(pool_size=pool_size, timeout=timeout, tracer=tracer)
+        self._transport = transport
+        self._options = {
+            'rest_url': rest_url,
+            'stream_url': stream_url,
+            'transport': transport,
+            'symbols': SymbolRegistry(),
+            'rate_limiter': rate_limiter,
+            'tracer': tracer,
+        }
+        self._market_options = market_options
+        self._max_workers = max_workers
+        self._logins = {}
+        self._accounts = {}
+        # Logins with an open stream, the others are only logged in to the REST API.
+        self._streaming = set()
+        self._market = None
+
+    def add_login(self, username, password, app_key):
+        """See :meth:`forexcom.ClientPool.add_login`."""
+        if username in self._logins:
+            raise ForexException(f"Login <{username}> already in the pool")
+        if self._market is None:
+            client = AsyncForexComClient(username, password, app_key, **self._options, **self._market_options)
+            self._market = client
+        else:
+            client = AsyncForexComClient(username, password, app_key, tick_buffer_size=0, **self._options)
+        self._logins[username] = client
+        return client
+
+    async def connect(self):
+        """See :meth:`forexcom.ClientPool.connect`."""
+        if self._market is None:
+            raise ForexException("No login in the pool, see add_login")
+        semaphore = asyncio.Semaphore(self._max_workers)
+
+        async def connect_login(client):
+            async with semaphore:
+                await client.connect(stream=False)
+                return await client.trading_account_ids()
+
+        usernames = list(self._logins)
+        accounts = await asyncio.gather(*(connect_login(self._logins[username]) for username in usernames))
+        for username, trading_account_ids in zip(usernames, accounts):
+            for trading_account_id in trading_account_ids:
+                self._accounts[trading_account_id] = username
+        await self._market.connect()
+        self._streaming.add(next(iter(self._logins)))
+        log.info("Pool connected, %s logins and %s trading accounts", len(self._logins), len(self._accounts))
+
+    async def disconnect(self):
+        for username in list(self._streaming):
+            await self._logins[username].disconnect()
+        self._streaming.clear()
+        if self._own_transport:
+            await self._transport.close()
+
+    @property
+    def market(self):
+        return self._market
+
+    @property
+    def symbols(self):
+        return self._options['symbols']
+
+    @property
+    def transport(self):
+        return self._transport
+
+    @property
+    def trading_account_ids(self):
+        return list(self._accounts)
+
+    def login(self, username):
+        try:
+            return self._logins[username]
+        except KeyError:
+            raise ForexException(f"Unknown login <{username}>") from None
+
+    def client(self, trading_account_id):
+        return self._logins[self._login_of(trading_account_id)]
+
+    def _login_of(self, trading_account_id):
+        try:
+            return self._accounts[trading_account_id]
+        except KeyError:
+            raise ForexException(f"Unknown trading account <{trading_account_id}>") from None
+
+    async def price_symbol_subscribe(self, symbol, callback, max_frequency=None, snapshot=True):
+        return await self._market.price_symbol_subscribe(
+            symbol, callback, max_frequency=max_frequency, snapshot=snapshot
+        )
+
+    async def price_symbols_subscribe(self, symbols, callback, max_frequency=None, snapshot=True):
+        return await self._market.price_symbols_subscribe(
+            symbols, callback, max_frequency=max_frequency, snapshot=snapshot
+        )
+
+    async def unsubscribe_listener(self, index):
+        return await self._market.unsubscribe_listener(index)
+
+    async def orders_subscribe(self, callback, trading_account_id=None):
+        """See :meth:`forexcom.ClientPool.orders_subscribe`."""
+        if trading_account_id is not None:
+            usernames = [self._login_of(trading_account_id)]
+            listener = self._account_listener(callback, trading_account_id)
+        else:
+            usernames = list(dict.fromkeys(self._accounts.values()))
+            listener = callback
+        indexes = {}
+        for username in usernames:
+            client = self._logins[username]
+            await client.connect()
+            self._streaming.add(username)
+            indexes[username] = await client.orders_subscribe(listener)
+        return indexes
+
+    @staticmethod
+    def _account_listener(callback, trading_account_id):
+        def listener(order):
+            if order.trading_account_id == trading_account_id:
+                return callback(order)
+
+        return listener
+
+    async def orders_unsubscribe_listener(self, indexes):
+        for username, index in indexes.items():
+            await self.login(username).unsubscribe_listener(index)
+        return True
+
+    async def order_market_price(self, trading_account_id, symbol, position, quantity, offer_price):
+        return await self.client(trading_account_id).order_market_price(
+            symbol, position, quantity, offer_price, trading_account_id=trading_account_id
+        )
+
+    async def cancel_order(self, trading_account_id, order_id):
+        return await self.client(trading_account_id).cancel_order(order_id, trading_account_id=trading_account_id)
+
+    async def order_market_prices(self, orders, max_workers=8):
+        """See :meth:`forexcom.ClientPool.order_market_prices`."""
+        orders = list(orders)
+        try:
+            await self._market.warm_symbols(
+                [order['symbol'] if isinstance(order, dict) else order[1] for order in orders]
+            )
+        except Exception as e:
+            log.debug('Warming up the symbols of the orders failed: %s', e)
+        return await run_batch(self.order_market_price, orders, max_workers)
+
+    async def cancel_orders(self, orders, max_workers=8):
+        """See :meth:`forexcom.ClientPool.cancel_orders`."""
+        return await run_batch(self.cancel_order, list(orders), max_workers)
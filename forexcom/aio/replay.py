@@ -0,0 +1,50 @@
+from forexcom.replay import Recorder, _StreamTap
+
+from .transport import AsyncHTTPTransport
+
+
+class _AsyncRecordedStream:
+    """:class:`StreamResponse` of a stream connection recording what is read from it."""
+
+    def __init__(self, recorder, response):
+        self._response = response
+        self._tap = _StreamTap(recorder)
+
+    async def readline(self):
+        return self._tap.feed(await self._response.readline())
+
+    async def read1(self, *args):
+        return self._tap.feed(await self._response.read1(*args))
+
+    async def read(self):
+        return self._tap.feed(await self._response.read())
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class AsyncRecordingTransport:
+    """
+    asyncio counterpart of :class:`forexcom.replay.RecordingTransport`.
+
+    :param path: recording directory
+    :param transport: wrapped AsyncHTTPTransport, a new one by default
+    """
+
+    def __init__(self, path, transport=None):
+        self.recorder = Recorder(path)
+        self._transport = transport if transport is not None else AsyncHTTPTransport()
+
+    async def request(self, method, url, body=None, headers=None, stream=False):
+        response = await self._transport.request(method, url, body=body, headers=headers, stream=stream)
+        if stream:
+            return _AsyncRecordedStream(self.recorder, response)
+        self.recorder.record_rest(method, url, body, response.status, response.body)
+        return response
+
+    async def close(self):
+        await self._transport.close()
+        self.recorder.close()
+
+    def __getattr__(self, name):
+        return getattr(self._transport, name)
@@ -0,0 +1,352 @@
+import asyncio
+import logging
+import time
+from functools import partial
+
+import pandas as pd
+
+from forexcom.bars import bars_frame, resample_bars, resample_prices, timeframe_ms
+from forexcom.models import BatchResult, Position
+from forexcom.rest import MAX_PRICE_BARS, MAX_PRICE_TICKS, RestClient
+
+from .transport import AsyncHTTPTransport, send_request
+
+log = logging.getLogger()
+
+
+class AsyncRestClient(RestClient):
+    """asyncio counterpart of :class:`forexcom.RestClient`, every API call is awaitable."""
+
+    def __init__(
+        self,
+        username,
+        password,
+        app_key,
+        rest_url=None,
+        transport=None,
+        pool_size=10,
+        timeout=30,
+        symbols=None,
+        market_cache=None,
+        tick_store=None,
+        rate_limiter=None,
+        tracer=None,
+    ):
+        """
+        :param transport: AsyncHTTPTransport shared with other clients, by default a new one is created
+        :param pool_size: maximum number of idle keep-alive connections (ignored if transport is given)
+        :param timeout: request timeout in seconds (ignored if transport is given)
+        :param symbols: SymbolRegistry shared with other clients, by default a new one is created
+        :param market_cache: MarketCache (or path of its JSON file) persisting market metadata between runs
+        :param tick_store: TickStore (or its directory) caching tick history
+        :param rate_limiter: RateLimiter shared by the requests of one or more clients
+        :param tracer: Tracer of the requests and of the connections of the transport created
+        """
+        if transport is None:
+            transport = AsyncHTTPTransport(pool_size=pool_size, timeout=timeout, tracer=tracer)
+        super().__init__(
+            username,
+            password,
+            app_key,
+            rest_url=rest_url,
+            transport=transport,
+            symbols=symbols,
+            market_cache=market_cache,
+            tick_store=tick_store,
+            rate_limiter=rate_limiter,
+        )
+        options = {'json_format': True, 'rate_limiter': rate_limiter, 'tracer': tracer}
+        self._get = partial(send_request, transport, 'GET', self._rest_url, **options)
+        self._post = partial(send_request, transport, 'POST', self._rest_url, **options)
+
+    async def connect(self):
+        log.debug('Connecting to REST API')
+        res = await self._post('/session', params=self._login_params)
+        self._session_token = self._parse_session(res)
+
+    async def get_account_info(self):
+        log.debug('Getting account info')
+        res = await self._get('/UserAccount/ClientAndTradingAccount', headers=self._default_headers)
+        return self._parse_account_info(res)
+
+    async def get_symbol_detail(self, symbol):
+        log.debug('Getting symbol details for %s', symbol)
+        res = await self._get('/cfd/markets', params={'MarketName': symbol}, headers=self._default_headers)
+        return self._parse_symbol_detail(symbol, res)
+
+    async def get_symbol_id(self, symbol):
+        symbol_id = self._symbols.get_id(symbol)
+        if symbol_id is None:
+            log.debug('Getting symbol id for %s from server', symbol)
+            await self.get_symbol_detail(symbol)
+            self._save_market_cache()
+            symbol_id = self._symbols.get_id(symbol)
+        return symbol_id
+
+    async def warm_symbols(self, symbols, max_workers=8):
+        missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self._symbols]
+        if missing:
+            log.debug('Warming up %s symbols', len(missing))
+            semaphore = asyncio.Semaphore(max_workers)
+
+            async def fetch(symbol):
+                async with semaphore:
+                    await self.get_symbol_detail(symbol)
+
+            await asyncio.gather(*map(fetch, missing))
+            self._save_market_cache()
+        return {symbol: self._symbols.get_id(symbol) for symbol in symbols}
+
+    async def get_symbol_name(self, symbol_id):
+        symbol = self._symbols.get_name(symbol_id)
+        if symbol is not None:
+            return symbol
+        log.debug('Getting symbol name for %s from server', symbol_id)
+        res = await self._get(f'market/{symbol_id}/information', headers=self._default_headers)
+        symbol = self._parse_market_information(res)
+        self._save_market_cache()
+        return symbol
+
+    async def get_prices(self, symbol, count=None, start=None, end=None, price_type='mid', as_array=False):
+        """See :meth:`forexcom.RestClient.get_prices`."""
+        log.debug('Getting prices for %s', symbol)
+        price_types = self._check_price_types(price_type)
+        symbol_id = await self.get_symbol_id(symbol)
+
+        async def fetch(price_type):
+            if self._tick_store is not None and start and end:
+                download = partial(self._download_prices, symbol_id, price_type=price_type)
+                return await self._stored_prices(symbol, start, end, price_type, download)
+            url, params = self._prices_request(symbol_id, count, start, end, price_type)
+            res = await self._get(url, params=params, headers=self._default_headers)
+            return self._parse_prices(res, as_array=True)
+
+        if len(price_types) == 1:
+            data = await fetch(price_types[0])
+        else:
+            data = self._merge_price_types(price_types, await asyncio.gather(*map(fetch, price_types)))
+        return data if as_array else self._prices_frame(data)
+
+    async def get_prices_range(
+        self,
+        symbol,
+        start,
+        end,
+        price_type='mid',
+        window='1h',
+        max_workers=4,
+        max_results=MAX_PRICE_TICKS,
+        retries=5,
+        backoff=0.5,
+    ):
+        """See :meth:`forexcom.RestClient.get_prices_range`."""
+        log.debug('Getting prices for %s from %s to %s', symbol, start, end)
+        self._check_price_type(price_type)
+        symbol_id = await self.get_symbol_id(symbol)
+        download = partial(
+            self._download_prices,
+            symbol_id,
+            price_type=price_type,
+            window=window,
+            max_workers=max_workers,
+            max_results=max_results,
+            retries=retries,
+            backoff=backoff,
+        )
+        return self._prices_frame(await self._stored_prices(symbol, start, end, price_type, download))
+
+    async def _stored_prices(self, symbol, start, end, price_type, download):
+        start, end = self._range_ms(start, end)
+        if self._tick_store is None:
+            return await download(start, end)
+        for gap_start, gap_end in self._tick_store.gaps(symbol, price_type, start, end + 1):
+            log.debug('Tick store gap of %s %s: %s-%s', symbol, price_type, gap_start, gap_end)
+            data = await download(gap_start, gap_end)
+            self._tick_store.store_history(symbol, price_type, data, gap_start, gap_end)
+        return self._tick_store.read(symbol, start, end, price_type)
+
+    async def _download_prices(
+        self,
+        symbol_id,
+        start,
+        end,
+        price_type='mid',
+        window='1h',
+        max_workers=4,
+        max_results=MAX_PRICE_TICKS,
+        retries=5,
+        backoff=0.5,
+    ):
+        fetch = partial(self._get_prices_window, symbol_id, price_type=price_type, retries=retries, backoff=backoff)
+        windows = self._price_windows(start, end, window)
+        return self._join_prices(await self._download_windows(fetch, windows, max_workers, max_results))
+
+    @staticmethod
+    async def _download_windows(fetch, windows, max_workers, max_results):
+        """See :meth:`forexcom.RestClient._download_windows`."""
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def fetch_window(window_start, window_end):
+            async with semaphore:
+                data = await fetch(window_start, window_end)
+            if len(data) >= max_results and window_end - window_start > 1:
+                middle = (window_start + window_end) // 2
+                halves = await asyncio.gather(fetch_window(window_start, middle), fetch_window(middle, window_end))
+                return sum(halves, [])
+            return [data]
+
+        results = await asyncio.gather(*(fetch_window(*w) for w in windows))
+        return sum(results, [])
+
+    async def _get_prices_window(self, symbol_id, start, end, price_type='mid', retries=5, backoff=0.5):
+        url, params = self._prices_request(
+            symbol_id, start=pd.Timestamp(start, unit='s'), end=pd.Timestamp(end, unit='s'), price_type=price_type
+        )
+        return self._parse_prices(await self._get_retried(url, params, retries, backoff), as_array=True)
+
+    async def _get_retried(self, url, params, retries=5, backoff=0.5):
+        for attempt in range(retries + 1):
+            res = await self._get(url, params=params, headers=self._default_headers)
+            if attempt == retries or not self._is_retryable(res):
+                break
+            delay = backoff * 2**attempt
+            log.debug('Request %s throttled, retrying in %ss', url, delay)
+            await asyncio.sleep(delay)
+        return res
+
+    async def get_bars(
+        self,
+        symbol,
+        interval,
+        start,
+        end,
+        price_type='mid',
+        source='auto',
+        max_workers=4,
+        max_results=MAX_PRICE_BARS,
+        retries=5,
+        backoff=0.5,
+        as_array=False,
+    ):
+        """See :meth:`forexcom.RestClient.get_bars`."""
+        log.debug('Getting %s bars for %s from %s to %s', interval, symbol, start, end)
+        self._check_price_type(price_type)
+        base = self._bars_base(interval, source)
+        symbol_id = await self.get_symbol_id(symbol)
+        if base is None:
+            download = partial(
+                self._download_prices,
+                symbol_id,
+                price_type=price_type,
+                max_workers=max_workers,
+                retries=retries,
+                backoff=backoff,
+            )
+            data = resample_prices(await self._stored_prices(symbol, start, end, price_type, download), interval)
+        else:
+            data = await self._download_bars(
+                symbol_id, *self._range_ms(start, end), base, price_type, max_workers, max_results, retries, backoff
+            )
+            if timeframe_ms(interval) != base * 1000:
+                data = resample_bars(data, interval)
+        data = self._bars_between(data, start, end)
+        return data if as_array else bars_frame(data)
+
+    async def _download_bars(
+        self, symbol_id, start, end, base, price_type, max_workers, max_results, retries, backoff
+    ):
+        fetch = partial(self._get_bars_window, symbol_id, base, price_type, retries, backoff)
+        windows = self._price_windows(start, end, f'{base * max_results}s')
+        return self._join_bars(await self._download_windows(fetch, windows, max_workers, max_results))
+
+    async def _get_bars_window(self, symbol_id, base, price_type, retries, backoff, start, end):
+        url, params = self._bars_request(symbol_id, base, start, end, price_type)
+        return self._parse_bars(await self._get_retried(url, params, retries, backoff))
+
+    async def get_open_positions(self, client_account_id, trading_account_id):
+        """See :meth:`forexcom.RestClient.get_open_positions`."""
+        log.debug('Getting open positions of %s', trading_account_id)
+        res = await self._get(
+            '/order/openpositions', params={'TradingAccountId': trading_account_id}, headers=self._default_headers
+        )
+        return self._parse_open_orders(res, 'OpenPositions', client_account_id)
+
+    async def get_active_orders(self, client_account_id, trading_account_id):
+        """See :meth:`forexcom.RestClient.get_active_orders`."""
+        log.debug('Getting active orders of %s', trading_account_id)
+        res = await self._get(
+            '/order/activestoplimitorders',
+            params={'TradingAccountId': trading_account_id},
+            headers=self._default_headers,
+        )
+        return self._parse_open_orders(res, 'ActiveStopLimitOrders', client_account_id)
+
+    async def cancel_order(self, trading_account_id, order_id):
+        log.debug('Cancel order %s-%s', trading_account_id, order_id)
+        res = await self._post(
+            '/order/cancel',
+            params={'OrderId': order_id, 'TradingAccountId': trading_account_id},
+            headers=self._default_headers,
+        )
+        self._check_status(res)
+        return res
+
+    async def order_market_price(
+        self,
+        client_account_id: int,
+        trading_account_id,
+        symbol: str,
+        position: Position,
+        offer_price: float,
+        quantity: int,
+    ):
+        log.debug('create trade %s %s %s %s %s', trading_account_id, symbol, position, offer_price, quantity)
+        symbol_id = await self.get_symbol_id(symbol)
+        res = await self._post(
+            '/order/newtradeorder',
+            params=self._market_order_params(trading_account_id, symbol, symbol_id, position, offer_price, quantity),
+            headers=self._default_headers,
+        )
+        return self._parse_market_order(res, client_account_id, trading_account_id, symbol, symbol_id, position)
+
+    async def order_market_prices(self, client_account_id, trading_account_id, orders, max_workers=8):
+        """See :meth:`forexcom.RestClient.order_market_prices`."""
+        orders = list(orders)
+        try:
+            await self.warm_symbols([order['symbol'] if isinstance(order, dict) else order[0] for order in orders])
+        except Exception as e:
+            # The orders of an unknown symbol fail on their own.
+            log.debug('Warming up the symbols of the orders failed: %s', e)
+        submit = partial(self.order_market_price, client_account_id, trading_account_id)
+        return await run_batch(submit, orders, max_workers)
+
+    async def cancel_orders(self, trading_account_id, order_ids, max_workers=8):
+        """See :meth:`forexcom.RestClient.cancel_orders`."""
+        return await run_batch(partial(self.cancel_order, trading_account_id), list(order_ids), max_workers)
+
+    async def close(self):
+        await self._transport.close()
+
+
+async def run_batch(call, requests, max_workers=8):
+    """See :func:`forexcom.rest.run_batch`, call is a coroutine function."""
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def run(request):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if isinstance(request, dict):
+                    result = await call(**request)
+                elif isinstance(request, (tuple, list)):
+                    result = await call(*request)
+                else:
+                    result = await call(request)
+            except Exception as e:
+                log.debug('Batch request %s failed: %s', request, e)
+                return BatchResult(request, error=e, elapsed=time.perf_counter() - start)
+            return BatchResult(request, result, elapsed=time.perf_counter() - start)
+
+    results = await asyncio.gather(*map(run, requests))
+    log.debug('Batch of %s requests, %s failed', len(results), sum(not result.ok for result in results))
+    return results
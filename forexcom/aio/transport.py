@@ -0,0 +1,355 @@
+import asyncio
+import logging
+import socket
+import ssl
+import time
+from http.client import parse_headers
+from io import BytesIO
+from urllib.parse import urlsplit
+
+import certifi
+
+from forexcom.ratelimit import request_lane
+from forexcom.tracing import trace_request
+from forexcom.transport import IDEMPOTENT_METHODS, Response
+from forexcom.utils import parse_response, prepare_request
+
+log = logging.getLogger()
+
+# Errors raised when a kept-alive connection was silently closed by the peer.
+STALE_CONNECTION_ERRORS = (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError)
+
+
+class _Connection:
+    __slots__ = ('key', 'reader', 'writer')
+
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+
+    @property
+    def is_closed(self):
+        return self.reader.at_eof() or self.writer.is_closing()
+
+    def close(self):
+        self.writer.close()
+
+
+class StreamResponse:
+    """
+    Streaming response bound to its own connection.
+
+    Supports both ``Content-Length`` and chunked bodies, lines are read with :meth:`readline`
+    and blocks of the available bytes with :meth:`read1`.
+    """
+
+    def __init__(self, conn, status, reason, headers):
+        self._conn = conn
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._chunked = 'chunked' in headers.get('Transfer-Encoding', '').lower()
+        length = headers.get('Content-Length')
+        self._remaining = int(length) if length and not self._chunked else None
+        self._buffer = b''
+        self._eof = False
+
+    async def _read_chunk(self):
+        reader = self._conn.reader
+        size = int((await reader.readline()).split(b';', 1)[0].strip() or b'0', 16)
+        if size == 0:
+            await reader.readline()
+            self._eof = True
+            return b''
+        data = await reader.readexactly(size)
+        await reader.readexactly(2)
+        return data
+
+    async def readline(self):
+        """Read a single line (including the line terminator), ``b''`` at the end of the stream."""
+        if not self._chunked:
+            if self._remaining is None:
+                return await self._conn.reader.readline()
+            if not self._remaining:
+                return b''
+            line = await self._conn.reader.readline()
+            self._remaining -= len(line)
+            return line
+        while b'\n' not in self._buffer and not self._eof:
+            self._buffer += await self._read_chunk()
+        index = self._buffer.find(b'\n') + 1 or len(self._buffer)
+        line, self._buffer = self._buffer[:index], self._buffer[index:]
+        return line
+
+    async def read1(self, size=65536):
+        """
+        Read the bytes available, at most ``size`` (or one chunk of a chunked body), without waiting for more.
+        ``b''`` at the end of the stream.
+        """
+        if self._buffer:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+            return data
+        if self._chunked:
+            return b'' if self._eof else await self._read_chunk()
+        if self._remaining is None:
+            return await self._conn.reader.read(size)
+        if not self._remaining:
+            return b''
+        data = await self._conn.reader.read(min(size, self._remaining))
+        self._remaining -= len(data)
+        return data
+
+    async def read(self):
+        """Read the rest of the body."""
+        if not self._chunked:
+            if self._remaining is None:
+                return await self._conn.reader.read()
+            try:
+                data = await self._conn.reader.readexactly(self._remaining)
+            except asyncio.IncompleteReadError as e:
+                data = e.partial
+            self._remaining = 0
+            return data
+        data = [self._buffer]
+        self._buffer = b''
+        while not self._eof:
+            data.append(await self._read_chunk())
+        return b''.join(data)
+
+    def close(self):
+        self._conn.close()
+
+
+class AsyncHTTPTransport:
+    """
+    asyncio counterpart of :class:`forexcom.transport.HTTPTransport`.
+
+    HTTP/1.1 over ``asyncio`` streams with a keep-alive connection pool per host and a single
+    SSL context. Proxies are not supported.
+
+    :param pool_size: maximum number of idle connections kept per host
+    :param timeout: timeout (seconds) of regular requests
+    :param cafile: CA bundle, defaults to certifi
+    :param tracer: Tracer told the DNS/connect/TLS times of the new connections
+    """
+
+    def __init__(self, pool_size=10, timeout=30, cafile=None, tracer=None):
+        self.pool_size = pool_size
+        self.tracer = tracer
+        self.timeout = timeout
+        self._cafile = cafile or certifi.where()
+        self._ssl_context = None
+        self._pools = {}
+
+    @property
+    def ssl_context(self):
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context(cafile=self._cafile)
+        return self._ssl_context
+
+    async def _new_connection(self, key):
+        scheme, host, port = key
+        if self.tracer is not None:
+            reader, writer = await self._open(scheme, host, port)
+        else:
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=self.ssl_context if scheme == 'https' else None
+            )
+        log.debug("New connection to <%s://%s:%s>", scheme, host, port)
+        return _Connection(key, reader, writer)
+
+    async def _open(self, scheme, host, port):
+        """Connect step by step, reporting the DNS lookup, TCP connect and TLS handshake times."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        addresses = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        error = None
+        for family, type_, proto, _, address in addresses:
+            sock = socket.socket(family, type_, proto)
+            sock.setblocking(False)
+            try:
+                await loop.sock_connect(sock, address)
+                break
+            except OSError as e:
+                sock.close()
+                error = e
+        else:
+            raise error
+        connected = time.perf_counter()
+        if scheme == 'https':
+            try:
+                streams = await asyncio.open_connection(sock=sock, ssl=self.ssl_context, server_hostname=host)
+            except BaseException:
+                sock.close()
+                raise
+            tls = time.perf_counter() - connected
+        else:
+            streams = await asyncio.open_connection(sock=sock)
+            tls = None
+        self.tracer.connection(host, resolved - start, connected - resolved, tls)
+        return streams
+
+    async def _acquire(self, key):
+        pool = self._pools.setdefault(key, [])
+        while pool:
+            conn = pool.pop()
+            if not conn.is_closed:
+                return conn, True
+            conn.close()
+        return await self._new_connection(key), False
+
+    def _release(self, conn):
+        pool = self._pools.setdefault(conn.key, [])
+        if len(pool) < self.pool_size and not conn.is_closed:
+            pool.append(conn)
+        else:
+            conn.close()
+
+    async def _send(self, conn, method, target, host, body, headers):
+        await self._write(conn, method, target, host, body, headers)
+        return await self._read_head(conn)
+
+    @staticmethod
+    async def _write(conn, method, target, host, body, headers):
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {host}']
+        headers = dict(headers or {})
+        if body is not None or method == 'POST':
+            headers['Content-Length'] = str(len(body or b''))
+        lines.extend(f'{k}: {v}' for k, v in headers.items())
+        conn.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b''))
+        await conn.writer.drain()
+
+    @staticmethod
+    async def _read_head(conn):
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(status_line, None)
+        _, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+        raw_headers = [status_line]
+        while True:
+            line = await conn.reader.readline()
+            raw_headers.append(line)
+            if line in (b'\r\n', b'\n', b''):
+                break
+        fp = BytesIO(b''.join(raw_headers[1:]))
+        return int(status), reason, parse_headers(fp)
+
+    async def _read_body(self, conn, method, status, headers):
+        """
+        :return: the body and whether the connection ends with it
+        """
+        if method.upper() == 'HEAD' or 100 <= status < 200 or status in (204, 304):
+            return b'', False
+        response = StreamResponse(conn, None, None, headers)
+        if response._chunked:
+            return await response.read(), False
+        length = headers.get('Content-Length')
+        if length is not None:
+            return await conn.reader.readexactly(int(length)), False
+        if headers.get('Connection', '').lower() == 'close':
+            # The body is delimited by the end of the connection.
+            return await conn.reader.read(), True
+        # No framing on a kept-alive connection: no body, and the connection isn't reused.
+        return b'', True
+
+    async def _request(self, method, url, body, headers):
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'https'
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+        conn, reused = await self._acquire(key)
+        sent = time.perf_counter()
+        try:
+            sending = True
+            try:
+                await self._write(conn, method, target, parts.netloc, body, headers)
+                sending = False
+                status, reason, res_headers = await self._read_head(conn)
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                # See forexcom.transport.IDEMPOTENT_METHODS, a sent POST may have been processed.
+                if not reused or not (sending or method.upper() in IDEMPOTENT_METHODS):
+                    raise
+                log.debug("Stale connection to <%s>, reconnecting", parts.netloc)
+                conn = await self._new_connection(key)
+                status, reason, res_headers = await self._send(conn, method, target, parts.netloc, body, headers)
+            first_byte = time.perf_counter() - sent
+            res_body, will_close = await self._read_body(conn, method, status, res_headers)
+        except BaseException:
+            conn.close()
+            raise
+        if will_close or res_headers.get('Connection', '').lower() == 'close':
+            conn.close()
+        else:
+            self._release(conn)
+        return Response(status, reason, res_headers, res_body, first_byte)
+
+    async def request(self, method, url, body=None, headers=None, stream=False):
+        """
+        Send a request and return the response.
+
+        :param stream: when set the connection is dedicated to the returned :class:`StreamResponse`.
+        :return: :class:`StreamResponse` for stream requests, otherwise :class:`forexcom.transport.Response`
+        """
+        if not stream:
+            return await asyncio.wait_for(self._request(method, url, body, headers), self.timeout)
+
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'https'
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == 'https' else 80))
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        conn = await asyncio.wait_for(self._new_connection(key), self.timeout)
+        try:
+            status, reason, res_headers = await asyncio.wait_for(
+                self._send(conn, method, target, parts.netloc, body, headers), self.timeout
+            )
+        except BaseException:
+            conn.close()
+            raise
+        return StreamResponse(conn, status, reason, res_headers)
+
+    async def close(self):
+        """Close every idle connection."""
+        pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            for conn in pool:
+                conn.close()
+
+
+async def send_request(
+    transport,
+    method,
+    base_url,
+    path,
+    params=None,
+    json_format=False,
+    headers=None,
+    stream=False,
+    rate_limiter=None,
+    tracer=None,
+):
+    """asyncio counterpart of :func:`forexcom.utils.send_request`."""
+    url, data, headers = prepare_request(method, base_url, path, params, json_format, headers)
+    if rate_limiter is not None:
+        await rate_limiter.acquire_async(request_lane(path))
+    log.debug("Making a request to <%s> with params <%s>", url, data or params)
+    start = time.perf_counter() if tracer is not None else 0
+    try:
+        response = await transport.request(method, url, body=data, headers=headers, stream=stream)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        log.debug("Request failed to reach a server <%s>", e)
+        if tracer is not None:
+            trace_request(tracer, method, path, None, None, time.perf_counter() - start)
+        return {} if json_format else ''
+
+    if stream:
+        if tracer is not None:
+            trace_request(tracer, method, path, response, None, time.perf_counter() - start)
+        return response
+    result = parse_response(response, json_format)
+    if tracer is not None:
+        trace_request(tracer, method, path, response, result, time.perf_counter() - start)
+    return result
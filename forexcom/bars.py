@@ -0,0 +1,362 @@
+import asyncio
+import inspect
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .models import Bar
+
+# OHLC bars, timestamp is the start of the bar in epoch milliseconds.
+BAR_DTYPE = np.dtype(
+    [('timestamp', 'i8'), ('open', 'f8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8'), ('ticks', 'i8')]
+)
+SIDES = ('mid', 'bid', 'ask')
+
+
+def timeframe_ms(timeframe):
+    """
+    :param timeframe: bar length, seconds (int) or a pandas timedelta string ('1s', '1m', '5m', '1h', '1d')
+    :return: bar length in milliseconds
+    """
+    if isinstance(timeframe, (int, float)):
+        interval = int(timeframe * 1000)
+    else:
+        interval = int(pd.Timedelta(timeframe).total_seconds() * 1000)
+    if interval <= 0:
+        raise ValueError(f"Invalid timeframe <{timeframe}>")
+    return interval
+
+
+def _periods(timestamps, interval):
+    """
+    :param timestamps: sorted epoch milliseconds
+    :return: (start of every period, index of the first and of the last timestamp of every period)
+    """
+    starts = timestamps - timestamps % interval
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:], len(timestamps)] - 1
+    return starts[first], first, last
+
+
+def resample_prices(data, timeframe, field='price'):
+    """
+    Vectorized OHLC bars of a tick history, the bars :class:`BarAggregator` builds from the same ticks.
+
+    Bars are aligned on multiples of the timeframe since the epoch and labelled by their start,
+    periods without ticks have no bar.
+
+    :param data: structured array sorted by timestamp (epoch milliseconds), e.g. ``get_prices(..., as_array=True)``
+    :param field: price field of data
+    :return: BAR_DTYPE array
+    """
+    timestamps = data['timestamp']
+    prices = data[field]
+    valid = ~np.isnan(prices)
+    if not valid.all():
+        timestamps, prices = timestamps[valid], prices[valid]
+    if not len(prices):
+        return np.empty(0, dtype=BAR_DTYPE)
+    starts, first, last = _periods(timestamps, timeframe_ms(timeframe))
+    bars = np.empty(len(first), dtype=BAR_DTYPE)
+    bars['timestamp'] = starts
+    bars['open'] = prices[first]
+    bars['high'] = np.maximum.reduceat(prices, first)
+    bars['low'] = np.minimum.reduceat(prices, first)
+    bars['close'] = prices[last]
+    bars['ticks'] = last - first + 1
+    return bars
+
+
+def resample_bars(bars, timeframe):
+    """
+    Vectorized bars of a longer timeframe, e.g. 20 minutes bars of 10 minutes bars.
+
+    :param bars: BAR_DTYPE array sorted by timestamp, the timeframe should be a multiple of their length
+    :return: BAR_DTYPE array, aligned like :func:`resample_prices`
+    """
+    if not len(bars):
+        return np.empty(0, dtype=BAR_DTYPE)
+    starts, first, last = _periods(bars['timestamp'], timeframe_ms(timeframe))
+    result = np.empty(len(first), dtype=BAR_DTYPE)
+    result['timestamp'] = starts
+    result['open'] = bars['open'][first]
+    result['high'] = np.maximum.reduceat(bars['high'], first)
+    result['low'] = np.minimum.reduceat(bars['low'], first)
+    result['close'] = bars['close'][last]
+    result['ticks'] = np.add.reduceat(bars['ticks'], first)
+    return result
+
+
+def bars_frame(bars):
+    """
+    :param bars: BAR_DTYPE array
+    :return: pd.DataFrame of open/high/low/close/ticks indexed by the UTC start of the bars, like ``get_prices``
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(bars['timestamp'], unit='ms', utc=True), name='datetime')
+    return pd.DataFrame({name: bars[name] for name in BAR_DTYPE.names[1:]}, index=index)
+
+
+class BarBuffer:
+    """
+    Fixed capacity ring buffer of closed bars, written twice like :class:`forexcom.TickBuffer`
+    so the last ``n`` bars are always a contiguous slice.
+
+    :param capacity: maximum number of bars kept
+    """
+
+    __slots__ = ('capacity', 'count', '_data')
+
+    def __init__(self, capacity=1000):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.count = 0
+        self._data = np.zeros(capacity * 2, dtype=BAR_DTYPE)
+
+    def append(self, row):
+        index = self.count % self.capacity
+        self._data[index] = row
+        self._data[index + self.capacity] = row
+        self.count += 1
+
+    def replace(self, bars):
+        """Replace the content with the last ``capacity`` bars of a BAR_DTYPE array."""
+        bars = bars[-self.capacity :]
+        self.count = len(bars)
+        self._data[: len(bars)] = bars
+        self._data[self.capacity : self.capacity + len(bars)] = bars
+
+    def view(self, last=None):
+        """
+        :param last: number of most recent bars, all the buffered bars by default
+        :return: BAR_DTYPE array (oldest first) sharing memory with the buffer
+        """
+        size = min(self.count, self.capacity)
+        if last is not None:
+            size = min(size, last)
+        end = self.count % self.capacity + self.capacity
+        return self._data[end - size : end]
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+
+class _BarSeries:
+    """Forming bar and closed bars of a symbol, timeframe and side."""
+
+    __slots__ = ('interval', 'start', 'open', 'high', 'low', 'close', 'ticks', 'first', 'history')
+
+    def __init__(self, interval, capacity):
+        self.interval = interval
+        self.start = None
+        self.ticks = 0
+        # Timestamp of the first streamed tick, older history is joined by BarAggregator.backfill.
+        self.first = None
+        self.history = BarBuffer(capacity)
+
+    def update(self, timestamp, value):
+        """
+        :return: the bar closed by this tick (BAR_DTYPE row), None if it's still forming
+        """
+        if self.first is None:
+            self.first = timestamp
+        start = timestamp - timestamp % self.interval
+        if start == self.start and self.ticks:
+            if value > self.high:
+                self.high = value
+            elif value < self.low:
+                self.low = value
+            self.close = value
+            self.ticks += 1
+            return None
+        if self.start is not None and start < self.start:
+            # Late tick of a closed bar.
+            return None
+        closed = self.close_bar()
+        self.start = start
+        self.open = self.high = self.low = self.close = value
+        self.ticks = 1
+        return closed
+
+    def close_bar(self):
+        if not self.ticks:
+            return None
+        row = (self.start, self.open, self.high, self.low, self.close, self.ticks)
+        self.history.append(row)
+        self.start += self.interval
+        self.ticks = 0
+        return row
+
+    def row(self):
+        return (self.start, self.open, self.high, self.low, self.close, self.ticks) if self.ticks else None
+
+
+def _side_value(price, side):
+    if side == 'bid':
+        return price.bid
+    if side == 'ask':
+        return price.offer
+    if price.price is not None:
+        return price.price
+    if price.bid is not None and price.offer is not None:
+        return (price.bid + price.offer) / 2
+    return None
+
+
+class BarAggregator:
+    """
+    Incremental OHLC bars of the price stream, for several timeframes and sides at once.
+
+    A bar closes with the first tick of a later period (or with :meth:`close`), closed bars are kept
+    in a NumPy ring buffer per symbol, timeframe and side. Bars follow the rules of :func:`resample_prices`,
+    so bars of a tick history and live bars are the same, and :meth:`backfill` joins them.
+
+    :param timeframes: bar lengths, seconds or pandas timedelta strings ('1s', '1m', '5m', ...)
+    :param sides: prices aggregated, any of mid (the stream ``Price``), bid and ask
+    :param history: number of closed bars kept per symbol, timeframe and side
+    :param on_bar: called with every closed Bar, a coroutine function is scheduled on the running loop
+    """
+
+    def __init__(self, timeframes, sides=('mid',), history=1000, on_bar=None):
+        for side in sides:
+            if side not in SIDES:
+                raise ValueError(f"Unknown side <{side}>, expected one of {', '.join(SIDES)}")
+        self.timeframes = list(timeframes)
+        self.sides = tuple(sides)
+        self.history = history
+        self.on_bar = on_bar
+        self._intervals = [(timeframe, timeframe_ms(timeframe)) for timeframe in self.timeframes]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _symbol_series(self, symbol):
+        series = self._series.get(symbol)
+        if series is None:
+            series = self._series[symbol] = {
+                (timeframe, side): _BarSeries(interval, self.history)
+                for side in self.sides
+                for timeframe, interval in self._intervals
+            }
+        return series
+
+    def update(self, price):
+        """Aggregate a Price of the stream."""
+        symbol = price.symbol_name
+        timestamp = price.tick_timestamp
+        closed = []
+        with self._lock:
+            series = self._symbol_series(symbol)
+            for side in self.sides:
+                value = _side_value(price, side)
+                if value is None:
+                    continue
+                for timeframe, interval in self._intervals:
+                    row = series[(timeframe, side)].update(timestamp, value)
+                    if row is not None:
+                        closed.append((timeframe, side, row))
+        if closed and self.on_bar is not None:
+            self._emit(symbol, closed)
+
+    def close(self, timestamp=None):
+        """
+        Close the forming bars whose period ended, e.g. from a timer when a symbol stops ticking.
+
+        :param timestamp: epoch milliseconds, now by default
+        """
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        closed = {}
+        with self._lock:
+            for symbol, series in self._series.items():
+                for (timeframe, side), bars in series.items():
+                    if bars.ticks and bars.start + bars.interval <= timestamp:
+                        closed.setdefault(symbol, []).append((timeframe, side, bars.close_bar()))
+        if self.on_bar is not None:
+            for symbol, rows in closed.items():
+                self._emit(symbol, rows)
+
+    def _emit(self, symbol, closed):
+        for timeframe, side, row in closed:
+            result = self.on_bar(Bar(symbol, timeframe, side, *row))
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+
+    def backfill(self, symbol, data, side='mid', field='price'):
+        """
+        Join a tick history to the bars, e.g. ``RestClient.get_prices(symbol, ..., price_type=side, as_array=True)``.
+
+        Only the ticks older than the first streamed tick of the symbol are used, so no tick is counted twice.
+        When nothing was streamed yet, the last bar of the history keeps forming with the live ticks.
+
+        :param data: structured array sorted by timestamp (epoch milliseconds)
+        :param field: price field of data
+        """
+        if side not in self.sides:
+            raise ValueError(f"Side <{side}> is not aggregated")
+        with self._lock:
+            series = self._symbol_series(symbol)
+            for timeframe, interval in self._intervals:
+                bars = series[(timeframe, side)]
+                history = data if bars.first is None else data[data['timestamp'] < bars.first]
+                new_bars = resample_prices(history, interval / 1000, field)
+                if not len(new_bars):
+                    continue
+                last = new_bars[-1]
+                if bars.start is None:
+                    bars.start, bars.open, bars.high, bars.low, bars.close, bars.ticks = last.tolist()
+                    new_bars = new_bars[:-1]
+                elif bars.ticks and last['timestamp'] == bars.start:
+                    bars.open = float(last['open'])
+                    bars.high = max(bars.high, float(last['high']))
+                    bars.low = min(bars.low, float(last['low']))
+                    bars.ticks += int(last['ticks'])
+                    new_bars = new_bars[:-1]
+                closed = bars.history.view()
+                if len(closed):
+                    new_bars = new_bars[new_bars['timestamp'] <= closed['timestamp'][0]]
+                merged = np.concatenate([new_bars, closed])
+                if len(new_bars) and len(closed) and new_bars['timestamp'][-1] == closed['timestamp'][0]:
+                    # The first closed bar started before the stream, it gets the older ticks of its period.
+                    head, bar = merged[len(new_bars) - 1], merged[len(new_bars)]
+                    bar['open'] = head['open']
+                    bar['high'] = max(bar['high'], head['high'])
+                    bar['low'] = min(bar['low'], head['low'])
+                    bar['ticks'] += head['ticks']
+                    merged = np.delete(merged, len(new_bars) - 1)
+                bars.history.replace(merged)
+
+    def bars(self, symbol, timeframe, side='mid', last=None):
+        """
+        :param last: number of most recent closed bars, all the kept bars by default
+        :return: BAR_DTYPE array of the closed bars, a view on the live buffer
+        """
+        bars = self._series.get(symbol, {}).get((timeframe, side))
+        return bars.history.view(last) if bars is not None else np.empty(0, dtype=BAR_DTYPE)
+
+    def bars_frame(self, symbol, timeframe, side='mid', last=None, current=False):
+        """
+        :param current: append the forming bar
+        :return: pd.DataFrame of the bars, see :func:`bars_frame`
+        """
+        bars = self.bars(symbol, timeframe, side, last)
+        if current:
+            bar = self.current(symbol, timeframe, side)
+            if bar is not None:
+                row = np.array([(bar.timestamp, bar.open, bar.high, bar.low, bar.close, bar.ticks)], dtype=BAR_DTYPE)
+                bars = np.concatenate([bars, row])
+        return bars_frame(bars)
+
+    def current(self, symbol, timeframe, side='mid'):
+        """
+        :return: the forming Bar, None if no tick was aggregated since the last closed bar
+        """
+        with self._lock:
+            bars = self._series.get(symbol, {}).get((timeframe, side))
+            row = bars.row() if bars is not None else None
+        return Bar(symbol, timeframe, side, *row) if row is not None else None
+
+    @property
+    def symbols(self):
+        return list(self._series)
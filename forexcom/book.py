@@ -0,0 +1,262 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from forexcom.models import OrderStatus, OrderType, Position
+
+log = logging.getLogger()
+
+# Statuses of the orders which are done: they leave the book.
+CLOSED_STATUSES = frozenset(
+    (OrderStatus.Cancelled, OrderStatus.Rejected, OrderStatus.Closed, OrderStatus.RedCard, OrderStatus.Triggered)
+)
+
+
+def is_position(order):
+    """
+    :return: the order is an open position (an executed trade order), not a working order
+    """
+    return order.order_type == OrderType.Trade and order.status == OrderStatus.Open
+
+
+def signed_quantity(order):
+    return order.quantity if order.position == Position.Buy else -order.quantity
+
+
+def exposures(order):
+    """
+    Currency amounts of a position: the base and the quote currency of a currency pair (e.g. EUR/USD is
+    +quantity EUR and -quantity * price USD when bought), else the notional in the currency of the order.
+
+    :return: tuple of (currency ISO code, signed amount)
+    """
+    quantity = signed_quantity(order)
+    base, _, quote = (order.symbol_name or '').partition('/')
+    if len(base) == 3 and len(quote) == 3:
+        return (base, quantity), (quote, -quantity * order.open_price)
+    return ((getattr(order.currency, 'name', str(order.currency)), quantity * order.open_price),)
+
+
+class OrderBook:
+    """
+    Open positions and working orders of the account, kept up to date from the ORDERS stream.
+
+    The book is seeded from the REST open positions and active orders (see ``ForexComClient.sync_order_book``),
+    then every stream update replaces the order of its OrderId. Queries don't hit the API: an order, the
+    positions and the working orders of a symbol, the net quantity of a symbol and the net exposure of a
+    currency are kept incrementally. Updates older than the order already known (by last changed time) are
+    ignored, so a snapshot racing the stream doesn't roll an order back.
+
+    :param on_change: called with (event, order, previous) on every change, event is 'opened', 'changed' or
+                      'closed' and previous the former state of the order (None when opened)
+    :param history: number of closed order ids remembered, so a snapshot taken before they closed
+                    doesn't bring them back
+    """
+
+    def __init__(self, on_change=None, history=10000):
+        self.on_change = on_change
+        self._history = history
+        self._lock = threading.RLock()
+        self._orders = {}
+        self._positions = {}
+        self._working = {}
+        self._net = {}
+        self._exposure = {}
+        self._exposure_positions = {}
+        self._closed = OrderedDict()
+        self._versions = {}
+        self._version = 0
+
+    @property
+    def version(self):
+        """
+        Number of changes applied, taken before requesting a snapshot (see :meth:`seed`).
+        """
+        return self._version
+
+    def update(self, order):
+        """
+        Apply an order update (from the ORDERS stream or a REST snapshot).
+
+        :return: the change event ('opened', 'changed', 'closed'), None if the update changed nothing
+        """
+        with self._lock:
+            event, previous = self._apply(order)
+        if event is not None and self.on_change is not None:
+            self._notify(event, order, previous)
+        return event
+
+    def seed(self, orders, version=None):
+        """
+        Merge a REST snapshot of the open positions and active orders.
+
+        :param orders: iterable of Order
+        :param version: :attr:`version` of the book when the snapshot was requested, the orders missing from
+                        the snapshot and not updated since are closed (e.g. closed while the stream was lost)
+        :return: list of (event, order, previous) of the changes
+        """
+        changes = []
+        with self._lock:
+            seen = set()
+            for order in orders:
+                seen.add(order.order_id)
+                event, previous = self._apply(order)
+                if event is not None:
+                    changes.append((event, order, previous))
+            if version is not None:
+                for order_id, order in list(self._orders.items()):
+                    if order_id not in seen and self._versions[order_id] <= version:
+                        self._remove(order)
+                        self._remember_closed(order_id)
+                        changes.append(('closed', order, order))
+        if self.on_change is not None:
+            for change in changes:
+                self._notify(*change)
+        return changes
+
+    def _notify(self, event, order, previous):
+        try:
+            self.on_change(event, order, previous)
+        except Exception:
+            log.exception("Order book change handler failed")
+
+    def _apply(self, order):
+        order_id = order.order_id
+        if order_id in self._closed:
+            return None, None
+        previous = self._orders.get(order_id)
+        if previous is not None and self._is_stale(order, previous):
+            log.debug("Stale update of order %s ignored", order_id)
+            return None, previous
+        if order.status in CLOSED_STATUSES:
+            self._remember_closed(order_id)
+            if previous is None:
+                return None, None
+            self._remove(previous)
+            self._version += 1
+            return 'closed', previous
+        if previous is not None:
+            self._remove(previous)
+        self._add(order)
+        return ('opened' if previous is None else 'changed'), previous
+
+    @staticmethod
+    def _is_stale(order, previous):
+        changed, known = order.last_changed_timestamp, previous.last_changed_timestamp
+        return changed is not None and known is not None and changed < known
+
+    def _remember_closed(self, order_id):
+        self._closed[order_id] = None
+        self._closed.move_to_end(order_id)
+        if len(self._closed) > self._history:
+            self._closed.popitem(last=False)
+
+    def _add(self, order):
+        self._version += 1
+        self._orders[order.order_id] = order
+        self._versions[order.order_id] = self._version
+        symbol = order.symbol_name
+        if is_position(order):
+            self._positions.setdefault(symbol, {})[order.order_id] = order
+            self._net[symbol] = self._net.get(symbol, 0.0) + signed_quantity(order)
+            for currency, amount in exposures(order):
+                self._exposure[currency] = self._exposure.get(currency, 0.0) + amount
+                self._exposure_positions[currency] = self._exposure_positions.get(currency, 0) + 1
+        else:
+            self._working.setdefault(symbol, {})[order.order_id] = order
+
+    def _remove(self, order):
+        del self._orders[order.order_id]
+        del self._versions[order.order_id]
+        symbol = order.symbol_name
+        if is_position(order):
+            orders = self._positions[symbol]
+            del orders[order.order_id]
+            if not orders:
+                del self._positions[symbol]
+                del self._net[symbol]
+            else:
+                self._net[symbol] -= signed_quantity(order)
+            for currency, amount in exposures(order):
+                count = self._exposure_positions[currency] - 1
+                if count:
+                    self._exposure_positions[currency] = count
+                    self._exposure[currency] -= amount
+                else:
+                    # No rounding residue once the last position of the currency is gone.
+                    del self._exposure_positions[currency]
+                    del self._exposure[currency]
+        else:
+            orders = self._working[symbol]
+            del orders[order.order_id]
+            if not orders:
+                del self._working[symbol]
+
+    def get(self, order_id):
+        """
+        :return: the Order of order_id, None if it's not open
+        """
+        return self._orders.get(order_id)
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    def __len__(self):
+        return len(self._orders)
+
+    @staticmethod
+    def _select(index, symbol):
+        if symbol is not None:
+            return list(index.get(symbol, {}).values())
+        return [order for orders in list(index.values()) for order in list(orders.values())]
+
+    def positions(self, symbol=None):
+        """
+        :param symbol: symbol name, all the symbols by default
+        :return: list of the open positions
+        """
+        with self._lock:
+            return self._select(self._positions, symbol)
+
+    def orders(self, symbol=None):
+        """
+        :param symbol: symbol name, all the symbols by default
+        :return: list of the working (pending, stop and limit) orders
+        """
+        with self._lock:
+            return self._select(self._working, symbol)
+
+    def net_position(self, symbol):
+        """
+        :return: net quantity of the open positions of the symbol, positive when long
+        """
+        return self._net.get(symbol, 0.0)
+
+    def exposure(self, currency=None):
+        """
+        :param currency: ISO code (e.g. EUR)
+        :return: net amount of the currency held through the open positions (see :func:`exposures`),
+                 or dict of currency to net amount when currency is None
+        """
+        if currency is not None:
+            return self._exposure.get(currency, 0.0)
+        with self._lock:
+            return dict(self._exposure)
+
+    def symbols(self):
+        """
+        :return: the symbols with an open position or a working order
+        """
+        with self._lock:
+            return list(dict.fromkeys([*self._positions, *self._working]))
+
+    def clear(self):
+        with self._lock:
+            self._orders.clear()
+            self._positions.clear()
+            self._working.clear()
+            self._net.clear()
+            self._exposure.clear()
+            self._exposure_positions.clear()
+            self._closed.clear()
+            self._versions.clear()
@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger()
+
+CACHE_VERSION = 1
+
+
+class MarketCache:
+    """
+    Market metadata persisted in a JSON file.
+
+    Entries older than ``ttl`` seconds are ignored when the file is loaded so stale
+    markets are fetched again from the API. The file is rewritten atomically by :meth:`save`.
+
+    :param path: JSON file path
+    :param ttl: entry lifetime in seconds, ``None`` never expires
+    """
+
+    def __init__(self, path, ttl=86400):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self._markets = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        # Serializes the writes, a file is never replaced by an older snapshot or a half written one.
+        self._write_lock = threading.Lock()
+        self.load()
+
+    def _is_expired(self, entry, now):
+        return self.ttl is not None and now - entry.get('updated', 0) > self.ttl
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            log.warning("Market cache <%s> is not readable, ignoring it", self.path)
+            return
+        if data.get('version') != CACHE_VERSION:
+            log.debug("Market cache <%s> has an old format, ignoring it", self.path)
+            return
+        now = time.time()
+        with self._lock:
+            self._markets = {
+                name: entry for name, entry in data.get('markets', {}).items() if not self._is_expired(entry, now)
+            }
+        log.debug("Loaded %s markets from <%s>", len(self._markets), self.path)
+
+    def save(self):
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = {'version': CACHE_VERSION, 'markets': dict(self._markets)}
+                self._dirty = False
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                with self._lock:
+                    self._dirty = True
+                raise
+
+    def add(self, name, symbol_id, info=None):
+        with self._lock:
+            self._markets[name] = {'MarketId': int(symbol_id), 'info': info, 'updated': time.time()}
+            self._dirty = True
+
+    def markets(self):
+        """
+        :return: (name, market id, info) of every unexpired market
+        """
+        now = time.time()
+        return [
+            (name, entry['MarketId'], entry.get('info'))
+            for name, entry in list(self._markets.items())
+            if not self._is_expired(entry, now)
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._markets.clear()
+            self._dirty = True
+
+    def __contains__(self, name):
+        return name in self._markets
+
+    def __len__(self):
+        return len(self._markets)
@@ -1,8 +1,10 @@
 import logging
-import re
-
-import pandas as pd
+import threading
+import time
+from functools import partial
 
+from .dispatch import InlineDispatcher, Throttle
+from .exceptions import ForexException
 from .lightstream import StreamerClient, StreamerSubscription
 from .models import (
     Currency,
@@ -15,12 +17,184 @@ from .models import (
 )
 from .models.subscribers import Subscriber
 from .rest import RestClient
+from .ticks import TickBuffers
+from .transport import HTTPTransport
+from .utils import parse_date_ms
 
 log = logging.getLogger()
 
+PRICE_FIELDS = [
+    "MarketId",
+    "TickDate",
+    "Bid",
+    "Offer",
+    "Price",
+    "High",
+    "Low",
+    "Change",
+    "Direction",
+    "AuditId",
+    "StatusSummary",
+]
+ORDER_FIELDS = [
+    "OrderId",
+    "MarketId",
+    "ClientAccountId",
+    "TradingAccountId",
+    "CurrencyId",
+    "CurrencyISO",
+    "Direction",
+    "AutoRollover",
+    "ExecutionPrice",
+    "LastChangedTime",
+    "OpenPrice",
+    "OriginalLastChangedDateTime",
+    "OriginalQuantity",
+    "PositionMethodId",
+    "Quantity",
+    "Type",
+    "Status",
+    "ReasonId",
+]
+# Positional arguments of ForexComClient.order_market_price, for the tuples of order_market_prices.
+MARKET_ORDER_ARGS = ('symbol', 'position', 'quantity', 'offer_price')
+
+
+def _parse_price(values, symbol_name):
+    """Build a Price from the values (in PRICE_FIELDS order) of a PRICES stream item."""
+    (
+        symbol_id,
+        tick_date,
+        bid,
+        offer,
+        price,
+        high,
+        low,
+        change,
+        direction,
+        audit_id,
+        status_summary,
+    ) = values
+    return Price(
+        int(symbol_id),
+        symbol_name,
+        parse_date_ms(tick_date),
+        float(bid) if bid else None,
+        float(offer) if offer else None,
+        float(price) if price else None,
+        float(high) if high else None,
+        float(low) if low else None,
+        float(change) if change else None,
+        1 if direction == '1' else -1,
+        audit_id,
+        int(status_summary) if status_summary else None,
+    )
+
+
+def _parse_order(values, symbol_name):
+    """Build an Order from the values (in ORDER_FIELDS order) of an ORDERS stream item."""
+    (
+        order_id,
+        symbol_id,
+        client_account_id,
+        trading_account_id,
+        currency_id,
+        _currency_iso,
+        direction,
+        auto_rollover,
+        _execution_price,
+        last_changed_time,
+        open_price,
+        original_last_changed_date_time,
+        original_quantity,
+        position_method_id,
+        quantity,
+        order_type,
+        status,
+        reason_id,
+    ) = values
+    return Order(
+        order_id=int(order_id),
+        symbol_id=int(symbol_id),
+        symbol_name=symbol_name,
+        client_account_id=int(client_account_id),
+        trading_account_id=int(trading_account_id),
+        currency=Currency(int(currency_id)),
+        position=Position(2 if int(direction) == 1 else 1),
+        auto_rollover=bool(auto_rollover),
+        open_price=float(open_price),
+        last_changed_time=parse_date_ms(last_changed_time),
+        original_last_changed_date_time=parse_date_ms(original_last_changed_date_time),
+        original_quantity=float(original_quantity),
+        position_method=PositionMethod(int(position_method_id)),
+        quantity=float(quantity),
+        order_type=OrderType.find_by_name(order_type),
+        status=OrderStatus.find_by_name(status),
+        reason_id=int(reason_id),
+    )
+
+
+def _is_faster(max_frequency, current):
+    """Whether max_frequency (updates per second, ``None`` is unlimited) is higher than current."""
+    if current is None:
+        return False
+    return max_frequency is None or max_frequency > current
+
 
 class ForexComClient:
-    def __init__(self, username, password, app_key, http_proxy=None, https_proxy=None, rest_url=None, stream_url=None):
+    def __init__(
+        self,
+        username,
+        password,
+        app_key,
+        http_proxy=None,
+        https_proxy=None,
+        rest_url=None,
+        stream_url=None,
+        transport=None,
+        market_cache=None,
+        tick_buffer_size=1000,
+        tick_store=None,
+        dispatcher=None,
+        auto_reconnect=True,
+        reconnect_delay=1,
+        max_reconnect_delay=60,
+        on_reconnect=None,
+        on_gap=None,
+        keepalive=None,
+        stall_timeout=None,
+        bars=None,
+        rate_limiter=None,
+        tracer=None,
+        order_book=None,
+        symbols=None,
+    ):
+        """
+        :param tick_buffer_size: number of recent ticks kept per subscribed symbol (see ``ticks``), 0 disables it
+        :param tick_store: TickStore (or its directory) recording the streamed ticks and caching tick history
+        :param dispatcher: runs the listeners (InlineDispatcher, ThreadPoolDispatcher, SerialDispatcher or
+                           AsyncioDispatcher), by default they are called on the stream reader thread.
+                           A dispatcher given may be shared, it's left to the caller to close it.
+        :param auto_reconnect: when the stream session is lost, create a new one (logging in again if needed)
+                               and replay the subscriptions
+        :param reconnect_delay: first delay between reconnection attempts in seconds, doubled on every failure
+        :param max_reconnect_delay: maximum delay between reconnection attempts in seconds
+        :param on_reconnect: called without arguments once the subscriptions are replayed
+        :param on_gap: called with (symbol, last tick before the loss, first tick after it) in epoch milliseconds
+                       for every symbol ticking again after a reconnection, e.g. to backfill with get_prices_range
+        :param keepalive: interval in seconds of the PROBE messages sent by the server on an idle stream
+        :param stall_timeout: seconds without any stream message after which the connection is dropped and
+                              recovered, 3 times the keepalive interval by default, 0 disables it
+        :param bars: BarAggregator building OHLC bars of the streamed prices (see ``bars``)
+        :param rate_limiter: RateLimiter of the REST requests, see :class:`RestClient`
+        :param tracer: Tracer of the REST and stream requests, the connections of the transport created,
+                       the stream and the listeners (if the dispatcher has no tracer), see :mod:`forexcom.tracing`
+        :param order_book: OrderBook kept up to date with the open positions and working orders of the trading
+                           account: seeded on connect and after a reconnection, then updated from the ORDERS stream
+        :param symbols: SymbolRegistry shared with other clients, by default a new one is created
+        """
+        if transport is None:
+            transport = HTTPTransport(http_proxy=http_proxy, https_proxy=https_proxy, tracer=tracer)
         self._username = username
         self._password = password
         self._app_key = app_key
@@ -28,16 +202,60 @@ class ForexComClient:
         self._https_proxy = https_proxy
         self._rest_url = rest_url
         self._stream_url = stream_url
-        self._rest = RestClient(username, password, app_key, http_proxy, https_proxy, rest_url)
-        self._streamer = StreamerClient(self._stream_url, "STREAMINGALL")
+        self._transport = transport
+        self._rest = RestClient(
+            username,
+            password,
+            app_key,
+            rest_url=rest_url,
+            transport=transport,
+            market_cache=market_cache,
+            tick_store=tick_store,
+            rate_limiter=rate_limiter,
+            tracer=tracer,
+            symbols=symbols,
+        )
+        self._streamer = StreamerClient(
+            self._stream_url,
+            "STREAMINGALL",
+            transport=transport,
+            keepalive=keepalive,
+            stall_timeout=stall_timeout,
+            tracer=tracer,
+        )
         self._subscriber = Subscriber()
+        # Subscription key of the price tables to their symbols by item position, None once unsubscribed.
+        self._price_tables = {}
         self._account_info = {}
+        self._ticks = TickBuffers(tick_buffer_size)
+        self._tick_store = self._rest.tick_store
+        self._bars = bars
+        self._order_book = order_book
+        self._own_dispatcher = dispatcher is None
+        self._dispatcher = dispatcher if dispatcher is not None else InlineDispatcher()
+        if tracer is not None and self._dispatcher.tracer is None:
+            self._dispatcher.tracer = tracer
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._on_reconnect = on_reconnect
+        self._on_gap = on_gap
+        self._last_ticks = {}
+        self._gaps = {}
+        self._closed = False
+        if auto_reconnect:
+            self._streamer.on_session_lost = self._on_session_lost
 
-    def connect(self):
+    def connect(self, stream=True):
+        """
+        :param stream: connect the streamer too, else only log in to the REST API (connect again to stream)
+        """
+        self._closed = False
         if self._rest.is_connect:
             log.debug("Rest connected before.")
         else:
             self._rest.connect()
+        if not stream:
+            return
 
         self._streamer.set_username(self._username)
         self._streamer.set_password(self._rest.session_token)
@@ -46,101 +264,278 @@ class ForexComClient:
             log.debug("Streamer connected before.")
         else:
             self._streamer.connect()
+        if self._order_book is not None:
+            self._track_orders()
 
     def disconnect(self):
-        for sub_key in self._subscriber.sub_keys:
+        self._closed = True
+        for sub_key in dict.fromkeys(self._subscriber.sub_keys):
             self._streamer.unsubscribe(sub_key)
         self._subscriber = Subscriber()
+        self._price_tables = {}
         self._streamer.disconnect()
+        if self._own_dispatcher:
+            self._dispatcher.close()
+        if self._tick_store is not None:
+            self._tick_store.flush()
+
+    def _on_session_lost(self, reason, subscriptions):
+        # Called on the ending stream thread, the recovery runs on a thread of its own.
+        thread = threading.Thread(target=self._recover, args=(subscriptions,), name="StreamRecovery", daemon=True)
+        thread.start()
+
+    def _recover(self, subscriptions):
+        delay = self._reconnect_delay
+        relogin = False
+        self._gaps.update(self._last_ticks)
+        while True:
+            if self._closed:
+                return
+            try:
+                self._reconnect(relogin)
+                sub_keys = self._streamer.resubscribe(subscriptions)
+                break
+            except Exception:
+                log.warning("Stream recovery failed, retrying in %ss", delay, exc_info=True)
+                self._drop_session()
+            time.sleep(delay)
+            delay = min(delay * 2, self._max_reconnect_delay)
+            # The session token may have expired.
+            relogin = True
+
+        self._subscriber.replace_sub_keys(sub_keys)
+        self._price_tables = {sub_keys.get(key, key): slots for key, slots in self._price_tables.items()}
+        log.info("Stream recovered, %s subscriptions replayed", len(sub_keys))
+        if self._order_book is not None:
+            try:
+                # Orders may have changed while the stream was lost.
+                self.sync_order_book()
+            except Exception:
+                log.warning("Order book resync failed", exc_info=True)
+        if self._on_reconnect is not None:
+            self._on_reconnect()
+
+    def _drop_session(self):
+        # A session opened before its resubscription failed is closed, the next attempt starts a new one.
+        if not self._streamer.is_connect:
+            return
+        try:
+            self._streamer.disconnect()
+        except Exception:
+            log.debug("Closing the session failed", exc_info=True)
+
+    def _reconnect(self, relogin=False):
+        if relogin:
+            self._rest.connect()
+            self._streamer.set_password(self._rest.session_token)
+        self._streamer.connect()
+
+    def stream_metrics(self):
+        """
+        :return: dict of stream counters: messages, messages_per_second, bytes, probes, since_message and
+                 since_probe (seconds), stalls, connections and tick latency (latency_last/latency_avg, milliseconds)
+        """
+        return self._streamer.metrics.as_dict()
+
+    def last_tick_times(self):
+        """
+        :return: dict of symbol to the epoch milliseconds of its last tick received
+        """
+        return dict(self._last_ticks)
+
+    def _check_gap(self, symbol_name, price):
+        last = self._gaps.pop(symbol_name, None)
+        if last is not None and self._on_gap is not None:
+            self._on_gap(symbol_name, last, price.tick_timestamp)
 
     def get_account_info(self):
         self._account_info = self._rest.get_account_info()
         return self._account_info
 
-    def price_symbol_subscribe(self, symbol, callback):
+    def warm_symbols(self, symbols):
+        return self._rest.warm_symbols(symbols)
+
+    def price_symbol_subscribe(self, symbol, callback, max_frequency=None, snapshot=True):
+        """
+        :param symbol: symbol (e.g. EUR/USD)
+        :param callback: called with every Price update of the symbol
+        :param max_frequency: maximum number of updates per second passed to the callback, ``None`` is every update.
+                              The server sends the symbol at the highest frequency requested by its listeners,
+                              updates in between are conflated into the latest price.
+        :param snapshot: start with the current price of the symbol (used by its first listener)
+        :return: listener index
+        """
+        indexes = self.price_symbols_subscribe([symbol], callback, max_frequency=max_frequency, snapshot=snapshot)
+        return indexes[symbol] if indexes else False
+
+    def price_symbols_subscribe(self, symbols, callback, max_frequency=None, snapshot=True, table_size=100):
+        """
+        Subscribe a listener to the prices of many symbols.
+
+        Symbol ids are resolved concurrently and the symbols not subscribed yet share Lightstreamer
+        tables of up to ``table_size`` items, so it's one control request per table instead of one per symbol.
+        See :meth:`price_symbol_subscribe` for the other parameters.
+
+        :return: dict of symbol to listener index
+        """
         if not self._streamer.is_connect:
             log.debug("Streamer not connected.")
             return False
 
-        if self._subscriber.exists(symbol):
-            log.debug("Subscribed before %s", symbol)
-            return self._subscriber.add_listener(symbol, callback)
-        symbol_id = self._rest.get_symbol_id(symbol)
+        symbols = list(dict.fromkeys(symbols))
+        subscribed = [symbol for symbol in symbols if self._subscriber.exists(symbol)]
+        new_symbols = [symbol for symbol in symbols if not self._subscriber.exists(symbol)]
+        if subscribed:
+            log.debug("Subscribed before %s", ", ".join(subscribed))
+        for sub_key in dict.fromkeys(map(self._subscriber.get_sub_key, subscribed)):
+            subscription = self._streamer.subscription(sub_key)
+            if subscription is not None and _is_faster(max_frequency, subscription.max_frequency):
+                self._streamer.reconfigure(sub_key, max_frequency)
 
-        # Making a new Subscription in MERGE mode
-        subscription = StreamerSubscription(
-            mode="MERGE",
-            items=[f"PRICE.{symbol_id}"],
-            fields=[
-                "MarketId",
-                "TickDate",
-                "Bid",
-                "Offer",
-                "Price",
-                "High",
-                "Low",
-                "Change",
-                "Direction",
-                "AuditId",
-                "StatusSummary",
-            ],
-            adapter="PRICES",
-        )
-        subscription.addlistener(self.on_price_update)
-        # Registering the Subscription
-        sub_key = self._streamer.subscribe(subscription)
-        self._subscriber.add_subscriber(symbol, sub_key)
-        log.debug("Subscribed from %s", symbol)
-        return self._subscriber.add_listener(symbol, callback)
+        symbol_ids = self._rest.warm_symbols(new_symbols) if new_symbols else {}
+        # Listeners are registered before the tables are created, so none misses the requested snapshot.
+        for symbol in new_symbols:
+            self._subscriber.add_subscriber(symbol, None)
+        indexes = {}
+        for symbol in symbols:
+            indexes[symbol] = self._add_listener(symbol, callback, max_frequency)
+        # A symbol unsubscribed from a table still alive gets its slot back (without snapshot), not a second table.
+        for symbol in list(new_symbols):
+            sub_key = self._reuse_price_table(symbol, f"PRICE.{symbol_ids[symbol]}")
+            if sub_key is None:
+                continue
+            new_symbols.remove(symbol)
+            self._subscriber.set_sub_key(symbol, sub_key)
+            if _is_faster(max_frequency, self._streamer.subscription(sub_key).max_frequency):
+                self._streamer.reconfigure(sub_key, max_frequency)
+        for start in range(0, len(new_symbols), table_size):
+            table = new_symbols[start : start + table_size]
+            # Making a new Subscription in MERGE mode, updates are routed by item position
+            subscription = StreamerSubscription(
+                mode="MERGE",
+                items=[f"PRICE.{symbol_ids[symbol]}" for symbol in table],
+                fields=PRICE_FIELDS,
+                adapter="PRICES",
+                snapshot=snapshot,
+                max_frequency=max_frequency,
+            )
+            subscription.addlistener(self._price_table_listener(table))
+            # Registering the Subscription
+            sub_key = self._streamer.subscribe(subscription)
+            self._price_tables[sub_key] = table
+            for symbol in table:
+                self._subscriber.set_sub_key(symbol, sub_key)
+            log.debug("Subscribed from %s", ", ".join(table))
+        return indexes
+
+    def _price_table_listener(self, slots):
+        def listener(item):
+            symbol = slots[item.pos - 1]
+            # The table outlives its unsubscribed symbols while others are subscribed.
+            if symbol is not None:
+                self.on_price_update(item, symbol)
+
+        return listener
+
+    def _reuse_price_table(self, symbol, item):
+        for sub_key, slots in self._price_tables.items():
+            subscription = self._streamer.subscription(sub_key)
+            if subscription is not None and item in subscription.item_names:
+                slots[subscription.item_names.index(item)] = symbol
+                return sub_key
+        return None
+
+    def _add_listener(self, name, callback, max_frequency):
+        if max_frequency is None:
+            return self._subscriber.add_listener(name, callback)
+        throttle = Throttle(callback, 1 / max_frequency)
+        index = self._subscriber.add_listener(name, throttle)
+        # The conflated event of a burst goes through the dispatcher too, in order with the other calls.
+        throttle.deliver = partial(self._dispatcher.dispatch, name, index, callback)
+        return index
 
     def unsubscribe_listener(self, index):
         self._subscriber.remove_listener(index)
         log.debug("Unsubscribed listener from %s", index)
         name, i = self._subscriber.split_index(index)
-        if not self._subscriber.get_listeners(name):
-            self._streamer.unsubscribe(self._subscriber.get_sub_key(name))
+        if not self._subscriber.get_listeners(name) and not self._keeps_channel(name):
+            self.unsubscribe(name)
         return True
 
+    def _keeps_channel(self, name):
+        # The order book is fed by the ORDERS stream without listener.
+        return name == 'ORDERS' and self._order_book is not None
+
     def unsubscribe(self, name):
+        sub_key = self._subscriber.get_sub_key(name)
         self._subscriber.remove_subscriber(name)
-        self._streamer.unsubscribe(self._subscriber.get_sub_key(name))
+        slots = self._price_tables.get(sub_key)
+        if slots is not None and name in slots:
+            slots[slots.index(name)] = None
+        # A table shared by several symbols is deleted with its last symbol.
+        if sub_key and sub_key not in set(self._subscriber.sub_keys):
+            self._streamer.unsubscribe(sub_key)
+            self._price_tables.pop(sub_key, None)
         log.debug("Unsubscribed from %s", name)
 
-    def on_price_update(self, data):
-        log.debug("On price update: %s", data)
-        data = data["values"]
-        symbol_id = data['MarketId']
-        symbol_name = self._rest.get_symbol_name(symbol_id)
-        pattern = re.compile(r'Date\(([\d]+)\)')
-        ts = pattern.search(data['TickDate'])[1].strip()
-        tick_datetime = pd.to_datetime(ts, unit='ms').tz_localize('UTC')
-        bid = data['Bid']
-        offer = data['Offer']
-        price = data['Price']
-        high = data['High']
-        low = data['Low']
-        change = data['Change']
-        direction = 1 if str(data['Direction']) == '1' else -1
-        audit_id = data['AuditId']
-        status_summary = data['StatusSummary']
-        price = Price(
-            symbol_id,
-            symbol_name,
-            tick_datetime,
-            bid,
-            offer,
-            price,
-            high,
-            low,
-            change,
-            direction,
-            audit_id,
-            status_summary,
-        )
+    def _dispatch(self, name, event):
+        for index, listener in self._subscriber.get_listener_items(name):
+            self._dispatcher.dispatch(name, index, listener, event)
+
+    def on_price_update(self, item, symbol_name=None):
+        values = item.values
+        if symbol_name is None:
+            symbol_name = self._rest.get_symbol_name(values[0])
+        price = _parse_price(values, symbol_name)
         log.debug("Price update: %s", price)
-        # TODO: change to async
-        for listener in self._subscriber.get_listeners(symbol_name):
-            listener(price)
+        self._last_ticks[symbol_name] = price.tick_timestamp
+        self._streamer.metrics.record_latency(time.time() * 1000 - price.tick_timestamp)
+        if self._gaps:
+            self._check_gap(symbol_name, price)
+        self._ticks.append(symbol_name, price)
+        if self._tick_store is not None:
+            self._tick_store.append_price(price)
+        if self._bars is not None:
+            self._bars.update(price)
+        self._dispatch(symbol_name, price)
+
+    def ticks(self, symbol, last=None):
+        """
+        Most recent ticks received for a subscribed symbol.
+
+        :param symbol: symbol (e.g. EUR/USD)
+        :param last: number of ticks, all the buffered ticks by default
+        :return: numpy structured array (timestamp, bid, offer, price), a view on the live buffer
+        """
+        return self._ticks.view(symbol, last)
+
+    def ticks_frame(self, symbol, last=None):
+        """
+        :return: pd.DataFrame of the most recent ticks indexed like ``RestClient.get_prices``
+        """
+        return self._ticks.to_frame(symbol, last)
+
+    def bars(self, symbol, timeframe, side='mid', last=None):
+        """
+        Closed OHLC bars of a subscribed symbol, built by the ``bars`` BarAggregator.
+
+        :param timeframe: one of the timeframes of the aggregator
+        :param side: mid, bid or ask
+        :param last: number of bars, all the kept bars by default
+        :return: numpy structured array (timestamp, open, high, low, close, ticks), a view on the live buffer
+        """
+        if self._bars is None:
+            raise ForexException("No bar aggregator, pass bars=BarAggregator(...) to the client")
+        return self._bars.bars(symbol, timeframe, side, last)
+
+    def bars_frame(self, symbol, timeframe, side='mid', last=None, current=False):
+        """
+        :param current: append the forming bar
+        :return: pd.DataFrame of the bars indexed like ``RestClient.get_prices``
+        """
+        if self._bars is None:
+            raise ForexException("No bar aggregator, pass bars=BarAggregator(...) to the client")
+        return self._bars.bars_frame(symbol, timeframe, side, last, current)
 
     def orders_subscribe(self, callback):
         if not self._streamer.is_connect:
@@ -151,38 +546,51 @@ class ForexComClient:
             log.debug("Subscribed before %s", channel)
             return self._subscriber.add_listener(channel, callback)
 
+        self._subscriber.add_subscriber(channel, None)
+        index = self._subscriber.add_listener(channel, callback)
+        self._subscribe_orders()
+        return index
+
+    def _subscribe_orders(self):
+        channel = 'ORDERS'
         # Making a new Subscription in MERGE mode
         subscription = StreamerSubscription(
             mode="MERGE",
             items=[channel],
-            fields=[
-                "OrderId",
-                "MarketId",
-                "ClientAccountId",
-                "TradingAccountId",
-                "CurrencyId",
-                "CurrencyISO",
-                "Direction",
-                "AutoRollover",
-                "ExecutionPrice",
-                "LastChangedTime",
-                "OpenPrice",
-                "OriginalLastChangedDateTime",
-                "OriginalQuantity",
-                "PositionMethodId",
-                "Quantity",
-                "Type",
-                "Status",
-                "ReasonId",
-            ],
+            fields=ORDER_FIELDS,
             adapter="ORDERS",
         )
         subscription.addlistener(self.on_orders_update)
         # Registering the Subscription
         sub_key = self._streamer.subscribe(subscription)
-        self._subscriber.add_subscriber(channel, sub_key)
+        self._subscriber.set_sub_key(channel, sub_key)
         log.debug("Subscribed from %s", channel)
-        return self._subscriber.add_listener(channel, callback)
+
+    def _track_orders(self):
+        """Feed the order book from the ORDERS stream, then seed it."""
+        if not self._subscriber.exists('ORDERS'):
+            self._subscriber.add_subscriber('ORDERS', None)
+            self._subscribe_orders()
+        self.sync_order_book()
+
+    @property
+    def order_book(self):
+        return self._order_book
+
+    def sync_order_book(self):
+        """
+        Reconcile the order book with the open positions and active orders of the REST API,
+        the orders closed meanwhile leave the book.
+
+        :return: list of (event, order, previous) of the changes
+        """
+        if self._order_book is None:
+            raise ForexException("No order book, pass order_book=OrderBook() to the client")
+        version = self._order_book.version
+        client_account_id, trading_account_id = self.client_account_id, self.trading_account_id
+        orders = self._rest.get_open_positions(client_account_id, trading_account_id)
+        orders += self._rest.get_active_orders(client_account_id, trading_account_id)
+        return self._order_book.seed(orders, version)
 
     def orders_unsubscribe(self):
         channel = 'ORDERS'
@@ -190,65 +598,75 @@ class ForexComClient:
         log.debug("Unsubscribed from %s", channel)
         return True
 
-    def on_orders_update(self, data):
-        log.debug("On orders update: %s", data)
-        data = data["values"]
-        pattern = re.compile(r'Date\(([\d]+)\)')
-        ts = pattern.search(data['LastChangedTime'])[1].strip()
-        last_changed_time = pd.to_datetime(ts, unit='ms').tz_localize('UTC')
-        ts = pattern.search(data['OriginalLastChangedDateTime'])[1].strip()
-        original_last_changed_date_time = pd.to_datetime(ts, unit='ms').tz_localize('UTC')
-
-        symbol_id = data['MarketId']
-        symbol_name = self._rest.get_symbol_name(symbol_id)
-        order_id = int(data['OrderId'])
-        client_account_id = int(data['ClientAccountId'])
-        trading_account_id = int(data['TradingAccountId'])
-        currency = Currency(int(data['CurrencyId']))
-        position = Position(2 if int(data['Direction']) == 1 else 1)
-        auto_rollover = bool(data['AutoRollover'])
-        open_price = float(data['OpenPrice'])
-        original_quantity = float(data['OriginalQuantity'])
-        position_method_id = PositionMethod(int(data['PositionMethodId']))
-        quantity = float(data['Quantity'])
-        order_type = OrderType.find_by_name(data['Type'])
-        status = OrderStatus.find_by_name(data['Status'])
-        reason_id = int(data['ReasonId'])
-
-        order = Order(
-            order_id=order_id,
-            symbol_id=symbol_id,
-            symbol_name=symbol_name,
-            client_account_id=client_account_id,
-            trading_account_id=trading_account_id,
-            currency=currency,
-            position=position,
-            auto_rollover=auto_rollover,
-            open_price=open_price,
-            last_changed_time=last_changed_time,
-            original_last_changed_date_time=original_last_changed_date_time,
-            original_quantity=original_quantity,
-            position_method=position_method_id,
-            quantity=quantity,
-            order_type=order_type,
-            status=status,
-            reason_id=reason_id,
-        )
+    def on_orders_update(self, item):
+        values = item.values
+        symbol_name = self._rest.get_symbol_name(values[1])
+        order = _parse_order(values, symbol_name)
         log.debug("Orders update: %s", order)
-        # TODO: change to async
-        for listener in self._subscriber.get_listeners("ORDERS"):
-            listener(order)
+        if self._order_book is not None:
+            self._order_book.update(order)
+        self._dispatch("ORDERS", order)
 
-    def order_market_price(self, symbol, position, quantity, offer_price):
+    def order_market_price(self, symbol, position, quantity, offer_price, trading_account_id=None):
+        """
+        :param trading_account_id: trading account of the login, the first one by default
+        """
         return self._rest.order_market_price(
             client_account_id=self.client_account_id,
-            trading_account_id=self.trading_account_id,
+            trading_account_id=trading_account_id or self.trading_account_id,
             symbol=symbol,
             position=position,
             quantity=quantity,
             offer_price=offer_price,
         )
 
+    def order_market_prices(self, orders, trading_account_id=None, max_workers=8):
+        """
+        Submit market orders concurrently, see :meth:`RestClient.order_market_prices`.
+
+        :param orders: (symbol, position, quantity, offer_price) tuples, or dicts of the arguments
+                       of ``order_market_price``
+        :param trading_account_id: trading account of the login, the first one by default
+        :return: list of BatchResult in the order of orders
+        """
+        orders = list(orders)
+        requests = [order if isinstance(order, dict) else dict(zip(MARKET_ORDER_ARGS, order)) for order in orders]
+        trading_account_id = trading_account_id or self.trading_account_id
+        results = self._rest.order_market_prices(self.client_account_id, trading_account_id, requests, max_workers)
+        # The results refer to the orders as given, not to their arguments.
+        for result, order in zip(results, orders):
+            result.request = order
+        return results
+
+    def cancel_order(self, order_id, trading_account_id=None):
+        if trading_account_id is None:
+            trading_account_id = self.trading_account_id
+        return self._rest.cancel_order(trading_account_id, order_id)
+
+    def cancel_orders(self, order_ids, trading_account_id=None, max_workers=8):
+        """
+        Cancel orders concurrently, see :meth:`RestClient.cancel_orders`.
+
+        :return: list of BatchResult in the order of order_ids
+        """
+        if trading_account_id is None:
+            trading_account_id = self.trading_account_id
+        return self._rest.cancel_orders(trading_account_id, order_ids, max_workers)
+
+    @property
+    def symbols(self):
+        return self._rest.symbols
+
+    @property
+    def dispatcher(self):
+        return self._dispatcher
+
+    def listener_stats(self):
+        """
+        :return: dict of listener index to its delivery counters (calls, errors, dropped, conflated, latency)
+        """
+        return self._dispatcher.stats()
+
     @property
     def client_account_id(self):
         if not self._account_info:
@@ -260,3 +678,12 @@ class ForexComClient:
         if not self._account_info:
             self.get_account_info()
         return self._account_info['TradingAccounts'][0]['TradingAccountId']
+
+    @property
+    def trading_account_ids(self):
+        """
+        :return: ids of every trading account of the login
+        """
+        if not self._account_info:
+            self.get_account_info()
+        return [account['TradingAccountId'] for account in self._account_info['TradingAccounts']]
@@ -0,0 +1,377 @@
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger()
+
+
+class ListenerStats:
+    """
+    Delivery counters of one listener.
+
+    Latency is measured from the stream update being dispatched to the listener returning,
+    so it includes the time spent waiting in a queue.
+    """
+
+    __slots__ = ('calls', 'errors', 'dropped', 'conflated', 'latency_total', 'latency_max')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, latency):
+        self.calls += 1
+        self.latency_total += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    @property
+    def latency_avg(self):
+        return self.latency_total / self.calls if self.calls else 0.0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'dropped': self.dropped,
+            'conflated': self.conflated,
+            'latency_avg': self.latency_avg,
+            'latency_max': self.latency_max,
+        }
+
+
+class InlineDispatcher:
+    """
+    Call the listeners on the stream reader thread, the behaviour of the previous versions.
+    A slow listener delays every update of the stream.
+
+    tracer: Tracer told the execution time of each listener call, set by the clients given a tracer.
+    """
+
+    tracer = None
+
+    def __init__(self):
+        self._stats = {}
+
+    def _stats_of(self, index):
+        stats = self._stats.get(index)
+        if stats is None:
+            stats = self._stats[index] = ListenerStats()
+        return stats
+
+    def stats(self):
+        """
+        :return: dict of listener index to its ListenerStats as a dict
+        """
+        return {index: stats.as_dict() for index, stats in list(self._stats.items())}
+
+    def dispatch(self, key, index, listener, event):
+        """
+        :param key: ordering key of the event (the symbol name or the channel)
+        :param index: listener index returned by the subscribe methods
+        """
+        self._call(index, listener, event, time.perf_counter())
+
+    def _call(self, index, listener, event, dispatched):
+        stats = self._stats_of(index)
+        tracer = self.tracer
+        started = time.perf_counter() if tracer is not None else 0
+        error = False
+        try:
+            listener(event)
+        except Exception:
+            stats.errors += 1
+            error = True
+            log.exception("Listener %s failed", index)
+        now = time.perf_counter()
+        stats.record(now - dispatched)
+        if tracer is not None:
+            tracer.listener(index, now - started, error)
+
+    def close(self):
+        pass
+
+
+class _Lane:
+    """
+    Bounded FIFO of pending calls.
+
+    A full lane drops its oldest call. With ``conflate`` a listener has at most one pending call per key
+    (see :meth:`conflation_key`): a new event replaces the pending one, so a lagging listener only gets
+    the latest price, and the latest state of each order.
+    """
+
+    def __init__(self, dispatcher, maxsize, conflate):
+        self._dispatcher = dispatcher
+        self._maxsize = maxsize
+        self._conflate = conflate
+        self._calls = deque()
+        self._pending = {}
+        self.condition = threading.Condition()
+
+    @staticmethod
+    def conflation_key(index, event):
+        # Updates of different orders share the ORDERS listeners, none may replace another.
+        return index, getattr(event, 'order_id', None)
+
+    def put(self, index, listener, event):
+        dispatched = time.perf_counter()
+        with self.condition:
+            if self._conflate:
+                call = self._pending.get(self.conflation_key(index, event))
+                if call is not None:
+                    call[1] = listener
+                    call[2] = event
+                    call[3] = dispatched
+                    self._dispatcher._stats_of(index).conflated += 1
+                    return False
+            if self._maxsize and len(self._calls) >= self._maxsize:
+                dropped = self._calls.popleft()
+                self._pending.pop(self.conflation_key(dropped[0], dropped[2]), None)
+                self._dispatcher._stats_of(dropped[0]).dropped += 1
+            call = [index, listener, event, dispatched]
+            self._calls.append(call)
+            if self._conflate:
+                self._pending[self.conflation_key(index, event)] = call
+            self.condition.notify()
+            return True
+
+    def pop(self):
+        """
+        :return: the oldest call, None if the lane is empty
+        """
+        with self.condition:
+            if not self._calls:
+                return None
+            call = self._calls.popleft()
+            if self._conflate:
+                self._pending.pop(self.conflation_key(call[0], call[2]), None)
+            return call
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class _WorkerDispatcher(InlineDispatcher):
+    """Base of the dispatchers running the listeners on their own threads."""
+
+    def __init__(self, maxsize=10000, conflate=False):
+        super().__init__()
+        self.maxsize = maxsize
+        self.conflate = conflate
+        self._closed = False
+
+    def _work(self, lane):
+        while True:
+            with lane.condition:
+                while not len(lane) and not self._closed:
+                    lane.condition.wait()
+                if self._closed and not len(lane):
+                    return
+            call = lane.pop()
+            if call is not None:
+                self._call(*call)
+
+    def _start(self, lane, name):
+        thread = threading.Thread(target=self._work, args=(lane,), name=name, daemon=True)
+        thread.start()
+        return thread
+
+    def _lanes(self):
+        raise NotImplementedError
+
+    def close(self):
+        self._closed = True
+        for lane in self._lanes():
+            with lane.condition:
+                lane.condition.notify_all()
+
+
+class ThreadPoolDispatcher(_WorkerDispatcher):
+    """
+    Run the listeners on a pool of threads fed by one bounded queue.
+    Updates of a symbol may reach a listener out of order, use SerialDispatcher to keep the order.
+
+    :param max_workers: number of threads
+    :param maxsize: maximum number of pending calls, the oldest is dropped when full (0 is unbounded)
+    :param conflate: keep only the latest pending event of each listener, and order for order updates
+    """
+
+    def __init__(self, max_workers=4, maxsize=10000, conflate=False):
+        super().__init__(maxsize, conflate)
+        self._lane = _Lane(self, maxsize, conflate)
+        self._threads = [self._start(self._lane, f'forexcom-dispatch-{i}') for i in range(max_workers)]
+
+    def _lanes(self):
+        return [self._lane]
+
+    def dispatch(self, key, index, listener, event):
+        self._lane.put(index, listener, event)
+
+
+class SerialDispatcher(_WorkerDispatcher):
+    """
+    Run the listeners of each symbol in the order of the updates, on a fixed set of lanes.
+    A symbol is always run by the same lane (by hash), so a slow listener only delays the symbols of its lane.
+
+    :param maxsize: maximum number of pending calls per lane, the oldest is dropped when full (0 is unbounded)
+    :param conflate: keep only the latest pending event of each listener, and order for order updates
+    :param max_workers: number of lanes, each run by a thread
+    """
+
+    def __init__(self, maxsize=1000, conflate=False, max_workers=8):
+        super().__init__(maxsize, conflate)
+        self._key_lanes = [_Lane(self, maxsize, conflate) for _ in range(max_workers)]
+        self._threads = [self._start(lane, f'forexcom-dispatch-{i}') for i, lane in enumerate(self._key_lanes)]
+
+    def _lanes(self):
+        return self._key_lanes
+
+    def dispatch(self, key, index, listener, event):
+        self._key_lanes[hash(key) % len(self._key_lanes)].put(index, listener, event)
+
+
+class AsyncioDispatcher(InlineDispatcher):
+    """
+    Run the listeners on an asyncio event loop, coroutine functions are scheduled as tasks.
+
+    :param loop: event loop running the listeners
+    :param maxsize: maximum number of pending calls, the oldest is dropped when full (0 is unbounded)
+    :param conflate: keep only the latest pending event of each listener, and order for order updates
+    """
+
+    def __init__(self, loop, maxsize=10000, conflate=False):
+        super().__init__()
+        self._loop = loop
+        self._lane = _Lane(self, maxsize, conflate)
+        self._scheduled = False
+        self._tasks = set()
+
+    def dispatch(self, key, index, listener, event):
+        self._lane.put(index, listener, event)
+        with self._lane.condition:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self):
+        with self._lane.condition:
+            self._scheduled = False
+        while True:
+            call = self._lane.pop()
+            if call is None:
+                return
+            self._call(*call)
+
+    def _call(self, index, listener, event, dispatched):
+        stats = self._stats_of(index)
+        started = time.perf_counter() if self.tracer is not None else 0
+        error = False
+        try:
+            result = listener(event)
+        except Exception:
+            stats.errors += 1
+            error = True
+            log.exception("Listener %s failed", index)
+            result = None
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(self._await(stats, index, result, dispatched, started), loop=self._loop)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            now = time.perf_counter()
+            stats.record(now - dispatched)
+            if self.tracer is not None:
+                self.tracer.listener(index, now - started, error)
+
+    async def _await(self, stats, index, result, dispatched, started):
+        error = False
+        try:
+            await result
+        except Exception:
+            stats.errors += 1
+            error = True
+            log.exception("Listener %s failed", index)
+        now = time.perf_counter()
+        stats.record(now - dispatched)
+        if self.tracer is not None:
+            self.tracer.listener(index, now - started, error)
+
+    def close(self):
+        for task in list(self._tasks):
+            self._loop.call_soon_threadsafe(task.cancel)
+
+
+def _call_later(delay, callback):
+    timer = threading.Timer(delay, callback)
+    timer.daemon = True
+    timer.start()
+
+
+class Throttle:
+    """
+    Listener wrapper delivering at most one event every ``interval`` seconds.
+
+    Events arriving sooner are conflated: the latest one is delivered when the interval ends,
+    so the listener never misses the last price of a burst.
+
+    :param listener: wrapped listener
+    :param interval: minimum time between two calls, in seconds
+    :param call_later: function(delay, callback) scheduling the delivery of a conflated event,
+                       a timer thread by default (``loop.call_later`` on an event loop)
+    :param deliver: function(event) delivering a conflated event, e.g. handing it to the dispatcher
+                    of the listener so it doesn't run on the timer thread, calls the listener by default
+    """
+
+    def __init__(self, listener, interval, call_later=None, deliver=None):
+        self.listener = listener
+        self.interval = interval
+        self.deliver = deliver
+        self._call_later = call_later or _call_later
+        self._last = -interval
+        self._pending = None
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        now = time.monotonic()
+        with self._lock:
+            if self._scheduled:
+                self._pending = event
+                return None
+            wait = self._last + self.interval - now
+            if wait > 0:
+                self._pending = event
+                self._scheduled = True
+            else:
+                self._last = now
+        if wait > 0:
+            self._call_later(wait, self._flush)
+            return None
+        return self.listener(event)
+
+    def _flush(self):
+        # Still scheduled while delivering: events arriving meanwhile are conflated, never delivered concurrently.
+        with self._lock:
+            event, self._pending = self._pending, None
+            self._last = time.monotonic()
+        if self.deliver is not None:
+            self.deliver(event)
+        else:
+            result = self.listener(event)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        with self._lock:
+            if self._pending is None:
+                self._scheduled = False
+                return
+            wait = max(0, self._last + self.interval - time.monotonic())
+        self._call_later(wait, self._flush)
@@ -16,9 +16,11 @@
 
 import logging
 import threading
+import time
 import traceback
 from functools import partial
 
+from forexcom.transport import abort_stream, get_default_transport
 from forexcom.utils import send_request
 
 CONNECTION_URL_PATH = "lightstreamer/create_session.txt"
@@ -30,6 +32,8 @@ OP_ADD = "add"
 OP_DELETE = "delete"
 # Request parameter to force closure of an existing session.
 OP_DESTROY = "destroy"
+# Request parameter to change the maximum update frequency of a Table.
+OP_RECONF = "reconf"
 # List of possible server responses
 PROBE_CMD = "PROBE"
 END_CMD = "END"
@@ -37,36 +41,205 @@ LOOP_CMD = "LOOP"
 ERROR_CMD = "ERROR"
 SYNC_ERROR_CMD = "SYNC ERROR"
 OK_CMD = "OK"
+# Number of bytes read at once from the Stream Connection.
+STREAM_CHUNK_SIZE = 65536
 
 log = logging.getLogger()
 
 
+class ItemUpdate(object):
+    """
+    Current state of a subscribed item, passed to the Subscription listeners.
+
+    ``values`` holds one slot per field, in the order of the Subscription fields.
+    The same object is updated in place on every update of the item, so copy
+    the values a listener wants to keep.
+    """
+
+    __slots__ = ('pos', 'name', 'values', '_field_index')
+
+    def __init__(self, pos, name, field_index):
+        self.pos = pos
+        self.name = name
+        self.values = [None] * len(field_index)
+        self._field_index = field_index
+
+    def get(self, field, default=None):
+        slot = self._field_index.get(field)
+        return default if slot is None else self.values[slot]
+
+    def as_dict(self):
+        return dict(zip(self._field_index, self.values))
+
+    def __getitem__(self, key):
+        # Keeps listeners written against the former item info dict working.
+        if key == 'values':
+            return self.as_dict()
+        if key in ('pos', 'name'):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __repr__(self):
+        return repr({'pos': self.pos, 'name': self.name, 'values': self.as_dict()})
+
+
+class StreamMetrics(object):
+    """
+    Counters of a stream connection.
+
+    Times are ``time.monotonic()`` seconds. The tick latency is the local time at which a price
+    update is dispatched minus its server ``TickDate``, in milliseconds, so it includes the clock
+    offset between the server and this host (and the age of the snapshot of a new subscription).
+    """
+
+    __slots__ = (
+        'messages',
+        'probes',
+        'bytes',
+        'stalls',
+        'connections',
+        'rate',
+        'last_message',
+        'last_probe',
+        'latency_last',
+        'latency_avg',
+        '_window_start',
+        '_window_messages',
+    )
+
+    def __init__(self):
+        now = time.monotonic()
+        self.messages = 0
+        self.probes = 0
+        self.bytes = 0
+        self.stalls = 0
+        self.connections = 0
+        self.rate = 0.0
+        self.last_message = now
+        self.last_probe = None
+        self.latency_last = None
+        self.latency_avg = None
+        self._window_start = now
+        self._window_messages = 0
+
+    def record(self, size, messages=1):
+        now = time.monotonic()
+        self.messages += messages
+        self.bytes += size
+        self.last_message = now
+        if now - self._window_start >= 1.0:
+            self.rate = (self.messages - self._window_messages) / (now - self._window_start)
+            self._window_start = now
+            self._window_messages = self.messages
+
+    def record_probe(self):
+        self.probes += 1
+        self.last_probe = self.last_message
+
+    def record_latency(self, latency):
+        self.latency_last = latency
+        # Exponentially weighted, about the last 100 ticks.
+        if self.latency_avg is None:
+            self.latency_avg = latency
+        else:
+            self.latency_avg += (latency - self.latency_avg) / 100
+
+    @property
+    def since_message(self):
+        return time.monotonic() - self.last_message
+
+    @property
+    def since_probe(self):
+        return None if self.last_probe is None else time.monotonic() - self.last_probe
+
+    def as_dict(self):
+        return {
+            'messages': self.messages,
+            'messages_per_second': self.rate,
+            'bytes': self.bytes,
+            'probes': self.probes,
+            'since_message': self.since_message,
+            'since_probe': self.since_probe,
+            'stalls': self.stalls,
+            'connections': self.connections,
+            'latency_last': self.latency_last,
+            'latency_avg': self.latency_avg,
+        }
+
+
+class LineBuffer(object):
+    """
+    Splits the chunks read from a Stream Connection into lines.
+
+    The incomplete last line of a chunk is kept until the next one completes it.
+    Lines are returned as bytes without their terminator, so they are only decoded when needed.
+    """
+
+    __slots__ = ('_tail',)
+
+    def __init__(self):
+        self._tail = b''
+
+    def feed(self, data):
+        """
+        :param data: bytes read from the stream
+        :return: list of the complete lines
+        """
+        if self._tail:
+            data = self._tail + data
+        end = data.rfind(b'\n')
+        if end < 0:
+            self._tail = data
+            return []
+        self._tail = data[end + 1 :]
+        return data[:end].splitlines()
+
+
+def _frequency_param(max_frequency):
+    return "unlimited" if max_frequency is None else str(max_frequency)
+
+
 class StreamerSubscription(object):
-    """Represents a Subscription to be submitted to a Lightstreamer Server."""
+    """
+    Represents a Subscription to be submitted to a Lightstreamer Server.
+
+    :param snapshot: request the current state of the items first (bool), or the number of events for DISTINCT
+    :param max_frequency: maximum number of updates per second and item, sent by the server
+                          (MERGE mode conflates the skipped updates), ``None`` is unlimited
+    :param buffer_size: number of updates the server buffers per item when the client is slower
+    """
 
-    def __init__(self, mode, items, fields, adapter=""):
+    def __init__(self, mode, items, fields, adapter="", snapshot=True, max_frequency=None, buffer_size=None):
         self.item_names = items
         self._items_map = {}
         self.field_names = fields
+        self.field_index = {field: slot for slot, field in enumerate(fields)}
         self.adapter = adapter
         self.mode = mode
-        self.snapshot = "true"
+        self.snapshot = snapshot
+        self.max_frequency = max_frequency
+        self.buffer_size = buffer_size
         self._listeners = []
 
-    def _decode(self, value, last):
-        """Decode the field value according to
-        Lightstreamer Text Protocol specifications.
+    def table_params(self, table):
         """
-        if value == "$":
-            return u''
-        elif value == "#":
-            return None
-        elif not value:
-            return last
-        elif value[0] in "#$":
-            value = value[1:]
-
-        return value
+        :return: control request parameters creating the Table of this Subscription
+        """
+        params = {
+            "LS_table": table,
+            "LS_op": OP_ADD,
+            "LS_data_adapter": self.adapter,
+            "LS_mode": self.mode,
+            "LS_schema": " ".join(self.field_names),
+            "LS_id": " ".join(self.item_names),
+        }
+        # The server sends no snapshot unless requested.
+        params["LS_snapshot"] = str(self.snapshot).lower()
+        if self.max_frequency is not None:
+            params["LS_requested_max_frequency"] = _frequency_param(self.max_frequency)
+        if self.buffer_size is not None:
+            params["LS_requested_buffer_size"] = str(self.buffer_size)
+        return params
 
     def addlistener(self, listener):
         self._listeners.append(listener)
@@ -77,37 +250,59 @@ class StreamerSubscription(object):
         """
         # Tokenize the item line as sent by Lightstreamer
         toks = item_line.rstrip('\r\n').split('|')
-        undecoded_item = dict(list(zip(self.field_names, toks[1:])))
 
-        # Retrieve the previous item stored into the map, if present.
-        # Otherwise create a new empty dict.
+        # Retrieve the state of the item, it's created on its first update.
         item_pos = int(toks[0])
-        curr_item = self._items_map.get(item_pos, {})
-        # Update the map with new values, merging with the
-        # previous ones if any.
-        self._items_map[item_pos] = dict(
-            [(k, self._decode(v, curr_item.get(k))) for k, v in list(undecoded_item.items())],
-        )
-        # Make an item info as a new event to be passed to listeners
-        item_info = {
-            'pos': item_pos,
-            'name': self.item_names[item_pos - 1],
-            'values': self._items_map[item_pos],
-        }
+        item = self._items_map.get(item_pos)
+        if item is None:
+            item = self._items_map[item_pos] = ItemUpdate(item_pos, self.item_names[item_pos - 1], self.field_index)
+
+        # Decode the field values according to Lightstreamer Text Protocol
+        # specifications and merge them in place with the previous ones:
+        # an empty value means unchanged, "$" is an empty string, "#" is null.
+        values = item.values
+        slot = -1
+        for value in toks:
+            if slot >= 0 and value:
+                if value == "$":
+                    values[slot] = ''
+                elif value == "#":
+                    values[slot] = None
+                elif value[0] in "#$":
+                    values[slot] = value[1:]
+                else:
+                    values[slot] = value
+            slot += 1
 
         # Update each registered listener with new event
         for on_item_update in self._listeners:
-            on_item_update(item_info)
+            on_item_update(item)
 
 
 class StreamerClient(object):
-    """Manages the communication with Lightstreamer Server"""
-
-    def __init__(self, base_url=None, adapter_set=""):
+    """
+    Manages the communication with Lightstreamer Server
+
+    :param keepalive: interval in seconds of the PROBE messages the server sends on an idle stream
+    :param stall_timeout: seconds without any message (updates or PROBE) after which the stream connection
+                          is dropped as stalled, e.g. half-open. By default 3 times the keepalive interval of
+                          the session, 0 disables it.
+    :param tracer: Tracer of the stream requests, messages and connection events
+    """
+
+    def __init__(
+        self, base_url=None, adapter_set="", transport=None, keepalive=None, stall_timeout=None, tracer=None
+    ):
         if not base_url:
             base_url = 'https://push.cityindex.com/'
+        if transport is None:
+            transport = get_default_transport()
         self._base_url = base_url
-        self._call = partial(send_request, 'POST', stream=True)
+        # Stream connections (create/bind) own a dedicated socket, control
+        # requests go through the keep-alive pool of the transport.
+        self._call = partial(send_request, 'POST', stream=True, transport=transport, tracer=tracer)
+        self._send = partial(send_request, 'POST', transport=transport, tracer=tracer)
+        self._tracer = tracer
         self._adapter_set = adapter_set
         self._username = None
         self._password = None
@@ -117,6 +312,13 @@ class StreamerClient(object):
         self._stream_connection = None
         self._stream_connection_thread = None
         self._bind_counter = 0
+        self._closing = False
+        # Called with (reason, subscriptions) when the session is lost, see _session_lost.
+        self.on_session_lost = None
+        self._keepalive = keepalive
+        self._stall_timeout = stall_timeout
+        self._watchdog_thread = None
+        self.metrics = StreamMetrics()
 
     def _set_control_link_url(self, custom_address=None):
         """Set the address to use for the Control Connection
@@ -132,14 +334,61 @@ class StreamerClient(object):
         that manage the content of Stream Connection.
         """
         params["LS_session"] = self._session["SessionId"]
-        response = self._call(self._control_url, CONTROL_URL_PATH, params)
-        decoded_response = response.readline().decode("utf-8").rstrip()
+        response = self._send(self._control_url, CONTROL_URL_PATH, params)
+        decoded_response = response.decode("utf-8").split("\n", 1)[0].rstrip()
         log.debug("Server response: <%s>", decoded_response)
         return decoded_response
 
     def _read_from_stream(self):
         """Read a single line of content of the Stream Connection."""
-        return self._stream_connection.readline().decode("utf-8").rstrip()
+        line = self._stream_connection.readline()
+        self.metrics.record(len(line))
+        return line.decode("utf-8").rstrip()
+
+    def _stream_lines(self):
+        """Lines of the Stream Connection (bytes), read in chunks of STREAM_CHUNK_SIZE bytes."""
+        connection = self._stream_connection
+        lines = LineBuffer()
+        while True:
+            data = connection.read1(STREAM_CHUNK_SIZE)
+            if not data:
+                return
+            chunk = lines.feed(data)
+            self.metrics.record(len(data), len(chunk))
+            if self._tracer is not None:
+                self._tracer.stream_messages(len(chunk), len(data))
+            yield from chunk
+
+    def _stream_params(self, params):
+        if self._keepalive is not None:
+            params["LS_keepalive_millis"] = int(self._keepalive * 1000)
+        return params
+
+    def _stall_seconds(self):
+        if self._stall_timeout is not None:
+            return self._stall_timeout
+        keepalive = self._session.get("KeepaliveMillis")
+        return 3 * int(keepalive) / 1000 if keepalive else 0
+
+    def _start_watchdog(self):
+        if self._watchdog_thread is not None and self._watchdog_thread.is_alive():
+            return
+        self._watchdog_thread = threading.Thread(name="StreamWatchdog", target=self._watch, daemon=True)
+        self._watchdog_thread.start()
+
+    def _watch(self):
+        """Drop the stream connection when no message came for the stall timeout."""
+        while not self._closing and self._stream_connection is not None:
+            timeout = self._stall_seconds()
+            time.sleep(min(timeout / 4, 1) if timeout else 1)
+            connection = self._stream_connection
+            if timeout and connection is not None and self.metrics.since_message > timeout:
+                log.warning("No message for %.1fs, dropping the stream connection", self.metrics.since_message)
+                self.metrics.stalls += 1
+                self.metrics.last_message = time.monotonic()
+                if self._tracer is not None:
+                    self._tracer.stream_event('stalled')
+                abort_stream(connection)
 
     def set_password(self, password):
         log.debug("Set password to <%s>", f'{password[:3]}{"*"*(len(password)-6)}{password[-3:]}')
@@ -154,16 +403,19 @@ class StreamerClient(object):
         session.
         """
         log.debug("Opening a new session to <%s>", self._base_url)
+        self._closing = False
         self._stream_connection = self._call(
             self._base_url,
             CONNECTION_URL_PATH,
-            {
-                "LS_op2": 'create',
-                "LS_cid": 'mgQkwtwdysogQz2BJ4Ji kOj2Bg',
-                "LS_adapter_set": self._adapter_set,
-                "LS_user": self._username,
-                "LS_password": self._password,
-            },
+            self._stream_params(
+                {
+                    "LS_op2": 'create',
+                    "LS_cid": 'mgQkwtwdysogQz2BJ4Ji kOj2Bg',
+                    "LS_adapter_set": self._adapter_set,
+                    "LS_user": self._username,
+                    "LS_password": self._password,
+                }
+            ),
         )
         stream_line = self._read_from_stream()
         log.debug("Stream line is <%s>", stream_line)
@@ -177,15 +429,15 @@ class StreamerClient(object):
         """Replace a completely consumed connection in listening for an active
         Session.
         """
-        log.debug("Binding to <%s>", self._control_url.geturl())
+        log.debug("Binding to <%s>", self._control_url)
         self._stream_connection = self._call(
-            self._control_url, BIND_URL_PATH, {"LS_session": self._session["SessionId"]}
+            self._control_url, BIND_URL_PATH, self._stream_params({"LS_session": self._session["SessionId"]})
         )
 
         self._bind_counter += 1
         stream_line = self._read_from_stream()
         self._handle_stream(stream_line)
-        log.info("Bound to <%s>", self._control_url.geturl())
+        log.info("Bound to <%s>", self._control_url)
 
     def _handle_stream(self, stream_line):
         if stream_line == OK_CMD:
@@ -197,6 +449,10 @@ class StreamerClient(object):
                 self._session[session_key] = session_value
             # Setup of the control link url
             self._set_control_link_url(self._session.get("ControlAddress"))
+            self.metrics.connections += 1
+            self.metrics.last_message = time.monotonic()
+            if self._tracer is not None:
+                self._tracer.stream_event('connected')
 
             # Start a new thread to handle real time updates sent
             # by Lightstreamer Server on the stream connection.
@@ -205,6 +461,7 @@ class StreamerClient(object):
             )
             self._stream_connection_thread.setDaemon(True)
             self._stream_connection_thread.start()
+            self._start_watchdog()
             log.info("Started handling of real-time stream")
         else:
             lines = self._stream_connection.readlines()
@@ -225,9 +482,15 @@ class StreamerClient(object):
         """Request to close the session previously opened with the connect()
         invocation.
         """
+        self._closing = True
         if self._stream_connection is not None:
             log.debug("Closing session to <%s>", self._base_url)
-            _ = self._control({"LS_op": OP_DESTROY})
+            try:
+                _ = self._control({"LS_op": OP_DESTROY})
+            except Exception:
+                # The stream connection is dropped instead, its thread must not outlive the session.
+                log.warning("Destroying the session failed", exc_info=True)
+                abort_stream(self._stream_connection)
             # There is no need to explicitly close the connection, since it is
             # handled by thread completion.
             self._join()
@@ -243,22 +506,44 @@ class StreamerClient(object):
 
         # Send the control request to perform the subscription
         log.debug("Making a new subscription request")
-        server_response = self._control(
-            {
-                "LS_table": self._current_subscription_key,
-                "LS_op": OP_ADD,
-                "LS_data_adapter": subscription.adapter,
-                "LS_mode": subscription.mode,
-                "LS_schema": " ".join(subscription.field_names),
-                "LS_id": " ".join(subscription.item_names),
-            }
-        )
+        server_response = self._control(subscription.table_params(self._current_subscription_key))
         if server_response == OK_CMD:
             log.info("Successfully subscribed ")
         else:
             log.warning("Subscription error")
         return self._current_subscription_key
 
+    def resubscribe(self, subscriptions):
+        """
+        Subscribe again the Subscriptions of a lost session, in their original order.
+
+        :param subscriptions: dict of former subscription key to Subscription
+        :return: dict of former subscription key to the new one
+        """
+        return {key: self.subscribe(subscriptions[key]) for key in sorted(subscriptions)}
+
+    def subscription(self, subscription_key):
+        return self._subscriptions.get(subscription_key)
+
+    def reconfigure(self, subscription_key, max_frequency=None):
+        """Change the maximum update frequency of a Subscription, ``None`` is unlimited."""
+        subscription = self._subscriptions.get(subscription_key)
+        if subscription is None:
+            log.warning("No subscription key %s found!", subscription_key)
+            return False
+        server_response = self._control(
+            {
+                "LS_table": subscription_key,
+                "LS_op": OP_RECONF,
+                "LS_requested_max_frequency": _frequency_param(max_frequency),
+            }
+        )
+        if server_response != OK_CMD:
+            log.warning("Reconfiguration error")
+            return False
+        subscription.max_frequency = max_frequency
+        return True
+
     def unsubscribe(self, subcription_key):
         """Unregister the Subscription associated with the
         specified subscription_key.
@@ -275,80 +560,108 @@ class StreamerClient(object):
         else:
             log.warning("No subscription key %s found!", subcription_key)
 
-    def _forward_update_message(self, update_message):
-        """Forwards the real time update to the relative
+    def _forward_update_message(self, line):
+        """Forwards the real time update (bytes) to the relative
         Subscription instance for further dispatching to its listeners.
+        The table number is parsed from the bytes, only the item part of the line is decoded.
         """
-        log.debug("Received update message: <%s>", update_message)
         try:
-            tok = update_message.split(',', 1)
-            table, item = int(tok[0]), tok[1]
-            if table in self._subscriptions:
-                self._subscriptions[table].notifyupdate(item)
-            else:
-                log.warning("No subscription found!")
+            table, item = line.split(b",", 1)
+            table = int(table)
+            item = item.decode("utf-8")
+        except ValueError:
+            # UnicodeDecodeError included, a corrupt line doesn't end the stream.
+            log.warning("Malformed update message skipped: <%r>", line)
+            return
+        subscription = self._subscriptions.get(table)
+        if subscription is None:
+            log.warning("No subscription found!")
+            return
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Received update message: <%s,%s>", table, item)
+        try:
+            subscription.notifyupdate(item)
         except Exception:
             print(traceback.format_exc())
 
     def _receive(self):
         rebind = False
-        receive = True
-        while receive:
-            log.debug("Waiting for a new message")
+        reason = "connection lost"
+        try:
+            for line in self._stream_lines():
+                if line[:1].isdigit():
+                    # Real time update "<table>,<item>|<values>", the bulk of the stream.
+                    self._forward_update_message(line)
+                    continue
+                message = line.decode("utf-8").rstrip()
+                if not message:
+                    continue
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Received message: <%s>", message)
+                if message == PROBE_CMD:
+                    # Skipping the PROBE message, keep on receiving messages.
+                    self.metrics.record_probe()
+                elif message.startswith(ERROR_CMD):
+                    # Terminate the receiving loop on ERROR message
+                    reason = message
+                    log.error("ERROR")
+                    break
+                elif message.startswith(LOOP_CMD):
+                    # Terminate the the receiving loop on LOOP message,
+                    # the session goes on through a new bind connection.
+                    log.debug("LOOP")
+                    rebind = True
+                    break
+                elif message.startswith(SYNC_ERROR_CMD):
+                    # Terminate the receiving loop on SYNC ERROR message,
+                    # the session is lost and has to be created again.
+                    log.error("SYNC ERROR")
+                    reason = message
+                    break
+                elif message.startswith(END_CMD):
+                    # Terminate the receiving loop on END message.
+                    # The session has been forcibly closed on the server side.
+                    log.info("Connection closed by the server")
+                    reason = message
+                    break
+                elif message.startswith("Preamble"):
+                    # Skipping Preamble message, keep on receiving messages.
+                    log.debug("Preamble")
+                else:
+                    log.warning("Unexpected message: <%s>", message)
+            else:
+                log.warning("No new message received")
+        except Exception:
+            log.error("Communication error")
+            print(traceback.format_exc())
+
+        if rebind:
+            log.debug("Binding to this active session")
             try:
-                message = self._read_from_stream()
-                log.debug("Received message: <%s>", message)
-                if not message.strip():
-                    message = None
+                self.bind()
+                return
             except Exception:
-                log.error("Communication error")
-                print(traceback.format_exc())
-                message = None
+                log.exception("Binding to <%s> failed", self._control_url)
+                reason = "bind failed"
 
-            if message is None:
-                receive = False
-                log.warning("No new message received")
-            elif message == PROBE_CMD:
-                # Skipping the PROBE message, keep on receiving messages.
-                log.debug("PROBE message")
-            elif message.startswith(ERROR_CMD):
-                # Terminate the receiving loop on ERROR message
-                receive = False
-                log.error("ERROR")
-            elif message.startswith(LOOP_CMD):
-                # Terminate the the receiving loop on LOOP message.
-                # A complete implementation should proceed with
-                # a rebind of the session.
-                log.debug("LOOP")
-                receive = False
-                rebind = True
-            elif message.startswith(SYNC_ERROR_CMD):
-                # Terminate the receiving loop on SYNC ERROR message.
-                # A complete implementation should create a new session
-                # and re-subscribe to all the old items and relative fields.
-                log.error("SYNC ERROR")
-                receive = False
-            elif message.startswith(END_CMD):
-                # Terminate the receiving loop on END message.
-                # The session has been forcibly closed on the server side.
-                # A complete implementation should handle the
-                # "cause_code" if present.
-                log.info("Connection closed by the server")
-                receive = False
-            elif message.startswith("Preamble"):
-                # Skipping Preamble message, keep on receiving messages.
-                log.debug("Preamble")
-            else:
-                self._forward_update_message(message)
-
-        if not rebind:
-            log.debug("No rebind to <%s>, clearing internal session data", self._base_url)
-            # Clear internal data structures for session
-            # and subscriptions management.
-            self._stream_connection = None
-            self._session.clear()
-            self._subscriptions.clear()
-            self._current_subscription_key = 0
-        else:
-            log.debug("Binding to this active session")
-            self.bind()
+        log.debug("No rebind to <%s>, clearing internal session data", self._base_url)
+        # Clear internal data structures for session
+        # and subscriptions management.
+        subscriptions = dict(self._subscriptions)
+        self._stream_connection = None
+        self._session.clear()
+        self._subscriptions.clear()
+        self._current_subscription_key = 0
+        self._session_lost(reason, subscriptions)
+
+    def _session_lost(self, reason, subscriptions):
+        """Hand the Subscriptions of a session lost without disconnect() to on_session_lost."""
+        if not self._closing and self._tracer is not None:
+            self._tracer.stream_event('lost')
+        if self._closing or self.on_session_lost is None:
+            return
+        log.warning("Session lost: %s", reason)
+        try:
+            self.on_session_lost(reason, subscriptions)
+        except Exception:
+            log.exception("Session lost handler failed")
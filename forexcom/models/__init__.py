@@ -1,3 +1,5 @@
+from .bars import Bar  # noqa
+from .batch import BatchResult  # noqa
 from .enums import (  # noqa
     Currency,
     InstructionStatus,
@@ -11,3 +13,4 @@ from .enums import (  # noqa
 from .orders import Order  # noqa
 from .prices import Price  # noqa
 from .subscribers import Subscriber  # noqa
+from .symbols import SymbolRegistry  # noqa
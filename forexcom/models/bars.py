@@ -0,0 +1,38 @@
+from forexcom.utils import ms_to_timestamp
+
+
+class Bar:
+    """
+    OHLC bar of a symbol.
+
+    timestamp: start of the bar in epoch milliseconds, the bar covers [timestamp, timestamp + timeframe).
+    datetime: start of the bar, built lazily from timestamp.
+    side: price aggregated, mid, bid or ask.
+    ticks: number of ticks aggregated.
+    """
+
+    __slots__ = ('symbol_name', 'timeframe', 'side', 'timestamp', '_datetime', 'open', 'high', 'low', 'close', 'ticks')
+
+    def __init__(self, symbol_name, timeframe, side, timestamp, open, high, low, close, ticks):
+        self.symbol_name = symbol_name
+        self.timeframe = timeframe
+        self.side = side
+        self.timestamp = timestamp
+        self._datetime = None
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.ticks = ticks
+
+    @property
+    def datetime(self):
+        if self._datetime is None:
+            self._datetime = ms_to_timestamp(self.timestamp)
+        return self._datetime
+
+    def __str__(self):
+        return (
+            f"{self.datetime} | {self.symbol_name} | {self.timeframe} | {self.side} | "
+            f"{self.open} | {self.high} | {self.low} | {self.close} | {self.ticks}"
+        )
@@ -0,0 +1,33 @@
+class BatchResult:
+    """
+    Outcome of one request of a batch (see ``order_market_prices`` / ``cancel_orders``).
+
+    request: arguments of the request, as given to the batch.
+    result: value returned by the request, None if it failed.
+    error: exception raised by the request, None if it succeeded.
+    elapsed: round-trip time of the request in seconds.
+    """
+
+    __slots__ = ('request', 'result', 'error', 'elapsed')
+
+    def __init__(self, request, result=None, error=None, elapsed=0.0):
+        self.request = request
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def get(self):
+        """
+        :return: the result, or raise the exception of the request
+        """
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def __str__(self):
+        outcome = self.result if self.error is None else f"{type(self.error).__name__}: {self.error}"
+        return f"{self.request} | {outcome} | {self.elapsed * 1000:.1f}ms"
@@ -1,7 +1,34 @@
+from forexcom.utils import ms_to_timestamp
+
 from .enums import OrderStatus, OrderType, Position, PositionMethod
 
 
 class Order:
+    """
+    last_changed_time / original_last_changed_date_time: built lazily when they are given
+    as epoch milliseconds (see last_changed_timestamp / original_last_changed_timestamp).
+    """
+
+    __slots__ = (
+        'order_id',
+        'symbol_id',
+        'symbol_name',
+        'client_account_id',
+        'trading_account_id',
+        'currency',
+        'position',
+        'auto_rollover',
+        '_last_changed_time',
+        'open_price',
+        '_original_last_changed_date_time',
+        'original_quantity',
+        'position_method',
+        'quantity',
+        'order_type',
+        'status',
+        'reason_id',
+    )
+
     def __init__(
         self,
         order_id: int,
@@ -22,6 +49,10 @@ class Order:
         last_changed_time=None,
         auto_rollover: bool = False,
     ):
+        """
+        :param original_last_changed_date_time: epoch milliseconds (int) or a datetime
+        :param last_changed_time: epoch milliseconds (int) or a datetime
+        """
         self.order_id = order_id
         self.symbol_id = symbol_id
         self.symbol_name = symbol_name
@@ -30,9 +61,9 @@ class Order:
         self.currency = currency
         self.position = position
         self.auto_rollover = auto_rollover
-        self.last_changed_time = last_changed_time
+        self._last_changed_time = last_changed_time
         self.open_price = open_price
-        self.original_last_changed_date_time = original_last_changed_date_time
+        self._original_last_changed_date_time = original_last_changed_date_time
         self.original_quantity = original_quantity
         self.position_method = position_method
         self.quantity = quantity
@@ -40,6 +71,40 @@ class Order:
         self.status = status
         self.reason_id = reason_id
 
+    @staticmethod
+    def _to_ms(value):
+        if value is None or isinstance(value, int):
+            return value
+        return int(value.timestamp() * 1000)
+
+    @property
+    def last_changed_timestamp(self):
+        return self._to_ms(self._last_changed_time)
+
+    @property
+    def last_changed_time(self):
+        if isinstance(self._last_changed_time, int):
+            self._last_changed_time = ms_to_timestamp(self._last_changed_time)
+        return self._last_changed_time
+
+    @last_changed_time.setter
+    def last_changed_time(self, value):
+        self._last_changed_time = value
+
+    @property
+    def original_last_changed_timestamp(self):
+        return self._to_ms(self._original_last_changed_date_time)
+
+    @property
+    def original_last_changed_date_time(self):
+        if isinstance(self._original_last_changed_date_time, int):
+            self._original_last_changed_date_time = ms_to_timestamp(self._original_last_changed_date_time)
+        return self._original_last_changed_date_time
+
+    @original_last_changed_date_time.setter
+    def original_last_changed_date_time(self, value):
+        self._original_last_changed_date_time = value
+
     def __str__(self):
         return (
             f"{self.last_changed_time} | {self.order_id} | {self.symbol_name} | {self.position} |"
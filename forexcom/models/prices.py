@@ -1,5 +1,9 @@
+from forexcom.utils import ms_to_timestamp
+
+
 class Price:
     """
+    tick_datetime: Tick time, built lazily from tick_timestamp (epoch milliseconds).
     direction: The direction of movement since the last price. 1 == up, -1 == down.
     audit_id: Unique identifier for each price tick. Read this value from the prices stream.
               Treat it as a unique but random string.
@@ -7,6 +11,22 @@ class Price:
                     Values are: 0 = Normal 1 = Indicative 2 = PhoneOnly 3 = Suspended 4 = Closed
     """
 
+    __slots__ = (
+        'symbol_id',
+        'symbol_name',
+        'tick_timestamp',
+        '_tick_datetime',
+        'bid',
+        'offer',
+        'price',
+        'high',
+        'low',
+        'change',
+        'direction',
+        'audit_id',
+        'status_summary',
+    )
+
     def __init__(
         self,
         symbol_id,
@@ -22,9 +42,17 @@ class Price:
         audit_id,
         status_summary,
     ):
+        """
+        :param tick_datetime: epoch milliseconds (int) or a datetime
+        """
         self.symbol_id = symbol_id
         self.symbol_name = symbol_name
-        self.tick_datetime = tick_datetime
+        if isinstance(tick_datetime, int):
+            self.tick_timestamp = tick_datetime
+            self._tick_datetime = None
+        else:
+            self.tick_timestamp = int(tick_datetime.timestamp() * 1000) if tick_datetime is not None else None
+            self._tick_datetime = tick_datetime
         self.bid = bid
         self.offer = offer
         self.price = price
@@ -35,6 +63,17 @@ class Price:
         self.audit_id = audit_id
         self.status_summary = status_summary
 
+    @property
+    def tick_datetime(self):
+        if self._tick_datetime is None and self.tick_timestamp is not None:
+            self._tick_datetime = ms_to_timestamp(self.tick_timestamp)
+        return self._tick_datetime
+
+    @tick_datetime.setter
+    def tick_datetime(self, value):
+        self.tick_timestamp = int(value.timestamp() * 1000) if value is not None else None
+        self._tick_datetime = value
+
     def __str__(self):
         return (
             f"{self.tick_datetime} | {self.symbol_name} | {self.bid} | {self.offer} | {self.change} | {self.direction}"
@@ -17,10 +17,18 @@ class Listener:
     def sub_key(self):
         return self._sub_key
 
+    @sub_key.setter
+    def sub_key(self, sub_key):
+        self._sub_key = sub_key
+
     @property
     def listeners(self):
         return self._listener.values()
 
+    @property
+    def items(self):
+        return self._listener.items()
+
     def add(self, listener):
         self._last_index += 1
         index = self._get_index(self._last_index)
@@ -75,9 +83,29 @@ class Subscriber:
     def get_listeners(self, name):
         return self._subscriber[name].listeners if self.exists(name) else []
 
+    def get_listener_items(self, name):
+        """
+        :return: (listener index, listener) pairs of a subscriber
+        """
+        if not self.exists(name):
+            return []
+        return [(self.join_index(name, index), listener) for index, listener in list(self._subscriber[name].items)]
+
     def get_sub_key(self, name):
         return self._subscriber[name].sub_key if self.exists(name) else ''
 
+    def set_sub_key(self, name, sub_key):
+        if not self.exists(name):
+            raise ValueError(f"{name} subscriber does not exists.")
+        self._subscriber[name].sub_key = sub_key
+
+    def replace_sub_keys(self, sub_keys):
+        """
+        :param sub_keys: dict of former subscription key to the new one, after a resubscription
+        """
+        for lis in self._subscriber.values():
+            lis.sub_key = sub_keys.get(lis.sub_key, lis.sub_key)
+
     @property
     def sub_keys(self):
         return map(lambda x: self._subscriber[x].sub_key, self._subscriber.keys())
@@ -0,0 +1,74 @@
+import threading
+
+
+class SymbolRegistry:
+    """
+    Bidirectional symbol name <-> market id registry of a client.
+
+    Lookups are lock free dict reads so they can run on every tick, writes are serialized.
+    Market ids are indexed both as int and str because the stream delivers them as text.
+    hits/misses count the lookups answered (or not) from the registry.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._names = {}
+        self._markets = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, name, symbol_id, info=None):
+        """
+        :param name: symbol (e.g. EUR/USD)
+        :param symbol_id: market id
+        :param info: market metadata returned by the API
+        """
+        symbol_id = int(symbol_id)
+        with self._lock:
+            self._ids[name] = symbol_id
+            self._names[symbol_id] = name
+            self._names[str(symbol_id)] = name
+            if info is not None:
+                self._markets[symbol_id] = info
+
+    def get_id(self, name):
+        symbol_id = self._ids.get(name)
+        if symbol_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return symbol_id
+
+    def get_name(self, symbol_id):
+        name = self._names.get(symbol_id)
+        if name is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return name
+
+    def get_info(self, symbol_id):
+        return self._markets.get(int(symbol_id))
+
+    def items(self):
+        """(name, market id) pairs."""
+        return list(self._ids.items())
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._names.clear()
+            self._markets.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self):
+        return {'size': len(self._ids), 'hits': self.hits, 'misses': self.misses}
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def __len__(self):
+        return len(self._ids)
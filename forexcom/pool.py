@@ -0,0 +1,224 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import ForexComClient
+from .exceptions import ForexException
+from .models import SymbolRegistry
+from .rest import run_batch
+from .transport import HTTPTransport
+
+log = logging.getLogger()
+
+
+class ClientPool:
+    """
+    Clients of several logins sharing one HTTP connection pool, one symbol registry and one market data stream.
+
+    The first login added is the market data session: its stream carries the price subscriptions of the pool,
+    a symbol is subscribed once and fanned out to all its listeners. The other logins only log in to the REST API,
+    their stream is opened when their order updates are subscribed. Orders are routed to the login owning
+    the trading account they're sent for.
+
+    :param transport: HTTPTransport of every client, by default a new one with ``pool_size`` connections
+    :param rate_limiter: RateLimiter shared by the REST requests of every client
+    :param tracer: Tracer of every client
+    :param dispatcher: runs the listeners of every client, closed by the caller when done
+    :param max_workers: number of logins connected concurrently
+    :param market_options: other ForexComClient arguments of the market data client (tick_store, bars...)
+    """
+
+    def __init__(
+        self,
+        rest_url=None,
+        stream_url=None,
+        transport=None,
+        pool_size=20,
+        timeout=30,
+        rate_limiter=None,
+        tracer=None,
+        dispatcher=None,
+        max_workers=8,
+        **market_options,
+    ):
+        self._own_transport = transport is None
+        if transport is None:
+            transport = HTTPTransport(pool_size=pool_size, timeout=timeout, tracer=tracer)
+        self._transport = transport
+        self._options = {
+            'rest_url': rest_url,
+            'stream_url': stream_url,
+            'transport': transport,
+            'symbols': SymbolRegistry(),
+            'rate_limiter': rate_limiter,
+            'tracer': tracer,
+            'dispatcher': dispatcher,
+        }
+        self._market_options = market_options
+        self._max_workers = max_workers
+        self._logins = {}
+        self._accounts = {}
+        # Logins with an open stream, the others are only logged in to the REST API.
+        self._streaming = set()
+        self._market = None
+
+    def add_login(self, username, password, app_key):
+        """
+        :return: the ForexComClient of the login, connected by :meth:`connect`
+        """
+        if username in self._logins:
+            raise ForexException(f"Login <{username}> already in the pool")
+        if self._market is None:
+            client = ForexComClient(username, password, app_key, **self._options, **self._market_options)
+            self._market = client
+        else:
+            client = ForexComClient(username, password, app_key, tick_buffer_size=0, **self._options)
+        self._logins[username] = client
+        return client
+
+    def connect(self):
+        """
+        Log in every login concurrently and map their trading accounts, then open the market data stream.
+        """
+        if self._market is None:
+            raise ForexException("No login in the pool, see add_login")
+        usernames = list(self._logins)
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            accounts = executor.map(self._connect_login, [self._logins[username] for username in usernames])
+            for username, trading_account_ids in zip(usernames, accounts):
+                for trading_account_id in trading_account_ids:
+                    self._accounts[trading_account_id] = username
+        self._market.connect()
+        self._streaming.add(next(iter(self._logins)))
+        log.info("Pool connected, %s logins and %s trading accounts", len(self._logins), len(self._accounts))
+
+    @staticmethod
+    def _connect_login(client):
+        client.connect(stream=False)
+        return client.trading_account_ids
+
+    def disconnect(self):
+        for username in list(self._streaming):
+            self._logins[username].disconnect()
+        self._streaming.clear()
+        if self._own_transport:
+            self._transport.close()
+
+    @property
+    def market(self):
+        """
+        :return: the ForexComClient of the market data session
+        """
+        return self._market
+
+    @property
+    def symbols(self):
+        return self._options['symbols']
+
+    @property
+    def transport(self):
+        return self._transport
+
+    @property
+    def trading_account_ids(self):
+        return list(self._accounts)
+
+    def login(self, username):
+        """
+        :return: the ForexComClient of a login
+        """
+        try:
+            return self._logins[username]
+        except KeyError:
+            raise ForexException(f"Unknown login <{username}>") from None
+
+    def client(self, trading_account_id):
+        """
+        :return: the ForexComClient of the login owning the trading account
+        """
+        return self._logins[self._login_of(trading_account_id)]
+
+    def _login_of(self, trading_account_id):
+        try:
+            return self._accounts[trading_account_id]
+        except KeyError:
+            raise ForexException(f"Unknown trading account <{trading_account_id}>") from None
+
+    def price_symbol_subscribe(self, symbol, callback, max_frequency=None, snapshot=True):
+        """See :meth:`ForexComClient.price_symbol_subscribe`."""
+        return self._market.price_symbol_subscribe(symbol, callback, max_frequency=max_frequency, snapshot=snapshot)
+
+    def price_symbols_subscribe(self, symbols, callback, max_frequency=None, snapshot=True):
+        """See :meth:`ForexComClient.price_symbols_subscribe`."""
+        return self._market.price_symbols_subscribe(symbols, callback, max_frequency=max_frequency, snapshot=snapshot)
+
+    def unsubscribe_listener(self, index):
+        return self._market.unsubscribe_listener(index)
+
+    def orders_subscribe(self, callback, trading_account_id=None):
+        """
+        Subscribe a listener to the order updates of a trading account, of every account by default.
+        The stream of the logins concerned is opened if needed.
+
+        :return: dict of username to listener index
+        """
+        if trading_account_id is not None:
+            usernames = [self._login_of(trading_account_id)]
+            listener = self._account_listener(callback, trading_account_id)
+        else:
+            usernames = list(dict.fromkeys(self._accounts.values()))
+            listener = callback
+        indexes = {}
+        for username in usernames:
+            client = self._logins[username]
+            client.connect()
+            self._streaming.add(username)
+            indexes[username] = client.orders_subscribe(listener)
+        return indexes
+
+    @staticmethod
+    def _account_listener(callback, trading_account_id):
+        def listener(order):
+            if order.trading_account_id == trading_account_id:
+                callback(order)
+
+        return listener
+
+    def orders_unsubscribe_listener(self, indexes):
+        """
+        :param indexes: dict of username to listener index returned by :meth:`orders_subscribe`
+        """
+        for username, index in indexes.items():
+            self.login(username).unsubscribe_listener(index)
+        return True
+
+    def order_market_price(self, trading_account_id, symbol, position, quantity, offer_price):
+        return self.client(trading_account_id).order_market_price(
+            symbol, position, quantity, offer_price, trading_account_id=trading_account_id
+        )
+
+    def cancel_order(self, trading_account_id, order_id):
+        return self.client(trading_account_id).cancel_order(order_id, trading_account_id=trading_account_id)
+
+    def order_market_prices(self, orders, max_workers=8):
+        """
+        Submit market orders of any trading accounts of the pool concurrently.
+
+        :param orders: (trading_account_id, symbol, position, quantity, offer_price) tuples, or dicts of the
+                       arguments of ``order_market_price``
+        :return: list of BatchResult in the order of orders
+        """
+        orders = list(orders)
+        try:
+            self._market.warm_symbols([order['symbol'] if isinstance(order, dict) else order[1] for order in orders])
+        except Exception as e:
+            log.debug('Warming up the symbols of the orders failed: %s', e)
+        return run_batch(self.order_market_price, orders, max_workers)
+
+    def cancel_orders(self, orders, max_workers=8):
+        """
+        Cancel orders of any trading accounts of the pool concurrently.
+
+        :param orders: (trading_account_id, order_id) tuples
+        :return: list of BatchResult in the order of orders
+        """
+        return run_batch(self.cancel_order, list(orders), max_workers)
@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+# Priority lanes of the REST requests, highest priority first.
+LANES = ('trading', 'account', 'market', 'history')
+# Lane of a request, by the first fragment found in its lowercase path, the market lane otherwise.
+REQUEST_LANES = (
+    # Reads of the open orders, they mustn't take the tokens reserved for the trading requests.
+    ('/order/openpositions', 'account'),
+    ('/order/activestoplimitorders', 'account'),
+    ('/order/', 'trading'),
+    ('history', 'history'),
+    ('/session', 'account'),
+    ('/useraccount/', 'account'),
+)
+
+
+def request_lane(path):
+    """
+    :param path: REST path (e.g. /order/newtradeorder)
+    :return: lane of the request
+    """
+    path = path.lower()
+    for fragment, lane in REQUEST_LANES:
+        if fragment in path:
+            return lane
+    return 'market'
+
+
+class LaneStats:
+    """
+    Queueing counters of one lane, wait times in seconds.
+
+    queued: requests which waited for a token or behind a higher priority request.
+    """
+
+    __slots__ = ('requests', 'queued', 'waiting', 'wait_total', 'wait_max')
+
+    def __init__(self):
+        self.requests = 0
+        self.queued = 0
+        self.waiting = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait, queued):
+        self.requests += 1
+        if queued:
+            self.queued += 1
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+
+    @property
+    def wait_avg(self):
+        return self.wait_total / self.requests if self.requests else 0.0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'queued': self.queued,
+            'waiting': self.waiting,
+            'wait_avg': self.wait_avg,
+            'wait_max': self.wait_max,
+        }
+
+
+class RateLimiter:
+    """
+    Token bucket shared by the REST requests of one or more clients, with priority lanes.
+
+    A request takes a token, refilled at ``rate`` per second up to ``burst``. Without a token it waits
+    in a queue instead of failing: the waiting requests of the highest priority lane go first (see ``LANES``),
+    in arrival order within a lane. The last ``reserve`` tokens are kept for the trading lane, so an order
+    doesn't wait behind a history download that emptied the bucket.
+
+    :param rate: requests per second
+    :param burst: bucket size, ``rate`` by default
+    :param reserve: tokens only the trading lane can take
+    """
+
+    def __init__(self, rate=10, burst=None, reserve=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst if burst is not None else int(rate))
+        self.reserve = max(0, min(reserve, self.burst - 1))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {lane: LaneStats() for lane in LANES}
+
+    @staticmethod
+    def _priority(lane):
+        try:
+            return LANES.index(lane)
+        except ValueError:
+            raise ValueError(f"Unknown lane <{lane}>, expected one of {', '.join(LANES)}") from None
+
+    def _take(self, priority):
+        """
+        Take a token for the head of the queue, the lock being held.
+
+        :return: 0 if taken, else the seconds until one can be taken
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        needed = 1 if priority == 0 else 1 + self.reserve
+        if self._tokens >= needed:
+            self._tokens -= 1
+            return 0
+        return (needed - self._tokens) / self.rate
+
+    def _enter(self, lane):
+        ticket = (self._priority(lane), next(self._counter))
+        heapq.heappush(self._waiters, ticket)
+        self._stats[lane].waiting += 1
+        return ticket
+
+    def _leave(self, lane, ticket, start, queued):
+        if self._waiters[0] == ticket:
+            heapq.heappop(self._waiters)
+        else:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+        stats = self._stats[lane]
+        stats.waiting -= 1
+        stats.record(time.monotonic() - start, queued)
+        self._cond.notify_all()
+
+    def acquire(self, lane='market'):
+        """
+        Wait for a token.
+
+        :param lane: priority lane of the request, one of ``LANES``
+        """
+        start = time.monotonic()
+        queued = False
+        with self._cond:
+            ticket = self._enter(lane)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        delay = self._take(ticket[0])
+                        if not delay:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                    queued = True
+            finally:
+                self._leave(lane, ticket, start, queued)
+
+    async def acquire_async(self, lane='market'):
+        """
+        asyncio counterpart of :meth:`acquire`, the event loop isn't blocked while waiting.
+        """
+        start = time.monotonic()
+        queued = False
+        with self._cond:
+            ticket = self._enter(lane)
+        try:
+            while True:
+                with self._cond:
+                    if self._waiters[0] == ticket:
+                        delay = self._take(ticket[0])
+                        if not delay:
+                            break
+                    else:
+                        delay = 1 / self.rate
+                await asyncio.sleep(delay)
+                queued = True
+        finally:
+            with self._cond:
+                self._leave(lane, ticket, start, queued)
+
+    def stats(self):
+        """
+        :return: dict of lane to its LaneStats as a dict
+        """
+        with self._cond:
+            return {lane: stats.as_dict() for lane, stats in self._stats.items()}
@@ -0,0 +1,473 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from .lightstream import (
+    BIND_URL_PATH,
+    CONNECTION_URL_PATH,
+    CONTROL_URL_PATH,
+    END_CMD,
+    ERROR_CMD,
+    LOOP_CMD,
+    OK_CMD,
+    OP_ADD,
+    OP_DELETE,
+    OP_DESTROY,
+    PROBE_CMD,
+    SYNC_ERROR_CMD,
+    LineBuffer,
+)
+from .transport import HTTPTransport
+
+log = logging.getLogger()
+
+REST_FILE = 'rest.jsonl'
+STREAM_FILE = 'stream.txt'
+# Messages closing a stream connection of the replay server.
+_CLOSING_CMDS = (END_CMD, LOOP_CMD, SYNC_ERROR_CMD, ERROR_CMD)
+
+
+class Recorder:
+    """
+    Writes the REST exchanges and the stream messages of the clients to a recording directory.
+
+    ``rest.jsonl`` holds one JSON object per request: time, method, path, query, status and response body.
+    Request bodies are left out (the login carries the password), except the ones of the Lightstreamer
+    control requests which define the tables of the stream. ``stream.txt`` holds one line per stream
+    message: milliseconds since the start of the recording, session id and message, tab separated.
+
+    :param path: recording directory, its files are replaced
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        os.makedirs(self.path, exist_ok=True)
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._rest = open(os.path.join(self.path, REST_FILE), 'w', encoding='utf-8')
+        self._stream = open(os.path.join(self.path, STREAM_FILE), 'w', encoding='utf-8')
+
+    def _elapsed(self):
+        return int((time.monotonic() - self._start) * 1000)
+
+    def record_rest(self, method, url, body, status, response_body):
+        parts = urlsplit(url)
+        entry = {
+            'time': self._elapsed(),
+            'method': method,
+            'path': parts.path,
+            'query': parts.query,
+            'status': status,
+            'body': response_body.decode('utf-8', 'replace'),
+        }
+        if body and parts.path.endswith(CONTROL_URL_PATH):
+            entry['request'] = body.decode('utf-8') if isinstance(body, bytes) else body
+        with self._lock:
+            self._rest.write(json.dumps(entry) + '\n')
+            self._rest.flush()
+
+    def record_stream(self, session, message):
+        with self._lock:
+            self._stream.write(f'{self._elapsed()}\t{session}\t{message}\n')
+            self._stream.flush()
+
+    def close(self):
+        with self._lock:
+            self._rest.close()
+            self._stream.close()
+
+
+class _StreamTap:
+    """Splits the bytes read from a stream connection into messages written to the Recorder."""
+
+    def __init__(self, recorder):
+        self._recorder = recorder
+        self._lines = LineBuffer()
+        self._session = ''
+
+    def feed(self, data):
+        for line in self._lines.feed(data):
+            if line:
+                message = line.decode('utf-8')
+                if message.startswith('SessionId:'):
+                    self._session = message[10:]
+                self._recorder.record_stream(self._session, message)
+        return data
+
+
+class _RecordedStream:
+    """``http.client.HTTPResponse`` of a stream connection recording what is read from it."""
+
+    def __init__(self, recorder, response):
+        self._response = response
+        self._tap = _StreamTap(recorder)
+
+    def readline(self, *args):
+        return self._tap.feed(self._response.readline(*args))
+
+    def read1(self, *args):
+        return self._tap.feed(self._response.read1(*args))
+
+    def readlines(self, *args):
+        return [self._tap.feed(line) for line in self._response.readlines(*args)]
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class RecordingTransport:
+    """
+    HTTPTransport wrapper recording the traffic of the clients using it, see :class:`Recorder`.
+
+        transport = RecordingTransport('recording/')
+        client = ForexComClient(username, password, app_key, transport=transport)
+
+    :param path: recording directory
+    :param transport: wrapped HTTPTransport, a new one by default
+    """
+
+    def __init__(self, path, transport=None):
+        self.recorder = Recorder(path)
+        self._transport = transport if transport is not None else HTTPTransport()
+
+    def request(self, method, url, body=None, headers=None, stream=False):
+        response = self._transport.request(method, url, body=body, headers=headers, stream=stream)
+        if stream:
+            return _RecordedStream(self.recorder, response)
+        self.recorder.record_rest(method, url, body, response.status, response.body)
+        return response
+
+    def close(self):
+        self._transport.close()
+        self.recorder.close()
+
+    def __getattr__(self, name):
+        return getattr(self._transport, name)
+
+
+class Recording:
+    """
+    Content of a recording directory written by :class:`Recorder`.
+
+    ``updates`` lists the recorded table updates as (milliseconds, (adapter, item), schema, values),
+    ``values`` being the raw ``|`` separated field values of the Lightstreamer text protocol.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.rest = []
+        with open(os.path.join(self.path, REST_FILE), encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self.rest.append(json.loads(line))
+
+        # Tables of every recorded session: (session, table) -> (adapter, items, schema)
+        self.tables = {}
+        for entry in self.rest:
+            params = dict(parse_qsl(entry.get('request', '')))
+            if params.get('LS_op') == OP_ADD:
+                self.tables[(params['LS_session'], int(params['LS_table']))] = (
+                    params.get('LS_data_adapter', ''),
+                    params['LS_id'].split(' '),
+                    tuple(params['LS_schema'].split(' ')),
+                )
+
+        self.messages = []
+        self.updates = []
+        with open(os.path.join(self.path, STREAM_FILE), encoding='utf-8') as f:
+            for line in f:
+                elapsed, session, message = line.rstrip('\n').split('\t', 2)
+                self.messages.append(message)
+                if not message[:1].isdigit():
+                    continue
+                table, update = message.split(',', 1)
+                pos, values = update.split('|', 1)
+                definition = self.tables.get((session, int(table)))
+                if definition is None:
+                    continue
+                adapter, items, schema = definition
+                self.updates.append((int(elapsed), (adapter, items[int(pos) - 1]), schema, values))
+
+    def stream_body(self):
+        """
+        :return: the recorded table updates and PROBE messages as the bytes of a stream connection body
+        """
+        lines = [message for message in self.messages if message[:1].isdigit() or message == PROBE_CMD]
+        return ''.join(f'{line}\r\n' for line in lines).encode('utf-8')
+
+
+class _ReplaySession:
+    def __init__(self, session_id, keepalive):
+        self.id = session_id
+        self.keepalive = keepalive
+        self.queue = queue.SimpleQueue()
+        self.tables = {}
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Buffered writes: headers and body of a response leave in one segment instead of waiting for a delayed ACK.
+    wbufsize = -1
+
+    def log_message(self, format, *args):
+        log.debug('Replay server: %s', format % args)
+
+    def do_GET(self):
+        self.server.replay._handle(self, 'GET')
+
+    def do_POST(self):
+        self.server.replay._handle(self, 'POST')
+
+    def respond(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ReplayServer:
+    """
+    Local stand-in of the REST API and of the Lightstreamer server, replaying a recording.
+
+    REST requests get the recorded responses of the same method, path and query (or of the same
+    method and path), in the recorded order, the last one being repeated. The stream side speaks the
+    Lightstreamer text protocol: tables are created through ``control.txt`` like on the real server
+    and receive the recorded updates of their items, after a snapshot of the current item state.
+    The replay starts with the first subscription.
+
+        with ReplayServer('recording/', speed=10) as server:
+            client = ForexComClient(
+                username, password, app_key,
+                rest_url=server.local_url('https://ciapi.cityindex.com/tradingapi/'),
+                stream_url=server.url,
+            )
+
+    :param recording: Recording or its directory
+    :param speed: replay speed of the stream, 1 is real time, 0 is as fast as possible
+    :param loop: replay the stream again when it ends
+    :param keepalive: default interval in seconds of the PROBE messages on an idle stream
+    """
+
+    def __init__(self, recording, speed=1.0, loop=False, keepalive=5, host='127.0.0.1', port=0):
+        self.recording = recording if isinstance(recording, Recording) else Recording(recording)
+        self.speed = speed
+        self.loop = loop
+        self.keepalive = keepalive
+        self.updates = 0
+        self._server = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self._server.daemon_threads = True
+        self._server.replay = self
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._session_counter = 0
+        self._items = {}
+        self._listeners = {}
+        self._subscribed = threading.Event()
+        self._stopped = threading.Event()
+        self._responses = {}
+        for entry in self.recording.rest:
+            if '/lightstreamer/' in entry['path']:
+                continue
+            response = (entry['status'], entry['body'].encode('utf-8'))
+            for key in self._rest_keys(entry['method'], entry['path'], entry['query']):
+                self._responses.setdefault(key, deque()).append(response)
+
+    @staticmethod
+    def _rest_keys(method, path, query):
+        return (method, path, '&'.join(sorted(query.split('&')))), (method, path)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def local_url(self, url):
+        """
+        :return: the url on this server with the path of ``url``
+        """
+        return self.url.rstrip('/') + (urlsplit(url).path or '/')
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='ReplayServer', daemon=True).start()
+        threading.Thread(target=self._feed, name='ReplayFeed', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._subscribed.set()
+        self.end_sessions(END_CMD)
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def end_sessions(self, message=END_CMD):
+        """
+        Send ``message`` to every stream connection and close it, e.g. to test the recovery of the clients.
+        The sessions stay bound for ``LOOP`` and are dropped for ``END``/``SYNC ERROR``/``ERROR``.
+        """
+        with self._lock:
+            sessions = list(self._sessions.values())
+            if message != LOOP_CMD:
+                for session in sessions:
+                    self._drop_session(session)
+        for session in sessions:
+            session.queue.put(message)
+
+    def _handle(self, handler, method):
+        parts = urlsplit(handler.path)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length).decode('utf-8') if length else ''
+        if parts.path.endswith(CONNECTION_URL_PATH):
+            self._stream(handler, self._create_session(dict(parse_qsl(body))))
+        elif parts.path.endswith(BIND_URL_PATH):
+            params = dict(parse_qsl(body))
+            with self._lock:
+                session = self._sessions.get(params.get('LS_session'))
+            if session is None:
+                handler.respond(200, f'{SYNC_ERROR_CMD}\r\n'.encode('utf-8'))
+            else:
+                self._stream(handler, session)
+        elif parts.path.endswith(CONTROL_URL_PATH):
+            handler.respond(200, self._control(dict(parse_qsl(body))).encode('utf-8'))
+        else:
+            with self._lock:
+                responses = None
+                for key in self._rest_keys(method, parts.path, parts.query):
+                    responses = self._responses.get(key)
+                    if responses:
+                        break
+                if not responses:
+                    log.warning('Replay server: no recorded response for %s %s', method, handler.path)
+                    handler.respond(404, b'{}', 'application/json')
+                    return
+                status, response = responses.popleft() if len(responses) > 1 else responses[0]
+            handler.respond(status, response, 'application/json')
+
+    def _create_session(self, params):
+        keepalive = params.get('LS_keepalive_millis')
+        with self._lock:
+            self._session_counter += 1
+            session = _ReplaySession(
+                f'R{self._session_counter}', int(keepalive) / 1000 if keepalive else self.keepalive
+            )
+            self._sessions[session.id] = session
+        return session
+
+    def _drop_session(self, session):
+        self._sessions.pop(session.id, None)
+        for adapter, items, schema in session.tables.values():
+            for item in items:
+                listeners = self._listeners.get((adapter, item), [])
+                listeners[:] = [listener for listener in listeners if listener[0] is not session]
+
+    def _stream(self, handler, session):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/plain')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+        header = [OK_CMD, f'SessionId:{session.id}', f'KeepaliveMillis:{int(session.keepalive * 1000)}', '', '']
+        try:
+            self._write_chunk(handler, '\r\n'.join(header))
+            closed = False
+            while not closed:
+                try:
+                    messages = [session.queue.get(timeout=session.keepalive)]
+                except queue.Empty:
+                    messages = [PROBE_CMD]
+                # Send what is pending at once, like the server does under load.
+                while len(messages) < 1000:
+                    try:
+                        messages.append(session.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                for index, message in enumerate(messages):
+                    if message.startswith(_CLOSING_CMDS):
+                        messages = messages[: index + 1]
+                        closed = True
+                        break
+                self._write_chunk(handler, ''.join(f'{message}\r\n' for message in messages))
+            handler.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            log.debug('Replay server: stream connection of %s closed by the client', session.id)
+        handler.close_connection = True
+
+    @staticmethod
+    def _write_chunk(handler, text):
+        data = text.encode('utf-8')
+        handler.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        handler.wfile.flush()
+
+    def _control(self, params):
+        with self._lock:
+            session = self._sessions.get(params.get('LS_session'))
+            if session is None:
+                return f'{SYNC_ERROR_CMD}\r\n'
+            op = params.get('LS_op')
+            table = params.get('LS_table') or params.get('LS_Table')
+            if op == OP_ADD:
+                adapter = params.get('LS_data_adapter', '')
+                items = params['LS_id'].split(' ')
+                schema = tuple(params['LS_schema'].split(' '))
+                session.tables[int(table)] = (adapter, items, schema)
+                for pos, item in enumerate(items, 1):
+                    self._listeners.setdefault((adapter, item), []).append((session, int(table), pos, schema))
+                    state = self._items.get((adapter, item))
+                    if state and params.get('LS_snapshot', 'false') != 'false':
+                        session.queue.put(f'{table},{pos}|' + '|'.join(state.get(field, '') for field in schema))
+                self._subscribed.set()
+            elif op == OP_DELETE:
+                adapter, items, schema = session.tables.pop(int(table), ('', [], ()))
+                for item in items:
+                    listeners = self._listeners.get((adapter, item), [])
+                    listeners[:] = [
+                        listener for listener in listeners if listener[0] is not session or listener[1] != int(table)
+                    ]
+            elif op == OP_DESTROY:
+                self._drop_session(session)
+                session.queue.put(END_CMD)
+        return f'{OK_CMD}\r\n'
+
+    def _publish(self, key, schema, values):
+        tokens = values.split('|')
+        with self._lock:
+            state = self._items.setdefault(key, {})
+            for field, token in zip(schema, tokens):
+                if token:
+                    state[field] = token
+            for session, table, pos, table_schema in self._listeners.get(key, ()):
+                if table_schema == schema:
+                    session.queue.put(f'{table},{pos}|{values}')
+                else:
+                    fields = dict(zip(schema, tokens))
+                    session.queue.put(f'{table},{pos}|' + '|'.join(fields.get(field, '') for field in table_schema))
+            self.updates += 1
+
+    def _feed(self):
+        """Publish the recorded updates, at ``speed`` times their recorded pace."""
+        self._subscribed.wait()
+        updates = self.recording.updates
+        while updates and not self._stopped.is_set():
+            start = time.monotonic()
+            first = updates[0][0]
+            for elapsed, key, schema, values in updates:
+                if self.speed:
+                    delay = start + (elapsed - first) / 1000 / self.speed - time.monotonic()
+                    if delay > 0 and self._stopped.wait(delay):
+                        return
+                elif self._stopped.is_set():
+                    return
+                self._publish(key, schema, values)
+            if not self.loop:
+                return
@@ -1,43 +1,131 @@
 import logging
-import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from functools import partial
 from operator import itemgetter
 
+import numpy as np
 import pandas as pd
 
+from forexcom.bars import BAR_DTYPE, bars_frame, resample_bars, resample_prices, timeframe_ms
+from forexcom.cache import MarketCache
 from forexcom.exceptions import ForexException
-from forexcom.utils import send_request
+from forexcom.store import TickStore
+from forexcom.ticks import PRICE_DTYPE
+from forexcom.transport import HTTPTransport
+from forexcom.utils import parse_date_ms, parse_dates_ms, send_request
 
-from .models import Currency, InstructionStatus, Order, OrderStatus, OrderType, Position
+from .models import (
+    BatchResult,
+    Currency,
+    InstructionStatus,
+    Order,
+    OrderStatus,
+    OrderType,
+    Position,
+    PositionMethod,
+    SymbolRegistry,
+)
 
 log = logging.getLogger()
-SYMBOLS_INFO = {}
+# Maximum number of ticks returned by one tick history request.
+MAX_PRICE_TICKS = 4000
+# Maximum number of bars returned by one bar history request.
+MAX_PRICE_BARS = 4000
+# Bar lengths served by the bar history endpoints, in seconds: (interval, span).
+BAR_INTERVALS = {
+    60: ('MINUTE', 1),
+    120: ('MINUTE', 2),
+    180: ('MINUTE', 3),
+    300: ('MINUTE', 5),
+    600: ('MINUTE', 10),
+    900: ('MINUTE', 15),
+    1800: ('MINUTE', 30),
+    3600: ('HOUR', 1),
+    7200: ('HOUR', 2),
+    14400: ('HOUR', 4),
+    28800: ('HOUR', 8),
+    86400: ('DAY', 1),
+    604800: ('WEEK', 1),
+}
+# HTTP status of the responses retried by range downloads (throttled or unavailable).
+RETRY_HTTP_STATUS = (429, 503)
 
 
 class RestClient:
-    def __init__(self, username, password, app_key, http_proxy=None, https_proxy=None, rest_url=None):
+    def __init__(
+        self,
+        username,
+        password,
+        app_key,
+        http_proxy=None,
+        https_proxy=None,
+        rest_url=None,
+        transport=None,
+        pool_size=10,
+        timeout=30,
+        symbols=None,
+        market_cache=None,
+        tick_store=None,
+        rate_limiter=None,
+        tracer=None,
+    ):
+        """
+        :param transport: HTTPTransport shared with other clients, by default a new one is created
+        :param pool_size: maximum number of idle keep-alive connections (ignored if transport is given)
+        :param timeout: request timeout in seconds (ignored if transport is given)
+        :param symbols: SymbolRegistry shared with other clients, by default a new one is created
+        :param market_cache: MarketCache (or path of its JSON file) persisting market metadata between runs
+        :param tick_store: TickStore (or its directory) caching tick history, ranges already downloaded are
+                           read from disk by ``get_prices``/``get_prices_range``
+        :param rate_limiter: RateLimiter shared by the requests of one or more clients, requests are queued
+                             by priority (orders first, then account, market data and history) when it's empty
+        :param tracer: Tracer of the requests and of the connections of the transport created
+        """
         if rest_url is None:
             rest_url = 'https://ciapi.cityindex.com/tradingapi/'
+        if transport is None:
+            transport = HTTPTransport(
+                pool_size=pool_size,
+                timeout=timeout,
+                http_proxy=http_proxy,
+                https_proxy=https_proxy,
+                tracer=tracer,
+            )
         self._username = username
         self._password = password
         self._app_key = app_key
         self._rest_url = rest_url
         self._session = None
+        self._transport = transport
+        self._symbols = symbols if symbols is not None else SymbolRegistry()
+        if isinstance(market_cache, str):
+            market_cache = MarketCache(market_cache)
+        self._market_cache = market_cache
+        if market_cache is not None:
+            for name, symbol_id, info in market_cache.markets():
+                self._symbols.add(name, symbol_id, info)
+        if isinstance(tick_store, str):
+            tick_store = TickStore(tick_store)
+        self._tick_store = tick_store
+        self._rate_limiter = rate_limiter
         self._get = partial(
             send_request,
             'GET',
             self._rest_url,
             json_format=True,
-            http_proxy=http_proxy,
-            https_proxy=https_proxy,
+            transport=transport,
+            rate_limiter=rate_limiter,
+            tracer=tracer,
         )
         self._post = partial(
             send_request,
             'POST',
             self._rest_url,
             json_format=True,
-            http_proxy=http_proxy,
-            https_proxy=https_proxy,
+            transport=transport,
+            rate_limiter=rate_limiter,
+            tracer=tracer,
         )
         self._session_token = None
         self._trading_account_id = None
@@ -46,6 +134,22 @@ class RestClient:
     def _default_headers(self):
         return {'UserName': self._username, 'Session': self._session_token}
 
+    @property
+    def transport(self):
+        return self._transport
+
+    @property
+    def symbols(self):
+        return self._symbols
+
+    @property
+    def tick_store(self):
+        return self._tick_store
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
     @property
     def trading_account_id(self):
         return self._trading_account_id
@@ -60,20 +164,33 @@ class RestClient:
 
     def connect(self):
         log.debug('Connecting to REST API')
-        data = {
+        res = self._post('/session', params=self._login_params)
+        self._session_token = self._parse_session(res)
+
+    @property
+    def _login_params(self):
+        return {
             'UserName': self._username,
             'Password': self._password,
             'AppKey': self._app_key,
         }
-        res = self._post('/session', params=data)
+
+    @staticmethod
+    def _check_status(res):
         status = InstructionStatus(int(res['StatusCode']))
         if status != InstructionStatus.Accepted:
             raise ForexException(res)
-        self._session_token = res['Session']
+
+    def _parse_session(self, res):
+        self._check_status(res)
+        return res['Session']
 
     def get_account_info(self):
         log.debug('Getting account info')
         res = self._get('/UserAccount/ClientAndTradingAccount', headers=self._default_headers)
+        return self._parse_account_info(res)
+
+    def _parse_account_info(self, res):
         try:
             self._trading_account_id = res['TradingAccounts'][0]['TradingAccountId']
             return res
@@ -87,58 +204,433 @@ class RestClient:
         """
         log.debug('Getting symbol details for %s', symbol)
         res = self._get('/cfd/markets', params={'MarketName': symbol}, headers=self._default_headers)
+        return self._parse_symbol_detail(symbol, res)
 
+    def _parse_symbol_detail(self, symbol, res):
         try:
-            global SYMBOLS_INFO
-            SYMBOLS_INFO[symbol] = res['Markets'][0]['MarketId']
+            market = res['Markets'][0]
+            self._remember_symbol(symbol, market['MarketId'], market)
             return res
         except Exception as e:
             raise ForexException(res) from e
 
+    def _remember_symbol(self, symbol, symbol_id, info):
+        self._symbols.add(symbol, symbol_id, info)
+        if self._market_cache is not None:
+            self._market_cache.add(symbol, symbol_id, info)
+
+    def _save_market_cache(self):
+        if self._market_cache is None:
+            return
+        try:
+            self._market_cache.save()
+        except OSError:
+            # The symbol is resolved all the same, the cache is written on the next save.
+            log.warning("Saving the market cache <%s> failed", self._market_cache.path, exc_info=True)
+
     def get_symbol_id(self, symbol):
-        log.debug('Getting symbol id for %s', symbol)
-        global SYMBOLS_INFO
-        symbol_id = SYMBOLS_INFO.get(symbol, None)
-        if not symbol_id:
+        symbol_id = self._symbols.get_id(symbol)
+        if symbol_id is None:
+            log.debug('Getting symbol id for %s from server', symbol)
             self.get_symbol_detail(symbol)
-            symbol_id = SYMBOLS_INFO[symbol]
+            self._save_market_cache()
+            symbol_id = self._symbols.get_id(symbol)
         return symbol_id
 
+    def warm_symbols(self, symbols, max_workers=8):
+        """
+        Resolve the market ids of many symbols up front, so later lookups never hit the network.
+        Unknown symbols are fetched concurrently and the market cache is written once.
+
+        :param symbols: symbols (e.g. ['EUR/USD', 'XAU/USD'])
+        :param max_workers: maximum number of concurrent requests
+        :return: dict of symbol -> market id
+        """
+        missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self._symbols]
+        if missing:
+            log.debug('Warming up %s symbols', len(missing))
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+                list(executor.map(self.get_symbol_detail, missing))
+            self._save_market_cache()
+        return {symbol: self._symbols.get_id(symbol) for symbol in symbols}
+
     def get_symbol_name(self, symbol_id):
-        log.debug('Getting symbol name for %s', symbol_id)
-        global SYMBOLS_INFO
-        try:
-            return list(SYMBOLS_INFO.keys())[list(SYMBOLS_INFO.values()).index(int(symbol_id))]
-        except ValueError:
-            log.debug('Symbol id %s not found', symbol_id)
+        symbol = self._symbols.get_name(symbol_id)
+        if symbol is not None:
+            return symbol
         log.debug('Getting symbol name for %s from server', symbol_id)
         res = self._get(f'market/{symbol_id}/information', headers=self._default_headers)
+        symbol = self._parse_market_information(res)
+        self._save_market_cache()
+        return symbol
 
+    def _parse_market_information(self, res):
         try:
-            symbol = res['MarketInformation']['Name']
-            SYMBOLS_INFO[symbol] = res['MarketInformation']['MarketId']
+            market = res['MarketInformation']
+            symbol = market['Name']
+            self._remember_symbol(symbol, market['MarketId'], market)
             log.debug('Symbol %s found', symbol)
             return symbol
         except Exception as e:
             raise ForexException(res) from e
 
-    def get_prices(self, symbol, count=None, start=None, end=None, price_type='mid'):
+    def get_prices(self, symbol, count=None, start=None, end=None, price_type='mid', as_array=False):
         """
         :param symbol: symbol (e.g. EUR/USD)
         :param count: number of ticks to return
         :param start: start date/time (YYYY-MM-DDTHH:MM:SS)
         :param end: end date/time (YYYY-MM-DDTHH:MM:SS)
-        :param price_type: price type (e.g. bid, ask, mid)
+        :param price_type: price type (e.g. bid, ask, mid) or a list of them, one column each.
+                           The API serves one price type per request, so a list is fetched concurrently.
+        :param as_array: return a numpy structured array (timestamp in epoch milliseconds, then the prices)
+                         instead of a pd.DataFrame
         :return: pd.DataFrame with prices
         """
         log.debug('Getting prices for %s', symbol)
+        price_types = self._check_price_types(price_type)
+        symbol_id = self.get_symbol_id(symbol)
+
+        def fetch(price_type):
+            if self._tick_store is not None and start and end:
+                download = partial(self._download_prices, symbol_id, price_type=price_type)
+                return self._stored_prices(symbol, start, end, price_type, download)
+            url, params = self._prices_request(symbol_id, count, start, end, price_type)
+            return self._parse_prices(self._get(url, params=params, headers=self._default_headers), as_array=True)
+
+        if len(price_types) == 1:
+            data = fetch(price_types[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(price_types)) as executor:
+                data = self._merge_price_types(price_types, list(executor.map(fetch, price_types)))
+        return data if as_array else self._prices_frame(data)
+
+    def get_prices_range(
+        self,
+        symbol,
+        start,
+        end,
+        price_type='mid',
+        window='1h',
+        max_workers=4,
+        max_results=MAX_PRICE_TICKS,
+        retries=5,
+        backoff=0.5,
+    ):
+        """
+        Download every tick between start and end.
+
+        [start, end] is split into windows fetched concurrently. A window returning ``max_results``
+        ticks was truncated by the server, so it's split in two and both halves are fetched again.
+        Throttled requests are retried with exponential backoff.
+        With a tick store only the parts of the range missing from the store are downloaded.
+
+        :param symbol: symbol (e.g. EUR/USD)
+        :param start: start date/time (YYYY-MM-DDTHH:MM:SS)
+        :param end: end date/time (YYYY-MM-DDTHH:MM:SS)
+        :param price_type: price type (e.g. bid, ask, mid)
+        :param window: initial window length (e.g. '1h', '15min')
+        :param max_workers: maximum number of concurrent requests
+        :param max_results: number of ticks at which the server truncates a response
+        :param retries: number of retries of a throttled request
+        :param backoff: first retry delay in seconds, doubled on every retry
+        :return: pd.DataFrame with prices, sorted and without the duplicated ticks of window boundaries
+        """
+        log.debug('Getting prices for %s from %s to %s', symbol, start, end)
+        self._check_price_type(price_type)
+        symbol_id = self.get_symbol_id(symbol)
+        download = partial(
+            self._download_prices,
+            symbol_id,
+            price_type=price_type,
+            window=window,
+            max_workers=max_workers,
+            max_results=max_results,
+            retries=retries,
+            backoff=backoff,
+        )
+        return self._prices_frame(self._stored_prices(symbol, start, end, price_type, download))
+
+    def get_bars(
+        self,
+        symbol,
+        interval,
+        start,
+        end,
+        price_type='mid',
+        source='auto',
+        max_workers=4,
+        max_results=MAX_PRICE_BARS,
+        retries=5,
+        backoff=0.5,
+        as_array=False,
+    ):
+        """
+        OHLC bars starting between start and end.
+
+        Bar lengths served by the API (``BAR_INTERVALS``) are downloaded from the bar history endpoint,
+        [start, end] being split into windows of ``max_results`` bars fetched concurrently. Other lengths are
+        resampled: from the longest served bars dividing them (e.g. 20m from 10m), or from the tick history of
+        :meth:`get_prices_range` (e.g. 1s or 90s), aligned on multiples of the interval since the epoch.
+
+        :param symbol: symbol (e.g. EUR/USD)
+        :param interval: bar length, seconds or a pandas timedelta string (e.g. '1m', '5m', '1h', '1d')
+        :param start: start date/time (YYYY-MM-DDTHH:MM:SS)
+        :param end: end date/time (YYYY-MM-DDTHH:MM:SS)
+        :param price_type: price type (e.g. bid, ask, mid)
+        :param source: auto, bars (bar history only) or ticks (always resample the tick history)
+        :param max_workers: maximum number of concurrent requests
+        :param max_results: number of bars at which the server truncates a response
+        :param retries: number of retries of a throttled request
+        :param backoff: first retry delay in seconds, doubled on every retry
+        :param as_array: return a BAR_DTYPE structured array instead of a pd.DataFrame
+        :return: pd.DataFrame of open, high, low, close and ticks (0 for bars of the bar history)
+                 indexed by the UTC start of the bars, like ``get_prices``
+        """
+        log.debug('Getting %s bars for %s from %s to %s', interval, symbol, start, end)
+        self._check_price_type(price_type)
+        base = self._bars_base(interval, source)
+        symbol_id = self.get_symbol_id(symbol)
+        if base is None:
+            download = partial(
+                self._download_prices,
+                symbol_id,
+                price_type=price_type,
+                max_workers=max_workers,
+                retries=retries,
+                backoff=backoff,
+            )
+            data = resample_prices(self._stored_prices(symbol, start, end, price_type, download), interval)
+        else:
+            data = self._download_bars(
+                symbol_id, *self._range_ms(start, end), base, price_type, max_workers, max_results, retries, backoff
+            )
+            if timeframe_ms(interval) != base * 1000:
+                data = resample_bars(data, interval)
+        data = self._bars_between(data, start, end)
+        return data if as_array else bars_frame(data)
+
+    @staticmethod
+    def _bars_base(interval, source='auto'):
+        """
+        :return: length in seconds of the bar history downloaded for bars of interval, None to resample ticks
+        """
+        if source not in ('auto', 'bars', 'ticks'):
+            raise ForexException(f'Invalid bar source {source}')
+        if source == 'ticks':
+            return None
+        seconds = timeframe_ms(interval) / 1000
+        bases = [base for base in BAR_INTERVALS if seconds % base == 0]
+        if bases:
+            return bases[-1]
+        if source == 'bars':
+            raise ForexException(f'Bars of {interval} are not served by the bar history')
+        return None
+
+    @classmethod
+    def _bars_between(cls, data, start, end):
+        start, end = cls._range_ms(start, end)
+        return data[(data['timestamp'] >= start) & (data['timestamp'] <= end)]
+
+    def _download_bars(self, symbol_id, start, end, base, price_type, max_workers, max_results, retries, backoff):
+        """
+        :param start: epoch milliseconds
+        :param end: epoch milliseconds
+        :param base: bar length in seconds, a key of BAR_INTERVALS
+        :return: BAR_DTYPE structured array
+        """
+        fetch = partial(self._get_bars_window, symbol_id, base, price_type, retries, backoff)
+        windows = self._price_windows(start, end, f'{base * max_results}s')
+        return self._join_bars(self._download_windows(fetch, windows, max_workers, max_results))
+
+    def _get_bars_window(self, symbol_id, base, price_type, retries, backoff, start, end):
+        url, params = self._bars_request(symbol_id, base, start, end, price_type)
+        return self._parse_bars(self._get_retried(url, params, retries, backoff))
+
+    @staticmethod
+    def _bars_request(symbol_id, base, start, end, price_type='mid'):
+        """
+        :param start: epoch seconds
+        :param end: epoch seconds
+        :return: (url, params) of the bar history endpoint
+        """
+        interval, span = BAR_INTERVALS[base]
+        params = {
+            'interval': interval,
+            'span': span,
+            'fromTimeStampUTC': start,
+            'toTimestampUTC': end,
+            'priceType': price_type.upper(),
+        }
+        return f'/market/{symbol_id}/barhistorybetween', params
+
+    @staticmethod
+    def _parse_bars(res):
+        """
+        :return: BAR_DTYPE structured array of a bar history response
+        """
+        try:
+            bars = res['PriceBars']
+            data = np.zeros(len(bars), dtype=BAR_DTYPE)
+            data['timestamp'] = parse_dates_ms([bar['BarDate'] for bar in bars])
+            for field in ('open', 'high', 'low', 'close'):
+                data[field] = [bar[field.capitalize()] for bar in bars]
+        except Exception as e:
+            raise ForexException(res) from e
+        return data
+
+    @staticmethod
+    def _join_bars(arrays):
+        """
+        :param arrays: BAR_DTYPE structured arrays of overlapping windows
+        :return: the bars sorted by timestamp, once each
+        """
+        arrays = [data for data in arrays if len(data)]
+        if not arrays:
+            return np.empty(0, dtype=BAR_DTYPE)
+        data = np.concatenate(arrays)
+        _, first = np.unique(data['timestamp'], return_index=True)
+        return data[first]
+
+    @staticmethod
+    def _range_ms(start, end):
+        """
+        :return: (start, end) epoch milliseconds of date/times
+        """
+        return int(pd.to_datetime(start).timestamp() * 1000), int(pd.to_datetime(end).timestamp() * 1000)
+
+    def _stored_prices(self, symbol, start, end, price_type, download):
+        """
+        Ticks of [start, end], read from the tick store after downloading the gaps of its coverage.
+
+        :param download: function of (start, end) epoch milliseconds returning a PRICE_DTYPE array
+        """
+        start, end = self._range_ms(start, end)
+        if self._tick_store is None:
+            return download(start, end)
+        for gap_start, gap_end in self._tick_store.gaps(symbol, price_type, start, end + 1):
+            log.debug('Tick store gap of %s %s: %s-%s', symbol, price_type, gap_start, gap_end)
+            self._tick_store.store_history(symbol, price_type, download(gap_start, gap_end), gap_start, gap_end)
+        return self._tick_store.read(symbol, start, end, price_type)
+
+    def _download_prices(
+        self,
+        symbol_id,
+        start,
+        end,
+        price_type='mid',
+        window='1h',
+        max_workers=4,
+        max_results=MAX_PRICE_TICKS,
+        retries=5,
+        backoff=0.5,
+    ):
+        """
+        :param start: epoch milliseconds
+        :param end: epoch milliseconds
+        :return: PRICE_DTYPE structured array of [start, end], see :meth:`get_prices_range`
+        """
+        fetch = partial(self._get_prices_window, symbol_id, price_type=price_type, retries=retries, backoff=backoff)
+        windows = self._price_windows(start, end, window)
+        return self._join_prices(self._download_windows(fetch, windows, max_workers, max_results))
+
+    @staticmethod
+    def _download_windows(fetch, windows, max_workers, max_results):
+        """
+        Fetch windows concurrently. A window returning ``max_results`` rows was truncated by the server,
+        so it's split in two and both halves are fetched again.
+
+        :param fetch: function of (start, end) epoch seconds returning a structured array
+        :param windows: list of (start, end) epoch seconds
+        :return: list of the arrays of the windows
+        """
+        arrays = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(fetch, *w): w for w in windows}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window_start, window_end = pending.pop(future)
+                    data = future.result()
+                    if len(data) >= max_results and window_end - window_start > 1:
+                        middle = (window_start + window_end) // 2
+                        for w in ((window_start, middle), (middle, window_end)):
+                            pending[executor.submit(fetch, *w)] = w
+                    else:
+                        arrays.append(data)
+        return arrays
+
+    @staticmethod
+    def _price_windows(start, end, window):
+        """
+        :param start: epoch milliseconds
+        :param end: epoch milliseconds
+        :return: list of (start, end) epoch seconds covering [start, end]
+        """
+        start = start // 1000
+        end = -(-end // 1000)
+        step = max(1, int(pd.Timedelta(window).total_seconds()))
+        return [(t, min(t + step, end)) for t in range(start, end, step)]
+
+    @staticmethod
+    def _is_retryable(res):
+        return not res or res.get('HttpStatus') in RETRY_HTTP_STATUS
+
+    def _get_prices_window(self, symbol_id, start, end, price_type='mid', retries=5, backoff=0.5):
+        url, params = self._prices_request(
+            symbol_id, start=pd.Timestamp(start, unit='s'), end=pd.Timestamp(end, unit='s'), price_type=price_type
+        )
+        return self._parse_prices(self._get_retried(url, params, retries, backoff), as_array=True)
+
+    def _get_retried(self, url, params, retries=5, backoff=0.5):
+        """
+        GET retried with exponential backoff while throttled.
+        """
+        for attempt in range(retries + 1):
+            res = self._get(url, params=params, headers=self._default_headers)
+            if attempt == retries or not self._is_retryable(res):
+                break
+            delay = backoff * 2**attempt
+            log.debug('Request %s throttled, retrying in %ss', url, delay)
+            time.sleep(delay)
+        return res
+
+    @staticmethod
+    def _join_prices(arrays):
+        """
+        :param arrays: PRICE_DTYPE structured arrays of overlapping windows
+        :return: the ticks sorted by timestamp, without the duplicated ticks of window boundaries
+        """
+        arrays = [data for data in arrays if len(data)]
+        if not arrays:
+            return np.empty(0, dtype=PRICE_DTYPE)
+        data = np.concatenate(arrays)
+        _, first = np.unique(data, return_index=True)
+        data = data[np.sort(first)]
+        return data[np.argsort(data['timestamp'], kind='stable')]
+
+    @staticmethod
+    def _check_price_type(price_type):
         if price_type not in ['bid', 'ask', 'mid']:
             raise ForexException('Invalid price type')
-        price_type = price_type.upper()
+
+    @classmethod
+    def _check_price_types(cls, price_type):
+        price_types = [price_type] if isinstance(price_type, str) else list(dict.fromkeys(price_type))
+        if not price_types:
+            raise ForexException('Invalid price type')
+        for item in price_types:
+            cls._check_price_type(item)
+        return price_types
+
+    @staticmethod
+    def _prices_request(symbol_id, count=None, start=None, end=None, price_type='mid'):
+        """
+        :return: (url, params) of the tick history endpoint matching the arguments
+        """
         params = {
             'maxResults': None,
             'PriceTicks': None,
-            'priceType': price_type,
+            'priceType': price_type.upper(),
             'fromTimeStampUTC': None,
             'toTimestampUTC': None,
         }
@@ -150,8 +642,6 @@ class RestClient:
             end_datetime = pd.to_datetime(end)
             params['toTimestampUTC'] = int(end_datetime.timestamp())
 
-        symbol_id = self.get_symbol_id(symbol)
-
         url = f'/market/{symbol_id}/'
         if start and end:
             url += 'tickhistorybetween'
@@ -168,15 +658,116 @@ class RestClient:
                 url += 'tickhistory'
                 params['PriceTicks'] = count
         params = dict(filter(itemgetter(1), params.items()))
-        res = self._get(url, params=params, headers=self._default_headers)
+        return url, params
+
+    @staticmethod
+    def _parse_prices(res, as_array=False):
+        """
+        Parse a tick history response column by column.
+
+        :return: pd.DataFrame, or a PRICE_DTYPE structured array if as_array is set
+        """
         try:
-            df = pd.DataFrame(
-                map(lambda x: {'datetime': re.sub(r'\D', '', x['TickDate']), 'price': x['Price']}, res['PriceTicks']),
-            )
-            df['datetime'] = pd.to_datetime(df['datetime'], unit='ms')
-            df.datetime = df.datetime.dt.tz_localize('UTC')
-            df.set_index('datetime', inplace=True)
-            return df
+            ticks = res['PriceTicks']
+            data = np.empty(len(ticks), dtype=PRICE_DTYPE)
+            data['timestamp'] = parse_dates_ms([tick['TickDate'] for tick in ticks])
+            data['price'] = [tick['Price'] for tick in ticks]
+        except Exception as e:
+            raise ForexException(res) from e
+        return data if as_array else RestClient._prices_frame(data)
+
+    @staticmethod
+    def _prices_frame(data):
+        """
+        :param data: structured array with a timestamp field (epoch milliseconds) and price fields
+        :return: pd.DataFrame with a price column per field, indexed by UTC datetime
+        """
+        index = pd.DatetimeIndex(pd.to_datetime(data['timestamp'], unit='ms', utc=True), name='datetime')
+        return pd.DataFrame({name: data[name] for name in data.dtype.names[1:]}, index=index)
+
+    @staticmethod
+    def _merge_price_types(price_types, arrays):
+        """
+        :param arrays: PRICE_DTYPE structured array of each price type
+        :return: structured array with a timestamp field and a field per price type
+        """
+        dtype = [('timestamp', 'i8')] + [(price_type, 'f8') for price_type in price_types]
+        timestamps = arrays[0]['timestamp']
+        if all(np.array_equal(timestamps, array['timestamp']) for array in arrays[1:]):
+            data = np.empty(len(timestamps), dtype=dtype)
+            data['timestamp'] = timestamps
+            for price_type, array in zip(price_types, arrays):
+                data[price_type] = array['price']
+            return data
+
+        # Tick times differ between price types: outer join on (timestamp, n-th tick at that timestamp).
+        frames = []
+        for price_type, array in zip(price_types, arrays):
+            df = pd.DataFrame({'timestamp': array['timestamp'], price_type: array['price']})
+            df['n'] = df.groupby('timestamp').cumcount()
+            frames.append(df.set_index(['timestamp', 'n']))
+        df = pd.concat(frames, axis=1).sort_index()
+        data = np.empty(len(df), dtype=dtype)
+        data['timestamp'] = df.index.get_level_values(0)
+        for price_type in price_types:
+            data[price_type] = df[price_type].to_numpy()
+        return data
+
+    def get_open_positions(self, client_account_id, trading_account_id):
+        """
+        :return: list of Order of the open positions
+        """
+        log.debug('Getting open positions of %s', trading_account_id)
+        res = self._get(
+            '/order/openpositions', params={'TradingAccountId': trading_account_id}, headers=self._default_headers
+        )
+        return self._parse_open_orders(res, 'OpenPositions', client_account_id)
+
+    def get_active_orders(self, client_account_id, trading_account_id):
+        """
+        :return: list of Order of the working stop and limit orders
+        """
+        log.debug('Getting active orders of %s', trading_account_id)
+        res = self._get(
+            '/order/activestoplimitorders',
+            params={'TradingAccountId': trading_account_id},
+            headers=self._default_headers,
+        )
+        return self._parse_open_orders(res, 'ActiveStopLimitOrders', client_account_id)
+
+    @staticmethod
+    def _parse_open_orders(res, key, client_account_id):
+        """
+        :param key: OpenPositions (trade orders, Price) or ActiveStopLimitOrders (Type, TriggerPrice)
+        :return: list of Order of the response
+        """
+        try:
+            orders = []
+            for data in res[key]:
+                last_changed = data.get('LastChangedDateTimeUTC')
+                created = data.get('CreatedDateTimeUTC')
+                orders.append(
+                    Order(
+                        order_id=int(data['OrderId']),
+                        symbol_id=int(data['MarketId']),
+                        symbol_name=data['MarketName'],
+                        client_account_id=client_account_id,
+                        trading_account_id=int(data['TradingAccountId']),
+                        currency=Currency.find_by_name(data.get('Currency') or 'Unknown'),
+                        position=Position.Buy if data['Direction'].lower() == 'buy' else Position.Sell,
+                        open_price=float(data['Price'] if 'Price' in data else data['TriggerPrice']),
+                        original_quantity=float(data['Quantity']),
+                        quantity=float(data['Quantity']),
+                        order_type=OrderType(int(data.get('Type', OrderType.Trade.value))),
+                        status=OrderStatus(int(data['Status'])),
+                        reason_id=None,
+                        position_method=PositionMethod(int(data.get('PositionMethodId') or 1)),
+                        last_changed_time=parse_date_ms(last_changed) if last_changed else None,
+                        original_last_changed_date_time=parse_date_ms(created) if created else None,
+                        auto_rollover=bool(data.get('AutoRollover')),
+                    )
+                )
+            return orders
         except Exception as e:
             raise ForexException(res) from e
 
@@ -190,13 +781,8 @@ class RestClient:
             params={'OrderId': order_id, 'TradingAccountId': trading_account_id},
             headers=self._default_headers,
         )
-        status = InstructionStatus(int(res['StatusCode']))
-        if status != InstructionStatus.Accepted:
-            raise ForexException(res)
-        try:
-            return res
-        except Exception as e:
-            raise ForexException(res) from e
+        self._check_status(res)
+        return res
 
     def order_market_price(
         self,
@@ -211,20 +797,54 @@ class RestClient:
         symbol_id = self.get_symbol_id(symbol)
         res = self._post(
             '/order/newtradeorder',
-            params={
-                'TradingAccountId': trading_account_id,
-                'MarketName': symbol,
-                'MarketId': symbol_id,
-                'Direction': position.name.lower(),
-                'Quantity': quantity,
-                'OfferPrice': offer_price,
-            },
+            params=self._market_order_params(trading_account_id, symbol, symbol_id, position, offer_price, quantity),
             headers=self._default_headers,
         )
+        return self._parse_market_order(res, client_account_id, trading_account_id, symbol, symbol_id, position)
+
+    def order_market_prices(self, client_account_id, trading_account_id, orders, max_workers=8):
+        """
+        Submit market orders concurrently over the pooled connections.
+
+        :param orders: (symbol, position, offer_price, quantity) tuples, or dicts of these arguments
+                       of ``order_market_price``
+        :param max_workers: maximum number of orders in flight, within the transport ``pool_size``
+                            the connections are reused
+        :return: list of BatchResult in the order of orders: the Order or the exception of every order
+                 and its round-trip time
+        """
+        orders = list(orders)
+        try:
+            self.warm_symbols([order['symbol'] if isinstance(order, dict) else order[0] for order in orders])
+        except Exception as e:
+            # The orders of an unknown symbol fail on their own.
+            log.debug('Warming up the symbols of the orders failed: %s', e)
+        submit = partial(self.order_market_price, client_account_id, trading_account_id)
+        return run_batch(submit, orders, max_workers)
+
+    def cancel_orders(self, trading_account_id, order_ids, max_workers=8):
+        """
+        Cancel orders concurrently, see :meth:`order_market_prices`.
+
+        :return: list of BatchResult in the order of order_ids
+        """
+        return run_batch(partial(self.cancel_order, trading_account_id), list(order_ids), max_workers)
+
+    @staticmethod
+    def _market_order_params(trading_account_id, symbol, symbol_id, position, offer_price, quantity):
+        return {
+            'TradingAccountId': trading_account_id,
+            'MarketName': symbol,
+            'MarketId': symbol_id,
+            'Direction': position.name.lower(),
+            'Quantity': quantity,
+            'OfferPrice': offer_price,
+        }
+
+    @classmethod
+    def _parse_market_order(cls, res, client_account_id, trading_account_id, symbol, symbol_id, position):
         res['StatusCode'] = res['Status']
-        status = InstructionStatus(int(res['StatusCode']))
-        if status != InstructionStatus.Accepted:
-            raise ForexException(res)
+        cls._check_status(res)
         try:
             data = res['Orders'][0]
             order_id = int(data['OrderId'])
@@ -251,3 +871,37 @@ class RestClient:
             )
         except Exception as e:
             raise ForexException(res) from e
+
+
+def _batch_call(call, request):
+    """
+    :return: BatchResult of call with the arguments of request (a dict, a tuple or a single argument)
+    """
+    start = time.perf_counter()
+    try:
+        if isinstance(request, dict):
+            result = call(**request)
+        elif isinstance(request, (tuple, list)):
+            result = call(*request)
+        else:
+            result = call(request)
+    except Exception as e:
+        log.debug('Batch request %s failed: %s', request, e)
+        return BatchResult(request, error=e, elapsed=time.perf_counter() - start)
+    return BatchResult(request, result, elapsed=time.perf_counter() - start)
+
+
+def run_batch(call, requests, max_workers=8):
+    """
+    Call concurrently with the arguments of every request, see :meth:`RestClient.order_market_prices`.
+
+    :param requests: list of the arguments of each call, a dict, a tuple or a single argument
+    :param max_workers: maximum number of calls in flight
+    :return: list of BatchResult in the order of requests
+    """
+    if not requests:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(requests))) as executor:
+        results = list(executor.map(partial(_batch_call, call), requests))
+    log.debug('Batch of %s requests, %s failed', len(results), sum(not result.ok for result in results))
+    return results
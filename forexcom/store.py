@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .ticks import PRICE_DTYPE, TICK_DTYPE
+
+log = logging.getLogger()
+
+STREAM_DATASET = 'stream'
+DAY_MS = 86400000
+
+
+class TickStore:
+    """
+    Append-only columnar tick store on disk.
+
+    Ticks are kept per symbol, dataset and UTC day in raw binary files of fixed size records,
+    read back through ``np.memmap``. Every file is kept sorted by timestamp, so a range read
+    is two binary searches per day file. Datasets are ``stream`` (ticks recorded from the
+    price stream, TICK_DTYPE) and the history price types ``bid``/``ask``/``mid`` (PRICE_DTYPE).
+
+    History datasets remember which time ranges were downloaded completely (their coverage),
+    so ``RestClient.get_prices`` only fetches the gaps.
+
+    Layout: ``<root>/<symbol>/<dataset>/<YYYY-MM-DD>.bin`` and ``<root>/<symbol>/<dataset>/coverage.json``
+
+    :param root: store directory
+    :param flush_size: number of buffered stream ticks of a symbol written at once
+    """
+
+    def __init__(self, root, flush_size=1000):
+        self.root = os.path.expanduser(root)
+        self.flush_size = flush_size
+        self._pending = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def dtype(dataset):
+        return TICK_DTYPE if dataset == STREAM_DATASET else PRICE_DTYPE
+
+    def _directory(self, symbol, dataset):
+        return os.path.join(self.root, re.sub(r'[^\w.-]', '_', symbol), dataset)
+
+    def _day_path(self, symbol, dataset, day):
+        date = pd.Timestamp(day * DAY_MS, unit='ms').strftime('%Y-%m-%d')
+        return os.path.join(self._directory(symbol, dataset), f'{date}.bin')
+
+    def _read_file(self, path, dtype):
+        if not os.path.exists(path) or os.path.getsize(path) < dtype.itemsize:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    def append(self, symbol, data, dataset=STREAM_DATASET):
+        """
+        Write ticks to the day files of a symbol.
+
+        :param data: structured array of the dataset dtype
+        """
+        if not len(data):
+            return
+        dtype = self.dtype(dataset)
+        data = np.asarray(data, dtype=dtype)
+        days = data['timestamp'] // DAY_MS
+        with self._lock:
+            os.makedirs(self._directory(symbol, dataset), exist_ok=True)
+            for day in np.unique(days):
+                self._append_day(self._day_path(symbol, dataset, int(day)), data[days == day], dtype)
+
+    def _append_day(self, path, data, dtype):
+        if not np.all(data['timestamp'][1:] >= data['timestamp'][:-1]):
+            data = np.sort(data, order='timestamp', kind='stable')
+        existing = self._read_file(path, dtype)
+        if not len(existing) or existing['timestamp'][-1] <= data['timestamp'][0]:
+            with open(path, 'ab') as f:
+                data.tofile(f)
+            return
+        # Older ticks than the end of the file: merge and rewrite it to keep it sorted.
+        merged = np.concatenate([existing, data])
+        del existing
+        merged = merged[np.argsort(merged['timestamp'], kind='stable')]
+        tmp_path = f'{path}.tmp'
+        merged.tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    def append_price(self, price):
+        """Buffer a Price from the stream, written every ``flush_size`` ticks of its symbol."""
+        with self._lock:
+            pending = self._pending.setdefault(price.symbol_name, [])
+            pending.append((price.tick_timestamp, price.bid, price.offer, price.price))
+            if len(pending) >= self.flush_size:
+                self._flush_symbol(price.symbol_name)
+
+    def _flush_symbol(self, symbol):
+        pending = self._pending.pop(symbol, None)
+        if pending:
+            self.append(symbol, np.array(pending, dtype=TICK_DTYPE), STREAM_DATASET)
+
+    def flush(self):
+        with self._lock:
+            for symbol in list(self._pending):
+                self._flush_symbol(symbol)
+
+    def read(self, symbol, start=None, end=None, dataset=STREAM_DATASET):
+        """
+        :param start: first epoch millisecond (inclusive), the first stored tick by default
+        :param end: last epoch millisecond (inclusive), the last stored tick by default
+        :return: structured array of the ticks, sorted by timestamp
+        """
+        dtype = self.dtype(dataset)
+        directory = self._directory(symbol, dataset)
+        if start is None or end is None:
+            days = sorted(
+                int(pd.Timestamp(name[:-4]).value // 10**6 // DAY_MS)
+                for name in (os.listdir(directory) if os.path.isdir(directory) else [])
+                if name.endswith('.bin')
+            )
+            if not days:
+                return np.empty(0, dtype=dtype)
+            start = days[0] * DAY_MS if start is None else start
+            end = (days[-1] + 1) * DAY_MS - 1 if end is None else end
+
+        parts = []
+        for day in range(start // DAY_MS, end // DAY_MS + 1):
+            ticks = self._read_file(self._day_path(symbol, dataset, day), dtype)
+            if len(ticks):
+                timestamps = ticks['timestamp']
+                first = np.searchsorted(timestamps, start, side='left')
+                last = np.searchsorted(timestamps, end, side='right')
+                if last > first:
+                    parts.append(ticks[first:last])
+        if not parts:
+            return np.empty(0, dtype=dtype)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def read_frame(self, symbol, start=None, end=None, dataset=STREAM_DATASET):
+        """
+        :return: pd.DataFrame of the ticks indexed like ``RestClient.get_prices``
+        """
+        data = self.read(symbol, start, end, dataset)
+        index = pd.DatetimeIndex(pd.to_datetime(data['timestamp'], unit='ms', utc=True), name='datetime')
+        return pd.DataFrame({name: data[name] for name in data.dtype.names[1:]}, index=index)
+
+    def _coverage_path(self, symbol, dataset):
+        return os.path.join(self._directory(symbol, dataset), 'coverage.json')
+
+    def coverage(self, symbol, dataset):
+        """
+        :return: sorted list of the [start, end) epoch millisecond ranges stored completely
+        """
+        try:
+            with open(self._coverage_path(symbol, dataset), encoding='utf-8') as f:
+                return [tuple(item) for item in json.load(f)]
+        except FileNotFoundError:
+            return []
+
+    def add_coverage(self, symbol, dataset, start, end):
+        """Record [start, end) as stored completely, merged with the known ranges."""
+        if end <= start:
+            return
+        with self._lock:
+            merged = []
+            for item_start, item_end in sorted(self.coverage(symbol, dataset) + [(start, end)]):
+                if merged and item_start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], item_end))
+                else:
+                    merged.append((item_start, item_end))
+            os.makedirs(self._directory(symbol, dataset), exist_ok=True)
+            path = self._coverage_path(symbol, dataset)
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                json.dump(merged, f)
+            os.replace(f'{path}.tmp', path)
+
+    def gaps(self, symbol, dataset, start, end):
+        """
+        :return: list of the [start, end) epoch millisecond ranges missing from the store
+        """
+        gaps = []
+        cursor = start
+        for item_start, item_end in self.coverage(symbol, dataset):
+            if item_end <= cursor:
+                continue
+            if item_start >= end:
+                break
+            if item_start > cursor:
+                gaps.append((cursor, item_start))
+            cursor = max(cursor, item_end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def store_history(self, symbol, dataset, data, start, end):
+        """
+        Store a complete download of [start, end) and record its coverage.
+        Ticks outside of the range and the ones already covered are dropped.
+        """
+        data = data[(data['timestamp'] >= start) & (data['timestamp'] < end)]
+        with self._lock:
+            for item_start, item_end in self.coverage(symbol, dataset):
+                data = data[(data['timestamp'] < item_start) | (data['timestamp'] >= item_end)]
+            self.append(symbol, data, dataset)
+            self.add_coverage(symbol, dataset, start, min(end, int(time.time() * 1000)))
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+TICK_DTYPE = np.dtype([('timestamp', 'i8'), ('bid', 'f8'), ('offer', 'f8'), ('price', 'f8')])
+# Tick history as returned by RestClient._parse_prices(as_array=True), timestamp in epoch milliseconds.
+PRICE_DTYPE = np.dtype([('timestamp', 'i8'), ('price', 'f8')])
+
+
+class TickBuffer:
+    """
+    Fixed capacity ring buffer of the last ticks of a symbol.
+
+    Ticks are stored in a preallocated structured array (timestamp in epoch milliseconds,
+    bid, offer, price). Every tick is written twice, at ``i`` and ``i + capacity``, so the
+    last ``n`` ticks are always a contiguous slice and :meth:`view` never copies.
+    Views are live: they are overwritten once the buffer wraps around, ``.copy()`` them to keep a snapshot.
+
+    :param capacity: maximum number of ticks kept
+    """
+
+    __slots__ = ('capacity', 'count', '_data')
+
+    def __init__(self, capacity=1000):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.count = 0
+        self._data = np.zeros(capacity * 2, dtype=TICK_DTYPE)
+
+    def append(self, timestamp, bid, offer, price):
+        index = self.count % self.capacity
+        row = (timestamp, bid, offer, price)
+        self._data[index] = row
+        self._data[index + self.capacity] = row
+        self.count += 1
+
+    def append_price(self, price):
+        self.append(price.tick_timestamp, price.bid, price.offer, price.price)
+
+    def view(self, last=None):
+        """
+        :param last: number of most recent ticks, all the buffered ticks by default
+        :return: structured array (oldest first) sharing memory with the buffer
+        """
+        size = min(self.count, self.capacity)
+        if last is not None:
+            size = min(size, last)
+        end = self.count % self.capacity + self.capacity
+        return self._data[end - size : end]
+
+    def to_frame(self, last=None):
+        """
+        :return: pd.DataFrame with bid/offer/price columns and the UTC datetime index of ``RestClient.get_prices``
+        """
+        ticks = self.view(last)
+        index = pd.DatetimeIndex(pd.to_datetime(ticks['timestamp'], unit='ms', utc=True), name='datetime')
+        return pd.DataFrame({'bid': ticks['bid'], 'offer': ticks['offer'], 'price': ticks['price']}, index=index)
+
+    def clear(self):
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+
+class TickBuffers:
+    """
+    TickBuffer of every symbol, created on the first tick of the symbol.
+
+    :param capacity: capacity of each buffer, 0 disables buffering
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._buffers = {}
+
+    def append(self, symbol, price):
+        if not self.capacity:
+            return
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            buffer = self._buffers[symbol] = TickBuffer(self.capacity)
+        buffer.append_price(price)
+
+    def get(self, symbol):
+        return self._buffers.get(symbol)
+
+    def view(self, symbol, last=None):
+        buffer = self._buffers.get(symbol)
+        return buffer.view(last) if buffer is not None else np.empty(0, dtype=TICK_DTYPE)
+
+    def to_frame(self, symbol, last=None):
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            buffer = TickBuffer(1)
+        return buffer.to_frame(last)
+
+    def clear(self):
+        self._buffers.clear()
+
+    def __contains__(self, symbol):
+        return symbol in self._buffers
@@ -0,0 +1,265 @@
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+
+# Upper bounds (seconds) of the latency histograms.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@lru_cache(maxsize=1024)
+def endpoint_name(path):
+    """
+    :param path: REST path (e.g. /market/401484347/barhistorybetween?interval=MINUTE)
+    :return: the path without query and with its numeric ids replaced by {id} (/market/{id}/barhistorybetween)
+    """
+    path = path.split('?', 1)[0]
+    return '/' + '/'.join('{id}' if part.isdigit() else part for part in path.strip('/').split('/'))
+
+
+def trace_request(tracer, method, path, response, result, elapsed):
+    """
+    Report a request to the tracer, and the error of its response if any.
+
+    :param response: transport response, None if the request didn't reach the server
+    :param result: parsed body of the response
+    """
+    endpoint = endpoint_name(path)
+    status = response.status if response is not None else 0
+    tracer.request(method, endpoint, status, elapsed, getattr(response, 'first_byte', None))
+    code = None
+    if isinstance(result, dict):
+        code = result.get('ErrorCode') or result.get('HttpStatus')
+    if code is None and status >= 400:
+        code = status
+    if code is not None:
+        tracer.api_error(endpoint, code)
+
+
+class Tracer:
+    """
+    Instrumentation hooks of the clients, every hook does nothing.
+
+    Subclass it and override the hooks needed, then give it to the clients and transports (``tracer=``).
+    Without a tracer the instrumented code only checks it's ``None``. Hooks are called from the threads
+    doing the work (request, stream and listener threads), times are in seconds.
+    """
+
+    def request(self, method, endpoint, status, elapsed, first_byte):
+        """
+        A REST or stream request returned.
+
+        :param endpoint: path with its ids replaced by {id}, see :func:`endpoint_name`
+        :param status: HTTP status, 0 if the server wasn't reached
+        :param first_byte: time to the response headers, None if not measured
+        """
+
+    def api_error(self, endpoint, code):
+        """
+        The API answered with an error: the ErrorCode of the response, else its HttpStatus or the HTTP status.
+        """
+
+    def connection(self, host, dns, connect, tls):
+        """
+        A connection was opened, with the time of its DNS lookup, TCP connect and TLS handshake (None for http).
+        """
+
+    def stream_messages(self, messages, size):
+        """
+        A block of messages was read from the stream connection.
+
+        :param size: bytes read
+        """
+
+    def stream_event(self, event):
+        """
+        State change of the stream connection: connected, stalled or lost.
+        """
+
+    def listener(self, index, elapsed, error):
+        """
+        A listener returned.
+
+        :param index: listener index returned by the subscribe methods
+        :param elapsed: execution time of the listener
+        :param error: it raised an exception
+        """
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets.
+    """
+
+    __slots__ = ('buckets', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        :return: upper bound of the bucket holding the q quantile (the maximum for the last bucket)
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return bound
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class StatsTracer(Tracer):
+    """
+    Tracer keeping latency histograms and counters in memory, see :meth:`as_dict`.
+
+    :param buckets: upper bounds (seconds) of the histograms
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.first_byte = {}
+        self.connections = {}
+        self.errors = {}
+        self.stream = {'messages': 0, 'bytes': 0}
+        self.stream_events = {}
+        self.listeners = {}
+        self.listener_errors = {}
+
+    def _observe(self, histograms, key, value):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self._buckets)
+        histogram.observe(value)
+
+    def request(self, method, endpoint, status, elapsed, first_byte):
+        with self._lock:
+            self._observe(self.requests, f'{method} {endpoint}', elapsed)
+            if first_byte is not None:
+                self._observe(self.first_byte, f'{method} {endpoint}', first_byte)
+
+    def api_error(self, endpoint, code):
+        with self._lock:
+            key = (endpoint, code)
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def connection(self, host, dns, connect, tls):
+        with self._lock:
+            for phase, value in (('dns', dns), ('connect', connect), ('tls', tls)):
+                if value is not None:
+                    self._observe(self.connections, phase, value)
+
+    def stream_messages(self, messages, size):
+        with self._lock:
+            self.stream['messages'] += messages
+            self.stream['bytes'] += size
+
+    def stream_event(self, event):
+        with self._lock:
+            self.stream_events[event] = self.stream_events.get(event, 0) + 1
+
+    def listener(self, index, elapsed, error):
+        with self._lock:
+            self._observe(self.listeners, index, elapsed)
+            if error:
+                self.listener_errors[index] = self.listener_errors.get(index, 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'requests': {key: h.as_dict() for key, h in self.requests.items()},
+                'first_byte': {key: h.as_dict() for key, h in self.first_byte.items()},
+                'connections': {key: h.as_dict() for key, h in self.connections.items()},
+                'errors': {f'{endpoint} {code}': count for (endpoint, code), count in self.errors.items()},
+                'stream': dict(self.stream, events=dict(self.stream_events)),
+                'listeners': {
+                    index: dict(h.as_dict(), errors=self.listener_errors.get(index, 0))
+                    for index, h in self.listeners.items()
+                },
+            }
+
+
+class PrometheusTracer(Tracer):
+    """
+    Tracer exporting Prometheus metrics, needs the prometheus-client package (``pip install forexcom[prometheus]``).
+
+    :param registry: CollectorRegistry of the metrics, the default registry of prometheus-client by default
+    :param namespace: prefix of the metric names
+    :param buckets: upper bounds (seconds) of the histograms
+    """
+
+    def __init__(self, registry=None, namespace='forexcom', buckets=LATENCY_BUCKETS):
+        try:
+            from prometheus_client import REGISTRY, Counter, Histogram
+        except ImportError as e:
+            raise ImportError("PrometheusTracer needs prometheus-client: pip install forexcom[prometheus]") from e
+        options = {'namespace': namespace, 'registry': registry if registry is not None else REGISTRY}
+        self._requests = Histogram(
+            'request_seconds', 'Latency of the requests', ['method', 'endpoint', 'status'], buckets=buckets, **options
+        )
+        self._first_byte = Histogram(
+            'request_first_byte_seconds',
+            'Time to the response headers',
+            ['method', 'endpoint'],
+            buckets=buckets,
+            **options,
+        )
+        self._connections = Histogram(
+            'connection_seconds', 'Connection setup time by phase', ['phase'], buckets=buckets, **options
+        )
+        self._errors = Counter('api_errors', 'Error responses of the API', ['endpoint', 'code'], **options)
+        self._messages = Counter('stream_messages', 'Messages read from the stream connection', **options)
+        self._bytes = Counter('stream_bytes', 'Bytes read from the stream connection', **options)
+        self._events = Counter('stream_events', 'State changes of the stream connection', ['event'], **options)
+        self._listeners = Histogram(
+            'listener_seconds', 'Execution time of the listeners', ['listener'], buckets=buckets, **options
+        )
+        self._listener_errors = Counter(
+            'listener_errors', 'Exceptions raised by the listeners', ['listener'], **options
+        )
+
+    def request(self, method, endpoint, status, elapsed, first_byte):
+        self._requests.labels(method, endpoint, str(status)).observe(elapsed)
+        if first_byte is not None:
+            self._first_byte.labels(method, endpoint).observe(first_byte)
+
+    def api_error(self, endpoint, code):
+        self._errors.labels(endpoint, str(code)).inc()
+
+    def connection(self, host, dns, connect, tls):
+        for phase, value in (('dns', dns), ('connect', connect), ('tls', tls)):
+            if value is not None:
+                self._connections.labels(phase).observe(value)
+
+    def stream_messages(self, messages, size):
+        self._messages.inc(messages)
+        self._bytes.inc(size)
+
+    def stream_event(self, event):
+        self._events.labels(event).inc()
+
+    def listener(self, index, elapsed, error):
+        self._listeners.labels(str(index)).observe(elapsed)
+        if error:
+            self._listener_errors.labels(str(index)).inc()
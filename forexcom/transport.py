@@ -0,0 +1,266 @@
+import http.client
+import logging
+import queue
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+import certifi
+
+log = logging.getLogger()
+
+# Errors raised when a kept-alive connection was silently closed by the peer.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+# Methods resent on a fresh socket whenever a stale connection fails them. Another request is only resent when
+# sending it failed: once it's sent the server may have processed it (e.g. placed an order) before closing.
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD'))
+
+
+class Response:
+    """
+    Fully read HTTP response returned by :meth:`HTTPTransport.request`.
+
+    first_byte: seconds from sending the request to receiving the response headers.
+    """
+
+    __slots__ = ('status', 'reason', 'headers', 'body', 'first_byte')
+
+    def __init__(self, status, reason, headers, body, first_byte=None):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.first_byte = first_byte
+
+
+class HTTPTransport:
+    """
+    Keep-alive HTTP transport with a connection pool per host.
+
+    The SSL context is built once and shared by every connection. Idle connections are kept
+    (up to ``pool_size`` per host) and reused by the next request to the same host, so the
+    DNS/TCP/TLS setup is paid once instead of on every call.
+
+    :param pool_size: maximum number of idle connections kept per host
+    :param timeout: socket timeout (seconds) for regular requests
+    :param stream_timeout: socket timeout (seconds) for streaming requests, ``None`` blocks forever
+    :param http_proxy: proxy (host:port) used for http urls
+    :param https_proxy: proxy (host:port) used for https urls
+    :param cafile: CA bundle, defaults to certifi
+    :param tracer: Tracer told the DNS/connect/TLS times of the new connections (without proxy)
+    """
+
+    def __init__(
+        self,
+        pool_size=10,
+        timeout=30,
+        stream_timeout=None,
+        http_proxy=None,
+        https_proxy=None,
+        cafile=None,
+        tracer=None,
+    ):
+        self.pool_size = pool_size
+        self.tracer = tracer
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout
+        self._proxies = {'http': http_proxy, 'https': https_proxy}
+        self._cafile = cafile or certifi.where()
+        self._ssl_context = None
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ssl_context(self):
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context(cafile=self._cafile)
+        return self._ssl_context
+
+    def _pool(self, key):
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.setdefault(key, queue.LifoQueue(maxsize=self.pool_size))
+        return pool
+
+    def _new_connection(self, scheme, host, port, timeout):
+        proxy = self._proxies.get(scheme)
+        if proxy:
+            proxy = urlsplit(proxy if '//' in proxy else f'//{proxy}')
+            proxy_host, proxy_port = proxy.hostname, proxy.port
+        else:
+            proxy_host, proxy_port = host, port
+
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(proxy_host, proxy_port, timeout=timeout, context=self.ssl_context)
+        else:
+            conn = http.client.HTTPConnection(proxy_host, proxy_port, timeout=timeout)
+        if proxy and scheme == 'https':
+            conn.set_tunnel(host, port)
+        elif not proxy and self.tracer is not None:
+            self._open(conn, scheme, host)
+        log.debug("New connection to <%s://%s:%s>", scheme, host, port)
+        return conn
+
+    def _open(self, conn, scheme, host):
+        """Connect conn step by step, reporting the DNS lookup, TCP connect and TLS handshake times."""
+        start = time.perf_counter()
+        addresses = socket.getaddrinfo(conn.host, conn.port, 0, socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        error = None
+        for family, type_, proto, _, address in addresses:
+            sock = socket.socket(family, type_, proto)
+            try:
+                sock.settimeout(conn.timeout)
+                sock.connect(address)
+                break
+            except OSError as e:
+                sock.close()
+                error = e
+        else:
+            raise error
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connected = time.perf_counter()
+        tls = None
+        if scheme == 'https':
+            try:
+                sock = self.ssl_context.wrap_socket(sock, server_hostname=host)
+            except OSError:
+                sock.close()
+                raise
+            tls = time.perf_counter() - connected
+        conn.sock = sock
+        self.tracer.connection(host, resolved - start, connected - resolved, tls)
+
+    def _acquire(self, key, timeout):
+        try:
+            conn = self._pool(key).get_nowait()
+        except queue.Empty:
+            return self._new_connection(*key, timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release(self, key, conn):
+        try:
+            self._pool(key).put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, url, body=None, headers=None, stream=False):
+        """
+        Send a request and return the response.
+
+        :param stream: when set the connection is dedicated to the returned ``http.client.HTTPResponse``
+                       (it's never put back into the pool) so it can be read line by line.
+        :return: ``http.client.HTTPResponse`` for stream requests, otherwise :class:`Response`
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'https'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        if scheme == 'http' and self._proxies.get(scheme):
+            target = url
+        else:
+            target = parts.path or '/'
+            if parts.query:
+                target += '?' + parts.query
+        headers = dict(headers or {})
+        headers.setdefault('Host', parts.netloc)
+
+        if stream:
+            conn = self._new_connection(*key, self.stream_timeout)
+            conn.request(method, target, body=body, headers=headers)
+            sock = conn.sock
+            response = conn.getresponse()
+            # Kept for abort_stream, the connection drops it when the response will close.
+            response.sock = sock
+            return response
+
+        conn, reused = self._acquire(key, self.timeout)
+        sent = time.perf_counter()
+        sending = True
+        try:
+            conn.request(method, target, body=body, headers=headers)
+            sending = False
+            response = conn.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            conn.close()
+            if not reused or not (sending or method.upper() in IDEMPOTENT_METHODS):
+                raise
+            log.debug("Stale connection to <%s>, reconnecting", parts.netloc)
+            conn = self._new_connection(*key, self.timeout)
+            conn.request(method, target, body=body, headers=headers)
+            response = conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+        first_byte = time.perf_counter() - sent
+
+        try:
+            res_body = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        return Response(response.status, response.reason, response.headers, res_body, first_byte)
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+# Shared transports of the requests through a proxy, by (http_proxy, https_proxy).
+_proxy_transports = {}
+
+
+def abort_stream(response):
+    """
+    Shut down the socket of a stream response, from any thread.
+    A read blocked on it (e.g. on a half-open connection) returns at once.
+    """
+    sock = getattr(response, 'sock', None)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def get_default_transport():
+    """Shared transport used when no transport is given explicitly."""
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = HTTPTransport()
+    return _default_transport
+
+
+def get_proxy_transport(http_proxy=None, https_proxy=None):
+    """Shared transport of the requests through the given proxies when no transport is given explicitly."""
+    key = (http_proxy, https_proxy)
+    transport = _proxy_transports.get(key)
+    if transport is None:
+        with _default_transport_lock:
+            transport = _proxy_transports.get(key)
+            if transport is None:
+                transport = _proxy_transports[key] = HTTPTransport(http_proxy=http_proxy, https_proxy=https_proxy)
+    return transport
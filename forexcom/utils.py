@@ -1,11 +1,16 @@
 import json
 import logging
-import ssl
-from urllib.error import HTTPError, URLError
+import re
+import time
+from http.client import HTTPException
 from urllib.parse import urlencode
-from urllib.request import Request, urlopen
 
-import certifi
+import numpy as np
+import pandas as pd
+
+from .ratelimit import request_lane
+from .tracing import trace_request
+from .transport import get_default_transport, get_proxy_transport
 
 log = logging.getLogger()
 
@@ -31,24 +36,47 @@ def _parse_json(data):
         return {}
 
 
-def send_request(
-    method,
-    base_url,
-    path,
-    params=None,
-    json_format=False,
-    headers=None,
-    http_proxy=None,
-    https_proxy=None,
-    stream=False,
-):
-    """Open a network connection and performs HTTP with provided params."""
+def parse_date_ms(value):
+    """Parse a Microsoft JSON date (e.g. ``/Date(1655139463000)/`` or ``\\/Date(1655139463000+0000)\\/``)
+    to epoch milliseconds, without regex.
+    """
+    start = value.index('(') + 1
+    end = value.index(')', start)
+    for sign in '+-':
+        offset = value.find(sign, start + 1, end)
+        if offset > 0:
+            end = offset
+            break
+    return int(value[start:end])
+
+
+def ms_to_timestamp(ms):
+    """Epoch milliseconds to an UTC pd.Timestamp."""
+    return pd.Timestamp(ms, unit='ms', tz='UTC')
+
+
+_DATE_CHARS = str.maketrans('', '', '/\\Date()')
+_DATE_OFFSET = re.compile(r'[+-]\d{4}')
+
+
+def parse_dates_ms(values):
+    """Vectorized :func:`parse_date_ms`: list of Microsoft JSON dates to an int64 array of epoch milliseconds."""
+    text = ' '.join(values).translate(_DATE_CHARS)
+    if '+' in text or '-' in text:
+        text = _DATE_OFFSET.sub('', text)
+    return np.fromstring(text, dtype=np.int64, sep=' ')
+
+
+def prepare_request(method, base_url, path, params=None, json_format=False, headers=None):
+    """Build the url, body and headers of a request.
+
+    :return: (url, body, headers)
+    """
     if method not in ["GET", "POST"]:
         raise ValueError(f"Unknown method <{method}>")
 
     url = f'{base_url.strip("/")}/{path.lstrip("/")}'
-    if headers is None:
-        headers = {}
+    headers = dict(headers) if headers else {}
     if params:
         if json_format and method != "GET":
             params = json.dumps(params).encode("utf-8")
@@ -56,41 +84,61 @@ def send_request(
         else:
             params = encode_params(params)
             headers["Content-Type"] = "application/x-www-form-urlencoded"
-    context = ssl.create_default_context(cafile=certifi.where())
     if method == "GET" and params:
         url += "?" + params.decode("utf-8")
+    return url, params if method == "POST" else None, headers
 
-    req = Request(url)
-    if http_proxy:
-        req.set_proxy(http_proxy, 'http')
-    if https_proxy:
-        req.set_proxy(https_proxy, 'https')
 
-    for k, v in headers.items():
-        req.add_header(k, v)
+def parse_response(response, json_format=False):
+    if response.status >= 400:
+        log.debug('The server couldn\'t fulfill the request. <%s>', response.status)
+    return _parse_json(response.body) if json_format else response.body
 
-    kwargs = {
-        'url': req,
-        'context': context,
-    }
 
-    if method == "POST":
-        kwargs['data'] = params
+def send_request(
+    method,
+    base_url,
+    path,
+    params=None,
+    json_format=False,
+    headers=None,
+    http_proxy=None,
+    https_proxy=None,
+    stream=False,
+    transport=None,
+    rate_limiter=None,
+    tracer=None,
+):
+    """
+    Performs HTTP with provided params over a pooled keep-alive connection.
+
+    :param rate_limiter: RateLimiter the request waits for, in the lane of its path
+    :param tracer: Tracer told the latency and the error of the request, the rate limiter wait excluded
+    """
+    url, data, headers = prepare_request(method, base_url, path, params, json_format, headers)
+    if rate_limiter is not None:
+        rate_limiter.acquire(request_lane(path))
+    if transport is None:
+        if http_proxy or https_proxy:
+            transport = get_proxy_transport(http_proxy, https_proxy)
+        else:
+            transport = get_default_transport()
 
-    log.debug("Making a request to <%s> with params <%s>", url, kwargs.get('data', params))
+    log.debug("Making a request to <%s> with params <%s>", url, data or params)
+    start = time.perf_counter() if tracer is not None else 0
     try:
-        response = urlopen(**kwargs)
-    except HTTPError as e:
-        log.debug('The server couldn\'t fulfill the request. <%s>', e.code)
-        if stream:
-            return e
-        res_body = e.read()
-        return _parse_json(res_body) if json_format else res_body
-    except URLError as e:
-        log.debug("Request failed to reach a server <%s>", e.reason)
-    else:
-        if stream:
-            return response
-        res_body = response.read()
-        return _parse_json(res_body) if json_format else res_body
-    return {} if json_format else ''
+        response = transport.request(method, url, body=data, headers=headers, stream=stream)
+    except (HTTPException, OSError) as e:
+        log.debug("Request failed to reach a server <%s>", e)
+        if tracer is not None:
+            trace_request(tracer, method, path, None, None, time.perf_counter() - start)
+        return {} if json_format else ''
+
+    if stream:
+        if tracer is not None:
+            trace_request(tracer, method, path, response, None, time.perf_counter() - start)
+        return response
+    result = parse_response(response, json_format)
+    if tracer is not None:
+        trace_request(tracer, method, path, response, result, time.perf_counter() - start)
+    return result
@@ -37,6 +37,7 @@ setup(
     ],
     install_requires=[
         'certifi',
+        'numpy',
         'pandas',
     ],
     extras_require={
@@ -45,6 +46,9 @@ setup(
             'black',
             'isort',
             'pre-commit',
-        ]
+        ],
+        'prometheus': [
+            'prometheus-client',
+        ],
     },
 )